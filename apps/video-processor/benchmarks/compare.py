@@ -0,0 +1,58 @@
+"""Compare two benchmark result files.
+
+Usage (from apps/video-processor):
+
+    python benchmarks/compare.py results/base.json results/head.json
+    python benchmarks/compare.py base.json head.json --threshold 5 --fail-on-regression
+"""
+import argparse
+import json
+import sys
+
+
+def load(path: str) -> tuple[dict, dict]:
+    with open(path) as f:
+        report = json.load(f)
+    results = {(r["case"], r["media"]): r for r in report["results"]}
+    return report["meta"], results
+
+
+def main(args: argparse.Namespace) -> int:
+    base_meta, base = load(args.base)
+    head_meta, head = load(args.head)
+
+    print(f"base: {base_meta.get('commit')} ({base_meta.get('timestamp')})")
+    print(f"head: {head_meta.get('commit')} ({head_meta.get('timestamp')})\n")
+    print(f"{'case':18} {'media':28} {'base':>9} {'head':>9} {'change':>8}")
+
+    regressions = 0
+    for key in sorted(set(base) | set(head)):
+        old = base.get(key, {}).get("median_s")
+        new = head.get(key, {}).get("median_s")
+
+        if old and new:
+            change = (new - old) / old * 100
+            flag = ""
+            if change > args.threshold:
+                flag = "  REGRESSION"
+                regressions += 1
+            elif change < -args.threshold:
+                flag = "  faster"
+            line = f"{old:>8.3f}s {new:>8.3f}s {change:>+7.1f}%{flag}"
+        else:
+            line = f"{old or '-':>9} {new or '-':>9} {'n/a':>8}"
+
+        print(f"{key[0]:18} {key[1]:28} {line}")
+
+    if regressions:
+        print(f"\n{regressions} case(s) slower by more than {args.threshold}%")
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Percent change to flag")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    sys.exit(main(parser.parse_args()))
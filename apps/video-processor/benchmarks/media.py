@@ -0,0 +1,36 @@
+# Synthetic media for the benchmark suite and the load tester (src/loadtest.py)
+import os
+import subprocess
+import uuid
+
+
+def generate_test_media(
+    path: str,
+    duration: float,
+    width: int = 1280,
+    height: int = 720,
+    fps: int = 30,
+) -> str:
+    """Render a synthetic H.264/AAC clip with ffmpeg's testsrc2 and a tone.
+
+    The tone drops out for 2s every 20s so silence and loudness based
+    analysis has something to find. Existing files are reused.
+    """
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.part.mp4"
+
+    cmd = [
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate={fps}:duration={duration}",
+        "-f", "lavfi", "-i", f"aevalsrc='0.5*sin(440*2*PI*t)*gt(mod(t,20),2)':s=44100:d={duration}",
+        "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-b:a", "128k",
+        "-movflags", "+faststart",
+        "-shortest", tmp_path,
+    ]
+    subprocess.run(cmd, check=True)
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,297 @@
+"""Benchmark the video processing services on synthetic media.
+
+Usage (from apps/video-processor):
+
+    python benchmarks/run.py                      # default profile
+    python benchmarks/run.py --profile quick
+    python benchmarks/run.py --cases transcode,short_create --repeat 5
+
+Media is generated locally with ffmpeg (testsrc2 + a gated tone) and
+services run against the local storage backend, so no MinIO or network
+is needed. Results are written as JSON to benchmarks/results/ and can be
+compared with benchmarks/compare.py.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+
+from media import generate_test_media
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+WORK_DIR = os.path.join(BENCH_DIR, ".work")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+# Settings are read at import time, so configure the environment first
+os.environ.setdefault("TEMP_DIR", os.path.join(WORK_DIR, "tmp"))
+os.environ.setdefault("TRACE_DIR", os.path.join(WORK_DIR, "traces"))
+os.environ.setdefault("STORAGE_BACKEND", "local")
+os.environ.setdefault("LOCAL_STORAGE_ROOT", os.path.join(WORK_DIR, "storage"))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from config import get_settings  # noqa: E402
+from services.clip_extractor import ClipExtractor  # noqa: E402
+from services.shorts_creator import ShortsCreator  # noqa: E402
+from services.subtitle_generator import SubtitleGenerator  # noqa: E402
+from services.thumbnail_generator import ThumbnailGenerator  # noqa: E402
+from services.video_processor import VideoProcessor  # noqa: E402
+
+settings = get_settings()
+
+PROFILES = {
+    "quick": {"durations": [10], "resolutions": [(640, 360)], "repeat": 1},
+    "default": {"durations": [10, 60], "resolutions": [(640, 360), (1280, 720)], "repeat": 3},
+    "full": {
+        "durations": [10, 60, 300],
+        "resolutions": [(640, 360), (1280, 720), (1920, 1080)],
+        "repeat": 3,
+    },
+}
+
+
+class Bench:
+    def __init__(self):
+        self.processor = VideoProcessor()
+        self.extractor = ClipExtractor()
+        self.creator = ShortsCreator()
+        self.subtitles = SubtitleGenerator()
+        self.thumbnails = ThumbnailGenerator()
+
+    # Each case returns the job record (or an equivalent dict)
+
+    async def transcode(self, media: dict) -> dict:
+        job_id = str(uuid.uuid4())
+        await self.processor.transcode(
+            job_id=job_id,
+            input_url=media["key"],
+            output_format="mp4",
+            video_codec="libx264",
+            audio_codec="aac",
+            video_bitrate=None,
+            audio_bitrate="128k",
+            resolution=None,
+            callback_url=None,
+        )
+        return self.processor.jobs.pop(job_id)
+
+    async def clip_extract(self, media: dict) -> dict:
+        job_id = str(uuid.uuid4())
+        start = media["duration"] * 0.3
+        await self.extractor.extract_clip(
+            job_id=job_id,
+            input_url=media["key"],
+            start_time=start,
+            end_time=start + min(30.0, media["duration"] * 0.4),
+            output_format="mp4",
+            fade_in=0.0,
+            fade_out=0.0,
+            callback_url=None,
+        )
+        return self.extractor.jobs.pop(job_id)
+
+    async def clip_detect(self, media: dict) -> dict:
+        job_id = str(uuid.uuid4())
+        await self.extractor.detect_clips(
+            job_id=job_id,
+            input_url=media["key"],
+            min_duration=5.0,
+            max_duration=60.0,
+            silence_threshold=-40.0,
+            callback_url=None,
+        )
+        return self.extractor.jobs.pop(job_id)
+
+    async def short_create(self, media: dict) -> dict:
+        job_id = str(uuid.uuid4())
+        await self.creator.create_short(
+            job_id=job_id,
+            input_url=media["key"],
+            start_time=0.0,
+            end_time=min(15.0, media["duration"]),
+            crop_position="center",
+            enable_loop=False,
+            loop_crossfade=0.5,
+            text_overlay=None,
+            text_position="bottom",
+            output_format="mp4",
+            callback_url=None,
+        )
+        return self.creator.jobs.pop(job_id)
+
+    async def thumbnail_grid(self, media: dict) -> dict:
+        return await self.thumbnails.generate_grid(
+            video_url=media["key"], rows=3, cols=3, output_format="jpg"
+        )
+
+    async def thumbnail_frames(self, media: dict) -> dict:
+        step = media["duration"] / 6
+        urls = await self.thumbnails.extract_multiple_frames(
+            video_url=media["key"],
+            timestamps=[step * (i + 1) for i in range(5)],
+            output_format="jpg",
+            width=1280,
+            height=None,
+        )
+        return {"status": "completed", "frames": len(urls)}
+
+    async def subtitles_tiny(self, media: dict) -> dict:
+        try:
+            import whisper  # noqa: F401
+        except ImportError:
+            return {"status": "skipped", "error": "openai-whisper is not installed"}
+
+        job_id = str(uuid.uuid4())
+        await self.subtitles.generate(
+            job_id=job_id,
+            input_url=media["key"],
+            language="en",
+            model_size="tiny",
+            output_format="srt",
+            word_timestamps=False,
+            translate_to=None,
+            callback_url=None,
+        )
+        return self.subtitles.jobs.pop(job_id)
+
+
+CASES = [
+    "transcode",
+    "clip_extract",
+    "clip_detect",
+    "short_create",
+    "thumbnail_grid",
+    "thumbnail_frames",
+    "subtitles_tiny",
+]
+
+
+def prepare_media(durations: list[int], resolutions: list[tuple[int, int]]) -> list[dict]:
+    media = []
+    for duration in durations:
+        for width, height in resolutions:
+            name = f"testsrc_{width}x{height}_{duration}s"
+            key = f"media/{name}.mp4"
+            generate_test_media(
+                os.path.join(settings.local_storage_root, key), duration, width, height
+            )
+            media.append({
+                "name": name,
+                "key": key,
+                "duration": float(duration),
+                "width": width,
+                "height": height,
+            })
+    return media
+
+
+async def run_case(bench: Bench, case: str, media: dict, repeat: int) -> dict:
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        try:
+            result = await getattr(bench, case)(media)
+        except Exception as e:
+            result = {"status": "failed", "error": str(e)}
+        wall = time.perf_counter() - started
+
+        runs.append({
+            "wall_s": round(wall, 4),
+            "status": result.get("status", "completed"),
+            "timings": result.get("timings", {}),
+            "error": result.get("error"),
+        })
+        if runs[-1]["status"] == "skipped":
+            break
+
+    ok = [r["wall_s"] for r in runs if r["status"] == "completed"]
+    median = statistics.median(ok) if ok else None
+
+    return {
+        "case": case,
+        "media": media["name"],
+        "media_duration": media["duration"],
+        "resolution": f"{media['width']}x{media['height']}",
+        "runs": runs,
+        "median_s": median,
+        "min_s": min(ok) if ok else None,
+        "realtime_factor": round(media["duration"] / median, 2) if median else None,
+    }
+
+
+def environment_info() -> dict:
+    def run(cmd: list[str]) -> str:
+        try:
+            return subprocess.run(
+                cmd, capture_output=True, text=True, cwd=BENCH_DIR
+            ).stdout.strip()
+        except OSError:
+            return ""
+
+    return {
+        "commit": run(["git", "rev-parse", "--short", "HEAD"]),
+        "dirty": bool(run(["git", "status", "--porcelain", "--", ".."])),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "ffmpeg": run(["ffmpeg", "-version"]).split("\n")[0],
+        "settings": {
+            "storage_backend": settings.storage_backend,
+            "stream_inputs": settings.stream_inputs,
+            "max_concurrent_jobs": settings.max_concurrent_jobs,
+        },
+    }
+
+
+async def main(args: argparse.Namespace):
+    profile = PROFILES[args.profile]
+    cases = args.cases.split(",") if args.cases else CASES
+    unknown = set(cases) - set(CASES)
+    if unknown:
+        raise SystemExit(f"Unknown cases: {', '.join(sorted(unknown))}")
+
+    repeat = args.repeat or profile["repeat"]
+    os.makedirs(settings.temp_dir, exist_ok=True)
+
+    print("Generating test media...")
+    media = prepare_media(profile["durations"], profile["resolutions"])
+
+    bench = Bench()
+    results = []
+    for item in media:
+        for case in cases:
+            result = await run_case(bench, case, item, repeat)
+            results.append(result)
+
+            median = f"{result['median_s']:.3f}s" if result["median_s"] else "-"
+            statuses = ",".join(sorted({r["status"] for r in result["runs"]}))
+            print(f"{case:18} {item['name']:28} median={median:>9}  [{statuses}]")
+
+    report = {"meta": {**environment_info(), "profile": args.profile, "repeat": repeat},
+              "results": results}
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        output = os.path.join(RESULTS_DIR, f"{stamp}_{report['meta']['commit'] or 'nogit'}.json")
+
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--profile", choices=PROFILES, default="default")
+    parser.add_argument("--cases", help=f"Comma-separated subset of: {', '.join(CASES)}")
+    parser.add_argument("--repeat", type=int, help="Runs per case (overrides the profile)")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/<time>_<commit>.json)")
+    asyncio.run(main(parser.parse_args()))
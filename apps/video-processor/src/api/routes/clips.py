@@ -4,6 +4,7 @@ from typing import Optional
 import uuid
 
 from services.clip_extractor import ClipExtractor
+from utils.queue import cancel_job, submit_job
 
 router = APIRouter()
 extractor = ClipExtractor()
@@ -58,7 +59,8 @@ async def extract_clip(
 
     job_id = str(uuid.uuid4())
 
-    background_tasks.add_task(
+    job_id, job = await submit_job(
+        background_tasks,
         extractor.extract_clip,
         job_id=job_id,
         input_url=request.input_url,
@@ -72,7 +74,8 @@ async def extract_clip(
 
     return ExtractClipResponse(
         job_id=job_id,
-        status="processing",
+        status=job["status"],
+        output_url=job.get("output_url"),
         duration=request.end_time - request.start_time,
     )
 
@@ -85,7 +88,8 @@ async def detect_clips(
     """Automatically detect potential clip points in a video."""
     job_id = str(uuid.uuid4())
 
-    background_tasks.add_task(
+    job_id, job = await submit_job(
+        background_tasks,
         extractor.detect_clips,
         job_id=job_id,
         input_url=request.input_url,
@@ -95,7 +99,7 @@ async def detect_clips(
         callback_url=request.callback_url,
     )
 
-    return DetectClipsResponse(job_id=job_id, status="processing")
+    return DetectClipsResponse(job_id=job_id, status=job["status"], clips=job.get("clips", []))
 
 
 @router.post("/batch")
@@ -109,7 +113,8 @@ async def extract_batch_clips(
     for clip_request in clips:
         job_id = str(uuid.uuid4())
 
-        background_tasks.add_task(
+        job_id, job = await submit_job(
+            background_tasks,
             extractor.extract_clip,
             job_id=job_id,
             input_url=clip_request.input_url,
@@ -123,8 +128,31 @@ async def extract_batch_clips(
 
         responses.append(ExtractClipResponse(
             job_id=job_id,
-            status="processing",
+            status=job["status"],
+            output_url=job.get("output_url"),
             duration=clip_request.end_time - clip_request.start_time,
         ))
 
     return responses
+
+
+@router.get("/job/{job_id}")
+async def get_clip_job(job_id: str) -> dict:
+    """Get status of a clip extraction or detection job."""
+    status = await extractor.get_job_status(job_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return status
+
+
+@router.delete("/job/{job_id}")
+async def cancel_clip_job(job_id: str) -> dict:
+    """Cancel a queued or running clip extraction or detection job."""
+    status = await extractor.get_job_status(job_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    cancelled = await cancel_job(job_id)
+    if cancelled is None:
+        raise HTTPException(status_code=409, detail=f"Job already {status['status']}")
+    return {"job_id": job_id, "status": cancelled}
@@ -1,6 +1,13 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Response
 from pydantic import BaseModel
 from datetime import datetime
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from config import get_settings
+from utils.callbacks import callback_dispatcher
+from utils.queue import job_queue
+
+settings = get_settings()
 
 router = APIRouter()
 
@@ -28,10 +35,25 @@ async def readiness_check() -> dict:
     ffmpeg_available = shutil.which("ffmpeg") is not None
     ffprobe_available = shutil.which("ffprobe") is not None
 
-    return {
-        "ready": ffmpeg_available and ffprobe_available,
-        "checks": {
-            "ffmpeg": ffmpeg_available,
-            "ffprobe": ffprobe_available,
-        },
+    checks = {
+        "ffmpeg": ffmpeg_available,
+        "ffprobe": ffprobe_available,
     }
+    result = {
+        "callbacks": {**callback_dispatcher.stats, "pending": callback_dispatcher.pending},
+    }
+
+    if settings.job_backend == "redis":
+        try:
+            result["queue"] = {"pending": await job_queue.pending()}
+            checks["redis"] = True
+        except Exception:
+            checks["redis"] = False
+
+    return {"ready": all(checks.values()), "checks": checks, **result}
+
+
+@router.get("/metrics")
+async def metrics() -> Response:
+    """Prometheus metrics."""
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,90 @@
+from fastapi import APIRouter, HTTPException, BackgroundTasks
+from pydantic import BaseModel
+from typing import Optional, Literal
+import uuid
+
+from services.pipeline_runner import PipelineRunner
+from utils.queue import cancel_job, submit_job
+
+router = APIRouter()
+runner = PipelineRunner()
+
+
+class PipelineStep(BaseModel):
+    id: str
+    op: Literal["probe", "cut", "crop_vertical", "burn_subtitles", "normalize_audio", "thumbnail"]
+    input: str = "source"  # "source" or the id of an earlier step
+
+    # Per-op options:
+    #   cut: start_time, end_time
+    #   crop_vertical: crop_position (left, center, right, auto)
+    #   burn_subtitles: subtitles_url, font_name, font_size, font_color,
+    #                   outline_color, outline_width, position, margin_v
+    #   normalize_audio: target_lufs
+    #   thumbnail: timestamp, width, height, format (jpg, png, webp)
+    params: dict = {}
+
+
+class RunPipelineRequest(BaseModel):
+    input_url: str
+    steps: list[PipelineStep]
+    outputs: list[str]  # step ids to upload; everything else stays local
+    output_format: str = "mp4"
+
+    callback_url: Optional[str] = None
+
+
+class RunPipelineResponse(BaseModel):
+    job_id: str
+    status: str
+
+
+@router.post("/run")
+async def run_pipeline(
+    request: RunPipelineRequest,
+    background_tasks: BackgroundTasks,
+) -> RunPipelineResponse:
+    """Run a DAG of operations in a single ffmpeg pass and upload only its outputs."""
+    steps = [step.model_dump() for step in request.steps]
+
+    try:
+        runner.validate(steps, request.outputs)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    job_id = str(uuid.uuid4())
+
+    job_id, job = await submit_job(
+        background_tasks,
+        runner.run,
+        job_id=job_id,
+        input_url=request.input_url,
+        steps=steps,
+        outputs=request.outputs,
+        output_format=request.output_format,
+        callback_url=request.callback_url,
+    )
+
+    return RunPipelineResponse(job_id=job_id, status=job["status"])
+
+
+@router.get("/job/{job_id}")
+async def get_pipeline_job(job_id: str) -> dict:
+    """Get status of a pipeline job."""
+    status = await runner.get_job_status(job_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return status
+
+
+@router.delete("/job/{job_id}")
+async def cancel_pipeline_job(job_id: str) -> dict:
+    """Cancel a queued or running pipeline job."""
+    status = await runner.get_job_status(job_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    cancelled = await cancel_job(job_id)
+    if cancelled is None:
+        raise HTTPException(status_code=409, detail=f"Job already {status['status']}")
+    return {"job_id": job_id, "status": cancelled}
@@ -3,10 +3,31 @@ from pydantic import BaseModel
 from typing import Optional, Literal
 import uuid
 
+from config import get_settings
 from services.shorts_creator import ShortsCreator
+from utils.queue import cancel_job, submit_job
 
 router = APIRouter()
 creator = ShortsCreator()
+settings = get_settings()
+
+
+class ShortSubtitleSegment(BaseModel):
+    start: float  # seconds in the source video
+    end: float
+    text: str
+
+
+class ShortSubtitleStyle(BaseModel):
+    # libass scales sizes to the frame height (288 units), so these read
+    # smaller than the /subtitles/burn defaults on a 1920px-tall Short
+    font_name: str = "Arial"
+    font_size: int = 16
+    font_color: str = "white"
+    outline_color: str = "black"
+    outline_width: int = 2
+    position: Literal["top", "center", "bottom"] = "bottom"
+    margin_v: int = 60  # clears the Shorts UI at the bottom
 
 
 class CreateShortRequest(BaseModel):
@@ -20,11 +41,18 @@ class CreateShortRequest(BaseModel):
     # Loop settings for seamless shorts
     enable_loop: bool = False
     loop_crossfade: float = 0.5  # seconds
+    loop_point: Optional[float] = None  # source time to loop back at, e.g. from /analyze-loop
+    detect_loop_point: bool = False  # pick the best loop point in the segment's second half
 
     # Text overlay
     text_overlay: Optional[str] = None
     text_position: Literal["top", "center", "bottom"] = "bottom"
 
+    # Subtitles burned in the same encode, timed against the source video
+    subtitles_url: Optional[str] = None  # SRT/VTT/ASS file
+    subtitle_segments: Optional[list[ShortSubtitleSegment]] = None
+    subtitle_style: ShortSubtitleStyle = ShortSubtitleStyle()
+
     # Output settings
     max_duration: float = 60.0  # YouTube Shorts max
     output_format: str = "mp4"
@@ -42,7 +70,7 @@ class LoopAnalysisRequest(BaseModel):
     input_url: str
     start_time: float
     end_time: float
-    search_window: float = 2.0  # seconds to search for loop point
+    search_window: float = 2.0  # seconds compared between the segment's head and tail
 
 
 class LoopPoint(BaseModel):
@@ -65,6 +93,11 @@ async def create_short(
     """Create a YouTube Short from a video segment."""
     duration = request.end_time - request.start_time
 
+    if request.subtitles_url and request.subtitle_segments:
+        raise HTTPException(
+            status_code=400, detail="Use either subtitles_url or subtitle_segments, not both"
+        )
+
     if duration <= 0:
         raise HTTPException(status_code=400, detail="Invalid time range")
 
@@ -74,9 +107,15 @@ async def create_short(
             detail=f"Duration ({duration}s) exceeds maximum ({request.max_duration}s)",
         )
 
+    if request.loop_point is not None and not (
+        request.start_time < request.loop_point <= request.end_time
+    ):
+        raise HTTPException(status_code=400, detail="loop_point must be inside the time range")
+
     job_id = str(uuid.uuid4())
 
-    background_tasks.add_task(
+    job_id, job = await submit_job(
+        background_tasks,
         creator.create_short,
         job_id=job_id,
         input_url=request.input_url,
@@ -85,13 +124,18 @@ async def create_short(
         crop_position=request.crop_position,
         enable_loop=request.enable_loop,
         loop_crossfade=request.loop_crossfade,
+        loop_point=request.loop_point,
+        detect_loop_point=request.detect_loop_point,
         text_overlay=request.text_overlay,
         text_position=request.text_position,
         output_format=request.output_format,
         callback_url=request.callback_url,
+        **_subtitle_options(request),
     )
 
-    return CreateShortResponse(job_id=job_id, status="processing")
+    return CreateShortResponse(
+        job_id=job_id, status=job["status"], output_url=job.get("output_url")
+    )
 
 
 @router.post("/analyze-loop")
@@ -100,9 +144,29 @@ async def analyze_loop_points(
     background_tasks: BackgroundTasks,
 ) -> LoopAnalysisResponse:
     """Analyze video segment to find optimal loop points for seamless looping."""
+    duration = request.end_time - request.start_time
+
+    if duration <= 0:
+        raise HTTPException(status_code=400, detail="Invalid time range")
+
+    if duration > settings.loop_analysis_max_duration:
+        raise HTTPException(
+            status_code=400,
+            detail=(
+                f"Duration ({duration}s) exceeds maximum "
+                f"({settings.loop_analysis_max_duration}s)"
+            ),
+        )
+
+    if not 0 < request.search_window <= duration:
+        raise HTTPException(
+            status_code=400, detail="search_window must be positive and fit in the time range"
+        )
+
     job_id = str(uuid.uuid4())
 
-    background_tasks.add_task(
+    job_id, job = await submit_job(
+        background_tasks,
         creator.analyze_loop_points,
         job_id=job_id,
         input_url=request.input_url,
@@ -111,7 +175,12 @@ async def analyze_loop_points(
         search_window=request.search_window,
     )
 
-    return LoopAnalysisResponse(job_id=job_id, status="processing")
+    return LoopAnalysisResponse(
+        job_id=job_id,
+        status=job["status"],
+        loop_points=job.get("loop_points", []),
+        best_loop=job.get("best_loop"),
+    )
 
 
 @router.post("/batch")
@@ -125,7 +194,8 @@ async def create_batch_shorts(
     for req in requests:
         job_id = str(uuid.uuid4())
 
-        background_tasks.add_task(
+        job_id, job = await submit_job(
+            background_tasks,
             creator.create_short,
             job_id=job_id,
             input_url=req.input_url,
@@ -134,12 +204,50 @@ async def create_batch_shorts(
             crop_position=req.crop_position,
             enable_loop=req.enable_loop,
             loop_crossfade=req.loop_crossfade,
+            loop_point=req.loop_point,
+            detect_loop_point=req.detect_loop_point,
             text_overlay=req.text_overlay,
             text_position=req.text_position,
             output_format=req.output_format,
             callback_url=req.callback_url,
+            **_subtitle_options(req),
         )
 
-        responses.append(CreateShortResponse(job_id=job_id, status="processing"))
+        responses.append(CreateShortResponse(
+            job_id=job_id, status=job["status"], output_url=job.get("output_url")
+        ))
 
     return responses
+
+
+@router.get("/job/{job_id}")
+async def get_short_job(job_id: str) -> dict:
+    """Get status of a short creation or loop analysis job."""
+    status = await creator.get_job_status(job_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return status
+
+
+@router.delete("/job/{job_id}")
+async def cancel_short_job(job_id: str) -> dict:
+    """Cancel a queued or running short creation or loop analysis job."""
+    status = await creator.get_job_status(job_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    cancelled = await cancel_job(job_id)
+    if cancelled is None:
+        raise HTTPException(status_code=409, detail=f"Job already {status['status']}")
+    return {"job_id": job_id, "status": cancelled}
+
+
+def _subtitle_options(request: CreateShortRequest) -> dict:
+    return {
+        "subtitles_url": request.subtitles_url,
+        "subtitle_segments": (
+            [seg.model_dump() for seg in request.subtitle_segments]
+            if request.subtitle_segments else None
+        ),
+        "subtitle_style": request.subtitle_style.model_dump(),
+    }
@@ -4,6 +4,7 @@ from typing import Optional, Literal
 import uuid
 
 from services.subtitle_generator import SubtitleGenerator
+from utils.queue import cancel_job, submit_job
 
 router = APIRouter()
 generator = SubtitleGenerator()
@@ -66,7 +67,8 @@ async def generate_subtitles(
     """Generate subtitles using Whisper AI."""
     job_id = str(uuid.uuid4())
 
-    background_tasks.add_task(
+    job_id, job = await submit_job(
+        background_tasks,
         generator.generate,
         job_id=job_id,
         input_url=request.input_url,
@@ -78,7 +80,13 @@ async def generate_subtitles(
         callback_url=request.callback_url,
     )
 
-    return GenerateSubtitlesResponse(job_id=job_id, status="processing")
+    return GenerateSubtitlesResponse(
+        job_id=job_id,
+        status=job["status"],
+        language=job.get("language"),
+        output_url=job.get("output_url"),
+        segments=job.get("segments", []),
+    )
 
 
 @router.post("/burn")
@@ -89,7 +97,8 @@ async def burn_subtitles(
     """Burn subtitles into video (hardcode)."""
     job_id = str(uuid.uuid4())
 
-    background_tasks.add_task(
+    job_id, job = await submit_job(
+        background_tasks,
         generator.burn_subtitles,
         job_id=job_id,
         video_url=request.video_url,
@@ -104,7 +113,9 @@ async def burn_subtitles(
         callback_url=request.callback_url,
     )
 
-    return BurnSubtitlesResponse(job_id=job_id, status="processing")
+    return BurnSubtitlesResponse(
+        job_id=job_id, status=job["status"], output_url=job.get("output_url")
+    )
 
 
 @router.get("/job/{job_id}")
@@ -114,3 +125,16 @@ async def get_subtitle_job(job_id: str) -> dict:
     if not status:
         raise HTTPException(status_code=404, detail="Job not found")
     return status
+
+
+@router.delete("/job/{job_id}")
+async def cancel_subtitle_job(job_id: str) -> dict:
+    """Cancel a queued or running subtitle job."""
+    status = await generator.get_job_status(job_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    cancelled = await cancel_job(job_id)
+    if cancelled is None:
+        raise HTTPException(status_code=409, detail=f"Job already {status['status']}")
+    return {"job_id": job_id, "status": cancelled}
@@ -45,6 +45,24 @@ class GenerateThumbnailGridResponse(BaseModel):
     timestamps: list[float]
 
 
+class GenerateStoryboardRequest(BaseModel):
+    video_url: str
+    interval: float = 5.0  # seconds per thumbnail
+    width: int = 160  # thumbnail width, height keeps aspect ratio
+    cols: int = 10  # thumbnails per sprite sheet row
+    rows: int = 10
+    output_format: Literal["jpg", "webp"] = "jpg"
+
+
+class GenerateStoryboardResponse(BaseModel):
+    vtt_url: str
+    sprite_urls: list[str]
+    interval: float
+    thumbnail_width: int
+    thumbnail_height: int
+    count: int
+
+
 class ApplyWatermarkRequest(BaseModel):
     image_url: str
     watermark_url: str
@@ -52,12 +70,30 @@ class ApplyWatermarkRequest(BaseModel):
     opacity: float = 0.7  # 0.0 to 1.0
     scale: float = 0.2  # relative to image size
     margin: int = 20  # pixels
+    output_format: Literal["png", "jpg", "webp"] = "png"
 
 
 class ApplyWatermarkResponse(BaseModel):
     output_url: str
 
 
+class BatchWatermarkRequest(BaseModel):
+    watermark_url: str
+    # Either images, or a video and the timestamps of the frames to brand
+    image_urls: Optional[list[str]] = None
+    video_url: Optional[str] = None
+    timestamps: Optional[list[float]] = None  # seconds
+    position: Literal["top-left", "top-right", "bottom-left", "bottom-right", "center"] = "bottom-right"
+    opacity: float = 0.7
+    scale: float = 0.2
+    margin: int = 20
+    output_format: Literal["png", "jpg", "webp"] = "png"
+
+
+class BatchWatermarkResponse(BaseModel):
+    output_urls: list[str]  # in input order
+
+
 @router.post("/extract-frame")
 async def extract_frame(request: ExtractFrameRequest) -> ExtractFrameResponse:
     """Extract a single frame from a video at specified timestamp."""
@@ -114,6 +150,26 @@ async def generate_thumbnail_grid(
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.post("/storyboard")
+async def generate_storyboard(request: GenerateStoryboardRequest) -> GenerateStoryboardResponse:
+    """Generate scrub-preview sprite sheets and a WebVTT thumbnails track."""
+    if request.interval <= 0 or min(request.width, request.cols, request.rows) <= 0:
+        raise HTTPException(status_code=400, detail="interval, width, cols and rows must be positive")
+
+    try:
+        result = await generator.generate_storyboard(
+            video_url=request.video_url,
+            interval=request.interval,
+            width=request.width,
+            cols=request.cols,
+            rows=request.rows,
+            output_format=request.output_format,
+        )
+        return GenerateStoryboardResponse(**result)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.post("/watermark")
 async def apply_watermark(request: ApplyWatermarkRequest) -> ApplyWatermarkResponse:
     """Apply watermark to an image."""
@@ -125,12 +181,38 @@ async def apply_watermark(request: ApplyWatermarkRequest) -> ApplyWatermarkRespo
             opacity=request.opacity,
             scale=request.scale,
             margin=request.margin,
+            output_format=request.output_format,
         )
         return ApplyWatermarkResponse(output_url=output_url)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.post("/watermark/batch")
+async def apply_watermark_batch(request: BatchWatermarkRequest) -> BatchWatermarkResponse:
+    """Apply one watermark to many images, or to frames of a video."""
+    if bool(request.image_urls) == bool(request.video_url):
+        raise HTTPException(status_code=400, detail="Provide either image_urls or video_url")
+    if request.video_url and not request.timestamps:
+        raise HTTPException(status_code=400, detail="timestamps are required with video_url")
+
+    try:
+        output_urls = await generator.apply_watermark_batch(
+            watermark_url=request.watermark_url,
+            position=request.position,
+            opacity=request.opacity,
+            scale=request.scale,
+            margin=request.margin,
+            output_format=request.output_format,
+            image_urls=request.image_urls,
+            video_url=request.video_url,
+            timestamps=request.timestamps,
+        )
+        return BatchWatermarkResponse(output_urls=output_urls)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.post("/best-frames")
 async def detect_best_frames(
     video_url: str,
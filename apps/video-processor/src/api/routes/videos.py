@@ -4,6 +4,7 @@ from typing import Optional
 import uuid
 
 from services.video_processor import VideoProcessor
+from utils.queue import cancel_job, submit_job
 
 router = APIRouter()
 processor = VideoProcessor()
@@ -64,7 +65,8 @@ async def transcode_video(
     """Transcode video to specified format."""
     job_id = str(uuid.uuid4())
 
-    background_tasks.add_task(
+    job_id, job = await submit_job(
+        background_tasks,
         processor.transcode,
         job_id=job_id,
         input_url=request.input_url,
@@ -77,7 +79,9 @@ async def transcode_video(
         callback_url=request.callback_url,
     )
 
-    return TranscodeResponse(job_id=job_id, status="processing")
+    return TranscodeResponse(
+        job_id=job_id, status=job["status"], output_url=job.get("output_url")
+    )
 
 
 @router.post("/normalize-audio")
@@ -88,7 +92,8 @@ async def normalize_audio(
     """Normalize audio levels to target LUFS."""
     job_id = str(uuid.uuid4())
 
-    background_tasks.add_task(
+    job_id, job = await submit_job(
+        background_tasks,
         processor.normalize_audio,
         job_id=job_id,
         input_url=request.input_url,
@@ -96,7 +101,9 @@ async def normalize_audio(
         callback_url=request.callback_url,
     )
 
-    return TranscodeResponse(job_id=job_id, status="processing")
+    return TranscodeResponse(
+        job_id=job_id, status=job["status"], output_url=job.get("output_url")
+    )
 
 
 @router.get("/job/{job_id}")
@@ -106,3 +113,16 @@ async def get_job_status(job_id: str) -> dict:
     if not status:
         raise HTTPException(status_code=404, detail="Job not found")
     return status
+
+
+@router.delete("/job/{job_id}")
+async def cancel_video_job(job_id: str) -> dict:
+    """Cancel a queued or running processing job."""
+    status = await processor.get_job_status(job_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    cancelled = await cancel_job(job_id)
+    if cancelled is None:
+        raise HTTPException(status_code=409, detail=f"Job already {status['status']}")
+    return {"job_id": job_id, "status": cancelled}
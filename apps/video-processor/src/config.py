@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Literal
 
 
 class Settings(BaseSettings):
@@ -12,6 +13,11 @@ class Settings(BaseSettings):
     # Redis
     redis_url: str = "redis://localhost:6379"
 
+    # Storage backend: "s3" (MinIO / S3) or "local" (filesystem, single node)
+    storage_backend: Literal["s3", "local"] = "s3"
+    local_storage_root: str = "/var/lib/creatorops/storage"
+    local_storage_url: str = ""  # public base URL for local objects, file paths if empty
+
     # MinIO / S3
     minio_endpoint: str = "localhost"
     minio_port: int = 9000
@@ -21,8 +27,72 @@ class Settings(BaseSettings):
     minio_use_ssl: bool = False
 
     # Processing
+    # Per-job scratch directories (see utils/scratch.py). temp_dir belongs to
+    # the processor: anything in it not owned by a running process is swept
     temp_dir: str = "/tmp/creatorops-processor"
-    max_concurrent_jobs: int = 2
+    scratch_quota_bytes: int = 20 * 1024**3  # per process; downloads wait for room
+    scratch_min_free_bytes: int = 2 * 1024**3  # free disk always left on temp_dir
+    scratch_reserve_factor: float = 2.0  # bytes reserved per downloaded byte (input + outputs)
+    # tmpfs directory (e.g. /dev/shm/creatorops-processor) for stills jobs; off if empty
+    scratch_tmpfs_dir: str = ""
+    scratch_tmpfs_quota_bytes: int = 256 * 1024**2
+
+    # Concurrent operations per lane (see utils/scheduler.py): renders and
+    # analysis ("encode"), Whisper ("transcribe") and interactive stills
+    # (single frames, watermarks, probes), which never wait behind the others
+    max_concurrent_jobs: int = 2  # encode lane
+    transcribe_concurrency: int = 1
+    stills_concurrency: int = 4
+    # Niceness of ffmpeg/Whisper processes started by encode and transcribe jobs
+    background_nice: int = 10
+
+    # Where background jobs run: in the API process ("background") or in
+    # separate worker processes fed by a Redis queue ("redis", see worker.py)
+    job_backend: Literal["background", "redis"] = "background"
+    job_queue_prefix: str = "creatorops:jobs"
+    job_visibility_timeout: float = 120.0  # seconds a claim survives without a heartbeat
+    job_max_attempts: int = 3  # deliveries before a job that keeps dying is failed
+    job_status_ttl: int = 7 * 24 * 3600  # seconds job records stay readable
+    # Identical submissions attach to a running job, or reuse a completed
+    # one for this many seconds (0 disables)
+    job_dedup_ttl: int = 3600
+
+    # Per-source analysis results (scene index, ...) keyed by content fingerprint
+    analysis_cache_dir: str = "/tmp/creatorops-processor-cache"
+    analysis_cache_memory_entries: int = 256
+    # On-disk size kept; least recently used sources are removed past it
+    analysis_cache_max_bytes: int = 512 * 1024**2
+
+    # Longest segment /shorts/analyze-loop decodes (seconds); frames are held in memory
+    loop_analysis_max_duration: float = 300.0
+
+    # Rendered outputs (frames, grids, clips, ...) stored under keys hashed
+    # from source and parameters; identical requests reuse them
+    artifact_cache_enabled: bool = True
+    artifact_cache_memory_entries: int = 4096
+
+    # Images processed at once by batch watermarking
+    watermark_batch_concurrency: int = 8
+
+    # Let ffmpeg read time-bounded inputs over HTTP range requests
+    # instead of downloading the whole source first
+    stream_inputs: bool = True
+
+    # Shared HTTP client (downloads and callbacks)
+    http2: bool = True
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+
+    # Job callbacks
+    callback_queue_size: int = 1000
+    callback_workers: int = 4
+    callback_max_retries: int = 5
+    callback_retry_base_delay: float = 0.5  # seconds, doubled on every retry
+    callback_timeout: float = 10.0
+
+    # Tracing (spans are written as JSON lines, no collector needed)
+    tracing_enabled: bool = True
+    trace_dir: str = "/tmp/creatorops-processor-traces"
 
     # Whisper
     whisper_model: str = "base"  # tiny, base, small, medium, large
@@ -0,0 +1,384 @@
+"""Load-test the video processor API with concurrent jobs.
+
+Starts the app in a subprocess on the local storage backend, fires a
+weighted mix of requests at a fixed rate, and reports throughput, job
+completion latency, API latency under load and peak RSS. With several
+``--concurrency`` values it sweeps ``max_concurrent_jobs`` and recommends
+the smallest setting that reaches (almost) peak throughput.
+
+Usage (from apps/video-processor/src):
+
+    python loadtest.py --mix shorts=3,subtitles=1 --rate 1 --duration 60
+    python loadtest.py --mix shorts=1 --concurrency 1,2,4,8 --rate 2 --duration 30
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from typing import Optional
+
+import httpx
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCH_DIR = os.path.join(SRC_DIR, "..", "benchmarks")
+
+# Request builders for each mix entry: (path, payload factory)
+SCENARIOS = {
+    "shorts": ("/shorts/create", lambda media, cb: {
+        "input_url": media["key"],
+        "start_time": 0.0,
+        "end_time": min(15.0, media["duration"]),
+        "callback_url": cb,
+    }),
+    "subtitles": ("/subtitles/generate", lambda media, cb: {
+        "input_url": media["key"],
+        "model_size": "tiny",
+        "callback_url": cb,
+    }),
+    "clips": ("/clips/extract", lambda media, cb: {
+        "input_url": media["key"],
+        "start_time": media["duration"] * 0.25,
+        "end_time": media["duration"] * 0.5,
+        "callback_url": cb,
+    }),
+    "transcode": ("/videos/transcode", lambda media, cb: {
+        "input_url": media["key"],
+        "resolution": "1280x720",
+        "callback_url": cb,
+    }),
+    "thumbnail": ("/thumbnails/extract-frame", lambda media, cb: {
+        "video_url": media["key"],
+        "timestamp": media["duration"] / 2,
+    }),
+}
+
+# Scenarios that answer synchronously; their completion is the HTTP response
+SYNCHRONOUS = {"thumbnail"}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(values: list[float], p: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * p / 100
+    lower = int(k)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (k - lower)
+
+
+def tree_rss_bytes(pid: int) -> int:
+    """Resident memory of a process and all its descendants (Linux /proc)."""
+    children: dict[int, list[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            children.setdefault(ppid, []).append(int(entry))
+        except (OSError, IndexError, ValueError):
+            continue
+
+    total = 0
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        break
+        except OSError:
+            pass
+        stack.extend(children.get(current, []))
+    return total
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario '{name}', choose from: {', '.join(SCENARIOS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+class CallbackReceiver:
+    """Tiny HTTP server that records when job callbacks arrive."""
+
+    def __init__(self):
+        self.port = free_port()
+        self.completions: dict[str, tuple[float, str]] = {}
+        self._server: Optional[asyncio.base_events.Server] = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", self.port)
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    def url(self, token: str) -> str:
+        return f"http://127.0.0.1:{self.port}/callback/{token}"
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    key, _, value = line.decode().partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                token = request_line.decode().split()[1].rsplit("/", 1)[-1]
+                try:
+                    status = json.loads(body or b"{}").get("status", "unknown")
+                except ValueError:
+                    status = "unknown"
+                self.completions.setdefault(token, (time.perf_counter(), status))
+
+                writer.write(b"HTTP/1.1 204 No Content\r\nContent-Length: 0\r\n\r\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+class ServerProcess:
+    """The video processor running in a subprocess with a given job limit."""
+
+    def __init__(self, max_concurrent_jobs: int, storage_root: str, temp_dir: str):
+        self.port = free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self.env = {
+            **os.environ,
+            "MAX_CONCURRENT_JOBS": str(max_concurrent_jobs),
+            "TEMP_DIR": temp_dir,
+            "TRACING_ENABLED": "false",
+            "STORAGE_BACKEND": "local",
+            "LOCAL_STORAGE_ROOT": storage_root,
+        }
+        self.process: Optional[subprocess.Popen] = None
+
+    async def start(self, client: httpx.AsyncClient, timeout: float = 30.0):
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app",
+             "--host", "127.0.0.1", "--port", str(self.port), "--log-level", "warning"],
+            cwd=SRC_DIR,
+            env=self.env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(f"{self.base_url}/health")).is_success:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+        raise RuntimeError("Video processor did not become healthy")
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+async def run_load(args: argparse.Namespace, max_concurrent_jobs: int, media: dict) -> dict:
+    weights = parse_mix(args.mix)
+    names, probs = list(weights), list(weights.values())
+
+    receiver = CallbackReceiver()
+    await receiver.start()
+
+    submitted: dict[str, tuple[str, float]] = {}
+    sync_latencies: list[float] = []
+    api_latencies: list[float] = []
+    health_latencies: list[float] = []
+    errors = 0
+    peak_rss = 0
+
+    async with httpx.AsyncClient(timeout=args.request_timeout) as client:
+        server = ServerProcess(max_concurrent_jobs, args.storage_root, args.temp_dir)
+        await server.start(client)
+
+        async def fire(scenario: str):
+            nonlocal errors
+            path, build = SCENARIOS[scenario]
+            token = uuid.uuid4().hex
+            payload = build(media, receiver.url(token))
+
+            started = time.perf_counter()
+            try:
+                response = await client.post(f"{server.base_url}{path}", json=payload)
+                response.raise_for_status()
+            except httpx.HTTPError:
+                errors += 1
+                return
+            latency = time.perf_counter() - started
+
+            if scenario in SYNCHRONOUS:
+                sync_latencies.append(latency)
+            else:
+                api_latencies.append(latency)
+                submitted[token] = (scenario, started)
+
+        async def watch():
+            nonlocal peak_rss
+            while True:
+                started = time.perf_counter()
+                try:
+                    await client.get(f"{server.base_url}/health")
+                    health_latencies.append(time.perf_counter() - started)
+                except httpx.HTTPError:
+                    pass
+                peak_rss = max(peak_rss, tree_rss_bytes(server.process.pid))
+                await asyncio.sleep(0.5)
+
+        watcher = asyncio.create_task(watch())
+        load_started = time.perf_counter()
+
+        try:
+            # Open-loop arrivals: requests keep coming even when the server is slow
+            tasks = []
+            interval = 1.0 / args.rate
+            next_at = load_started
+            while next_at - load_started < args.duration:
+                tasks.append(asyncio.create_task(fire(random.choices(names, probs)[0])))
+                next_at += interval
+                await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+            await asyncio.gather(*tasks)
+
+            # Drain: wait for outstanding callbacks
+            deadline = time.perf_counter() + args.drain_timeout
+            while time.perf_counter() < deadline and not set(submitted) <= set(receiver.completions):
+                await asyncio.sleep(0.25)
+        finally:
+            watcher.cancel()
+            server.stop()
+            await receiver.stop()
+
+    completion_latencies = []
+    failed = 0
+    last_completion = load_started
+    for token, (scenario, started) in submitted.items():
+        if token not in receiver.completions:
+            continue
+        finished, status = receiver.completions[token]
+        if status != "completed":
+            failed += 1
+            continue
+        completion_latencies.append(finished - started)
+        last_completion = max(last_completion, finished)
+
+    completed = len(completion_latencies) + len(sync_latencies)
+    elapsed = max(last_completion - load_started, args.duration)
+
+    def summary(values: list[float]) -> dict:
+        return {
+            f"p{p}": round(v, 3) if (v := percentile(values, p)) is not None else None
+            for p in (50, 95, 99)
+        }
+
+    return {
+        "max_concurrent_jobs": max_concurrent_jobs,
+        "submitted": len(submitted) + len(sync_latencies),
+        "completed": completed,
+        "failed": failed,
+        "lost": len(set(submitted) - set(receiver.completions)),
+        "request_errors": errors,
+        "throughput_jobs_per_s": round(completed / elapsed, 3),
+        "job_latency_s": summary(completion_latencies + sync_latencies),
+        "submit_latency_s": summary(api_latencies),
+        "health_latency_s": summary(health_latencies),
+        "peak_rss_mb": round(peak_rss / 1024 / 1024, 1),
+    }
+
+
+def recommend(results: list[dict]) -> Optional[dict]:
+    """Smallest setting within 95% of the best throughput."""
+    if not results:
+        return None
+    best = max(r["throughput_jobs_per_s"] for r in results)
+    for result in sorted(results, key=lambda r: r["max_concurrent_jobs"]):
+        if result["throughput_jobs_per_s"] >= best * 0.95:
+            return result
+    return None
+
+
+async def main(args: argparse.Namespace):
+    sys.path.insert(0, BENCH_DIR)
+    from media import generate_test_media
+
+    width, height = (int(x) for x in args.resolution.split("x"))
+    key = f"media/loadtest_{width}x{height}_{int(args.media_duration)}s.mp4"
+    print("Generating test media...")
+    generate_test_media(
+        os.path.join(args.storage_root, key), args.media_duration, width, height
+    )
+    media = {"key": key, "duration": float(args.media_duration)}
+
+    results = []
+    for limit in (int(x) for x in args.concurrency.split(",")):
+        print(f"Running with max_concurrent_jobs={limit}...")
+        result = await run_load(args, limit, media)
+        results.append(result)
+        print(
+            f"  throughput={result['throughput_jobs_per_s']}/s "
+            f"job p50/p95/p99={result['job_latency_s']} "
+            f"health p95={result['health_latency_s']['p95']}s "
+            f"peak_rss={result['peak_rss_mb']}MB "
+            f"failed={result['failed']} lost={result['lost']}"
+        )
+
+    best = recommend(results)
+    if best and len(results) > 1:
+        print(f"Recommended max_concurrent_jobs={best['max_concurrent_jobs']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "results": results, "recommended": best}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    work_dir = os.path.join(tempfile.gettempdir(), "creatorops-loadtest")
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--mix", default="shorts=1", help=f"Weighted scenarios: {', '.join(SCENARIOS)}")
+    parser.add_argument("--rate", type=float, default=1.0, help="Requests per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of load")
+    parser.add_argument("--concurrency", default="2", help="max_concurrent_jobs values to sweep")
+    parser.add_argument("--media-duration", type=float, default=60.0)
+    parser.add_argument("--resolution", default="1280x720")
+    parser.add_argument("--drain-timeout", type=float, default=600.0)
+    parser.add_argument("--request-timeout", type=float, default=120.0)
+    parser.add_argument("--storage-root", default=os.path.join(work_dir, "storage"))
+    parser.add_argument("--temp-dir", default=os.path.join(work_dir, "tmp"))
+    parser.add_argument("--output", help="Write results as JSON")
+    asyncio.run(main(parser.parse_args()))
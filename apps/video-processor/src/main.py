@@ -1,10 +1,15 @@
-import os
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
 from config import get_settings
-from api.routes import health, videos, clips, shorts, subtitles, thumbnails
+from utils.callbacks import callback_dispatcher
+from utils.http import close_http_client
+from utils.queue import job_queue
+from utils.scheduler import api_key_tenant, current_tenant
+from utils.scratch import scratch
+from utils.transcription import transcriber
+from api.routes import health, videos, clips, shorts, subtitles, thumbnails, pipelines
 
 settings = get_settings()
 
@@ -12,11 +17,17 @@ settings = get_settings()
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    os.makedirs(settings.temp_dir, exist_ok=True)
+    # Scratch left by a crashed process would otherwise fill the disk
+    scratch.sweep()
+    callback_dispatcher.start()
     print(f"Video processor starting on port {settings.port}")
     yield
     # Shutdown
     print("Video processor shutting down")
+    await callback_dispatcher.stop()
+    await job_queue.close()
+    transcriber.close()
+    await close_http_client()
 
 
 app = FastAPI(
@@ -34,6 +45,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.middleware("http")
+async def tenant_context(request: Request, call_next):
+    """Account work to the caller's API key, for fair scheduling (see utils/scheduler.py)."""
+    api_key = request.headers.get("x-api-key")
+    if api_key:
+        current_tenant.set(api_key_tenant(api_key))
+    return await call_next(request)
+
+
 # Routes
 app.include_router(health.router, tags=["Health"])
 app.include_router(videos.router, prefix="/videos", tags=["Videos"])
@@ -41,6 +62,7 @@ app.include_router(clips.router, prefix="/clips", tags=["Clips"])
 app.include_router(shorts.router, prefix="/shorts", tags=["Shorts"])
 app.include_router(subtitles.router, prefix="/subtitles", tags=["Subtitles"])
 app.include_router(thumbnails.router, prefix="/thumbnails", tags=["Thumbnails"])
+app.include_router(pipelines.router, prefix="/pipelines", tags=["Pipelines"])
 
 
 if __name__ == "__main__":
@@ -1,19 +1,32 @@
-import os
+import asyncio
 from typing import Optional
 import ffmpeg
-import httpx
+import numpy as np
 
 from config import get_settings
-from utils.storage import StorageClient
+from utils.artifacts import artifact_cache, artifact_key
+from utils.callbacks import callback_dispatcher
+from utils.highlights import read_audio_features, score_windows
+from utils.jobs import track_job
+from utils.media import run_ffmpeg, probe_media
+from utils.queue import queued_job_status
+from utils.scenes import scene_index, snap_to_cuts
+from utils.scratch import scratch_path
+from utils.storage import get_storage
+from utils.tracing import tracer
 
 settings = get_settings()
 
+# Clip edges this close to a shot boundary move onto it
+CUT_SNAP_TOLERANCE = 1.0
+
 
 class ClipExtractor:
     def __init__(self):
-        self.storage = StorageClient()
+        self.storage = get_storage()
         self.jobs: dict[str, dict] = {}
 
+    @track_job("clip")
     async def extract_clip(
         self,
         job_id: str,
@@ -25,17 +38,41 @@ class ClipExtractor:
         fade_out: float,
         callback_url: Optional[str],
     ):
-        """Extract a clip from a video."""
+        """Extract a clip from a video.
+
+        Clips are stored under a key hashed from the request; a clip that
+        was already cut is returned without reading the source.
+        """
         self.jobs[job_id] = {"status": "processing", "progress": 0}
 
         try:
-            local_input = await self.storage.download_temp(input_url)
-            output_path = f"{settings.temp_dir}/{job_id}_clip.{output_format}"
+            key = artifact_key(
+                "clips",
+                input_url,
+                await self.storage.version(input_url),
+                output_format,
+                start_time=start_time,
+                end_time=end_time,
+                fade_in=fade_in,
+                fade_out=fade_out,
+            )
+            cached = await artifact_cache.get(key)
+            if cached:
+                self.jobs[job_id] = {"status": "completed", "progress": 100, **cached}
+                if callback_url:
+                    await callback_dispatcher.send(callback_url, self.jobs[job_id])
+                return
+
+            # Only the [start_time, end_time] window is read from the source
+            source, _ = await self.storage.resolve_input(input_url, seekable=True)
+            output_path = scratch_path(f"{job_id}_clip.{output_format}")
 
             duration = end_time - start_time
 
             # Build filter chain
-            stream = ffmpeg.input(local_input, ss=start_time, t=duration)
+            stream = ffmpeg.input(
+                source, ss=start_time, t=duration, **self.storage.input_options(source)
+            )
 
             # Apply fades if specified
             filters = []
@@ -62,30 +99,22 @@ class ClipExtractor:
             else:
                 stream = stream.output(output_path, c="copy")
 
-            stream.overwrite_output().run(capture_stdout=True, capture_stderr=True)
+            await run_ffmpeg(stream.overwrite_output(), "clip", duration)
 
             # Upload result
-            output_url = await self.storage.upload(output_path, f"clips/{job_id}.{output_format}")
-
-            self.jobs[job_id] = {
-                "status": "completed",
-                "progress": 100,
-                "output_url": output_url,
-                "duration": duration,
-            }
+            stored = await artifact_cache.put(output_path, key, duration=duration)
 
-            # Cleanup
-            os.remove(local_input)
-            os.remove(output_path)
+            self.jobs[job_id] = {"status": "completed", "progress": 100, **stored}
 
             if callback_url:
-                await self._send_callback(callback_url, self.jobs[job_id])
+                await callback_dispatcher.send(callback_url, self.jobs[job_id])
 
         except Exception as e:
             self.jobs[job_id] = {"status": "failed", "error": str(e)}
             if callback_url:
-                await self._send_callback(callback_url, self.jobs[job_id])
+                await callback_dispatcher.send(callback_url, self.jobs[job_id])
 
+    @track_job("detect_clips")
     async def detect_clips(
         self,
         job_id: str,
@@ -95,98 +124,73 @@ class ClipExtractor:
         silence_threshold: float,
         callback_url: Optional[str],
     ):
-        """Detect potential clip points based on audio analysis."""
+        """Detect highlight clips from audio and visual activity.
+
+        Audio is decoded once and reduced to feature arrays chunk by chunk,
+        in parallel with the source's scene index (cached across requests);
+        every candidate window within the duration limits is then scored in
+        one vectorized pass off the event loop, and clip edges are snapped
+        to nearby cuts.
+        """
         self.jobs[job_id] = {"status": "processing", "progress": 0}
 
         try:
             local_input = await self.storage.download_temp(input_url)
 
             # Get video duration
-            probe = ffmpeg.probe(local_input)
+            probe = await probe_media(local_input)
             total_duration = float(probe["format"]["duration"])
-
-            # Detect silence points using ffmpeg
-            import subprocess
-            import re
-
-            cmd = [
-                "ffmpeg", "-i", local_input,
-                "-af", f"silencedetect=n={silence_threshold}dB:d=0.5",
-                "-f", "null", "-"
-            ]
-
-            result = subprocess.run(cmd, capture_output=True, text=True)
-
-            # Parse silence points
-            silence_starts = []
-            silence_ends = []
-
-            for line in result.stderr.split("\n"):
-                if "silence_start:" in line:
-                    match = re.search(r"silence_start: ([\d.]+)", line)
-                    if match:
-                        silence_starts.append(float(match.group(1)))
-                elif "silence_end:" in line:
-                    match = re.search(r"silence_end: ([\d.]+)", line)
-                    if match:
-                        silence_ends.append(float(match.group(1)))
-
-            # Generate clips between silence points
-            clips = []
-            prev_end = 0.0
-
-            for start, end in zip(silence_starts, silence_ends):
-                segment_duration = start - prev_end
-
-                if min_duration <= segment_duration <= max_duration:
-                    # Score based on duration (prefer closer to middle of range)
-                    ideal_duration = (min_duration + max_duration) / 2
-                    score = 1.0 - abs(segment_duration - ideal_duration) / ideal_duration
-
-                    clips.append({
-                        "start_time": prev_end,
-                        "end_time": start,
-                        "duration": segment_duration,
-                        "score": round(score, 2),
-                    })
-
-                prev_end = end
-
-            # Check last segment
-            if prev_end < total_duration:
-                segment_duration = total_duration - prev_end
-                if min_duration <= segment_duration <= max_duration:
-                    ideal_duration = (min_duration + max_duration) / 2
-                    score = 1.0 - abs(segment_duration - ideal_duration) / ideal_duration
-                    clips.append({
-                        "start_time": prev_end,
-                        "end_time": total_duration,
-                        "duration": segment_duration,
-                        "score": round(score, 2),
-                    })
-
-            # Sort by score
-            clips.sort(key=lambda x: x["score"], reverse=True)
+            has_audio = any(s["codec_type"] == "audio" for s in probe["streams"])
+
+            # Audio is analyzed as it decodes, in parallel with the (cached) scene index
+            audio, scenes = await asyncio.gather(
+                read_audio_features(local_input) if has_audio else _none(),
+                scene_index(local_input, probe),
+            )
+
+            self.jobs[job_id]["progress"] = 70
+
+            with tracer.span("highlights.score", stage="analysis"):
+                clips = await asyncio.to_thread(
+                    score_windows,
+                    total_duration,
+                    min_duration,
+                    max_duration,
+                    silence_threshold,
+                    audio=audio,
+                    scenes=np.asarray(scenes["scores"]),
+                    scene_fps=scenes["fps"],
+                )
+                clips = _snap_clips(clips, scenes["cuts"], min_duration, max_duration)
 
             self.jobs[job_id] = {
                 "status": "completed",
                 "progress": 100,
-                "clips": clips[:20],  # Return top 20
+                "clips": clips,  # Top 20, best first
             }
 
-            os.remove(local_input)
-
             if callback_url:
-                await self._send_callback(callback_url, self.jobs[job_id])
+                await callback_dispatcher.send(callback_url, self.jobs[job_id])
 
         except Exception as e:
             self.jobs[job_id] = {"status": "failed", "error": str(e)}
             if callback_url:
-                await self._send_callback(callback_url, self.jobs[job_id])
+                await callback_dispatcher.send(callback_url, self.jobs[job_id])
 
-    async def _send_callback(self, url: str, data: dict):
-        try:
-            async with httpx.AsyncClient() as client:
-                await client.post(url, json=data, timeout=10)
-        except Exception:
-            pass
+    async def get_job_status(self, job_id: str) -> Optional[dict]:
+        return self.jobs.get(job_id) or await queued_job_status(job_id)
+
+
+async def _none():
+    return None
+
+
+def _snap_clips(clips: list[dict], cuts: list[float], min_duration: float, max_duration: float):
+    """Move clip edges onto nearby shot boundaries while the length stays in range."""
+    for clip in clips:
+        start, end = snap_to_cuts(
+            [clip["start_time"], clip["end_time"]], cuts, CUT_SNAP_TOLERANCE
+        )
+        if min_duration <= end - start <= max_duration:
+            clip.update(start_time=start, end_time=end, duration=round(end - start, 2))
+    return clips
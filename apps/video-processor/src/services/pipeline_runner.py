@@ -0,0 +1,415 @@
+import asyncio
+from collections import Counter
+from typing import Optional
+import ffmpeg
+
+from config import get_settings
+from utils.callbacks import callback_dispatcher
+from utils.filters import (
+    SHORTS_HEIGHT,
+    SHORTS_WIDTH,
+    burn_subtitles,
+    crop_vertical,
+    normalize_loudness,
+    subtitle_force_style,
+)
+from utils.jobs import track_job
+from utils.media import run_ffmpeg, probe_media
+from utils.queue import queued_job_status
+from utils.scratch import scratch_path
+from utils.storage import get_storage
+
+settings = get_settings()
+
+# Operations that turn a video stream into another video stream
+VIDEO_OPS = {"cut", "crop_vertical", "burn_subtitles", "normalize_audio"}
+OPS = VIDEO_OPS | {"probe", "thumbnail"}
+
+REQUIRED_PARAMS = {
+    "cut": ("start_time", "end_time"),
+    "burn_subtitles": ("subtitles_url",),
+}
+
+IMAGE_FORMATS = {"jpg", "png", "webp"}
+
+
+class PipelineRunner:
+    """Run a DAG of operations on one source video with a single ffmpeg pass.
+
+    Steps read either ``source`` or an earlier step. The whole graph is
+    compiled into one filter graph with one output per requested artifact,
+    so nothing is re-encoded or uploaded between steps. Cuts taken straight
+    from the source (and thumbnails of such cuts) become separate seeking
+    inputs, so only the needed ranges are decoded.
+    """
+
+    def __init__(self):
+        self.storage = get_storage()
+        self.jobs: dict[str, dict] = {}
+
+    def validate(self, steps: list[dict], outputs: list[str]):
+        """Check that steps form a DAG in order; raises ``ValueError``."""
+        kinds = {"source": "video"}
+
+        for step in steps:
+            step_id, op, source = step["id"], step["op"], step["input"]
+            params = step.get("params", {})
+
+            if step_id in kinds:
+                raise ValueError(f"Duplicate step id '{step_id}'")
+            if op not in OPS:
+                raise ValueError(f"Step '{step_id}': unknown op '{op}'")
+            if source not in kinds:
+                raise ValueError(
+                    f"Step '{step_id}' reads '{source}', which is not 'source' or an earlier step"
+                )
+            if op != "probe" and kinds[source] != "video":
+                raise ValueError(f"Step '{step_id}': '{source}' does not produce video")
+
+            missing = [key for key in REQUIRED_PARAMS.get(op, ()) if key not in params]
+            if missing:
+                raise ValueError(f"Step '{step_id}': missing params {', '.join(missing)}")
+            if op == "cut" and params["end_time"] <= params["start_time"]:
+                raise ValueError(f"Step '{step_id}': invalid time range")
+            if op == "thumbnail" and params.get("format", "jpg") not in IMAGE_FORMATS:
+                raise ValueError(f"Step '{step_id}': unsupported image format")
+
+            kinds[step_id] = "video" if op in VIDEO_OPS else op
+
+        if not outputs:
+            raise ValueError("At least one output is required")
+        for output in outputs:
+            if output == "source" or output not in kinds:
+                raise ValueError(f"Unknown output '{output}'")
+
+    @track_job("pipeline")
+    async def run(
+        self,
+        job_id: str,
+        input_url: str,
+        steps: list[dict],
+        outputs: list[str],
+        output_format: str,
+        callback_url: Optional[str],
+    ):
+        """Run a pipeline and upload its outputs."""
+        self.jobs[job_id] = {"status": "processing", "progress": 0}
+
+        try:
+            # Only the ranges the graph reads are fetched from the source
+            source, _ = await self.storage.resolve_input(input_url, seekable=True)
+
+            graph = PipelineGraph(
+                source,
+                await probe_media(source),
+                self.storage.input_options(source),
+                steps,
+                outputs,
+            )
+
+            # Subtitles only for the steps the outputs actually go through
+            burns = [
+                node_id for node_id in graph.needed
+                if graph.steps[node_id]["op"] == "burn_subtitles"
+            ]
+            paths = await asyncio.gather(*(
+                self.storage.download_temp(graph.steps[node_id]["params"]["subtitles_url"])
+                for node_id in burns
+            ))
+            graph.subtitles.update(zip(burns, paths))
+
+            self.jobs[job_id]["progress"] = 10
+
+            results = {}
+            streams = []
+            files = {}
+            for node_id in outputs:
+                step = graph.steps[node_id]
+
+                if step["op"] == "probe":
+                    results[node_id] = graph.meta(step["input"])
+                    continue
+
+                if step["op"] == "thumbnail":
+                    ext = step["params"].get("format", "jpg")
+                    path = scratch_path(f"{job_id}_{node_id}.{ext}")
+                    streams.append(ffmpeg.output(graph.thumbnail(node_id), path, vframes=1))
+                else:
+                    ext = output_format
+                    path = scratch_path(f"{job_id}_{node_id}.{ext}")
+                    video, audio = graph.take(node_id)
+                    options = {}
+                    if graph.meta(node_id)["fps"]:
+                        # setpts in the graph drops the frame rate; keep the source's
+                        options["r"] = graph.meta(node_id)["fps"]
+
+                    streams.append(ffmpeg.output(
+                        *([video, audio] if audio is not None else [video]),
+                        path,
+                        vcodec="libx264",
+                        acodec="aac",
+                        preset="medium",
+                        crf=23,
+                        movflags="+faststart",
+                        **options,
+                    ))
+
+                files[node_id] = path
+
+            if streams:
+                durations = [
+                    graph.meta(node_id)["duration"]
+                    for node_id in files
+                    if graph.steps[node_id]["op"] in VIDEO_OPS
+                ]
+                await run_ffmpeg(
+                    ffmpeg.merge_outputs(*streams).overwrite_output(),
+                    "pipeline",
+                    max(filter(None, durations), default=None),
+                )
+
+            self.jobs[job_id]["progress"] = 90
+
+            # Only the requested artifacts leave the machine
+            for node_id, path in files.items():
+                ext = path.rsplit(".", 1)[-1]
+                results[node_id] = {
+                    "output_url": await self.storage.upload(
+                        path, f"pipelines/{job_id}/{node_id}.{ext}"
+                    ),
+                    **graph.meta(node_id),
+                }
+
+            self.jobs[job_id] = {
+                "status": "completed",
+                "progress": 100,
+                "outputs": results,
+            }
+
+            if callback_url:
+                await callback_dispatcher.send(callback_url, self.jobs[job_id])
+
+        except Exception as e:
+            self.jobs[job_id] = {"status": "failed", "error": str(e)}
+            if callback_url:
+                await callback_dispatcher.send(callback_url, self.jobs[job_id])
+
+    async def get_job_status(self, job_id: str) -> Optional[dict]:
+        return self.jobs.get(job_id) or await queued_job_status(job_id)
+
+
+class PipelineGraph:
+    """Builds ffmpeg-python streams for validated pipeline steps.
+
+    Each video node yields a ``(video, audio)`` pair; nodes read by more
+    than one consumer are split so they are only computed once. ``needed``
+    holds the steps the outputs depend on; the local subtitle file of each
+    needed ``burn_subtitles`` step goes in ``subtitles`` before building.
+    """
+
+    def __init__(
+        self,
+        source: str,
+        probe: dict,
+        input_options: dict,
+        steps: list[dict],
+        outputs: list[str],
+    ):
+        self.source = source
+        self.input_options = input_options
+        self.steps = {step["id"]: {"params": {}, **step} for step in steps}
+        self.subtitles: dict[str, str] = {}
+
+        video_stream = next(s for s in probe["streams"] if s["codec_type"] == "video")
+        self.has_audio = any(s["codec_type"] == "audio" for s in probe["streams"])
+        self._meta = {
+            "source": {
+                "width": int(video_stream["width"]),
+                "height": int(video_stream["height"]),
+                "duration": float(probe["format"].get("duration", 0)) or None,
+                "offset": 0.0,
+                "fps": video_stream.get("r_frame_rate") or video_stream.get("avg_frame_rate"),
+            }
+        }
+
+        self._branches: dict[str, list] = {}
+        self.needed = self._needed(outputs)
+        self._video_uses, self._audio_uses = self._count_uses(outputs)
+
+    def meta(self, node_id: str) -> dict:
+        """Dimensions, duration and source offset of a node's output."""
+        if node_id in self._meta:
+            return self._meta[node_id]
+
+        step = self.steps[node_id]
+        parent = self.meta(step["input"])
+        params = step["params"]
+        meta = dict(parent)
+
+        if step["op"] == "cut":
+            end = params["end_time"]
+            if parent["duration"]:
+                end = min(end, parent["duration"])
+            meta["duration"] = max(float(end - params["start_time"]), 0.0)
+            meta["offset"] = parent["offset"] + params["start_time"]
+        elif step["op"] == "crop_vertical":
+            meta["width"], meta["height"] = SHORTS_WIDTH, SHORTS_HEIGHT
+        elif step["op"] == "thumbnail":
+            meta = self._thumbnail_size(parent, params)
+
+        self._meta[node_id] = meta
+        return meta
+
+    def take(self, node_id: str, with_audio: bool = True) -> tuple:
+        """Next unused ``(video, audio)`` branch of a node."""
+        if node_id not in self._branches:
+            self._branches[node_id] = self._split(node_id, *self._build(node_id))
+
+        videos, audios = self._branches[node_id]
+        return videos.pop(), audios.pop() if with_audio and audios else None
+
+    def thumbnail(self, node_id: str):
+        """Single-frame video stream for a thumbnail node."""
+        step = self.steps[node_id]
+        params = step["params"]
+        timestamp = params.get("timestamp", 0.0)
+
+        if self._is_plain(step["input"]):
+            video = self._seek(self.meta(step["input"])["offset"] + timestamp).video
+        else:
+            video, _ = self.take(step["input"], with_audio=False)
+            video = video.trim(start=timestamp).setpts("PTS-STARTPTS")
+
+        size = self._thumbnail_size(self.meta(step["input"]), params)
+        if (size["width"], size["height"]) != (
+            self.meta(step["input"])["width"], self.meta(step["input"])["height"]
+        ):
+            video = video.filter("scale", size["width"], size["height"])
+        return video
+
+    def _build(self, node_id: str) -> tuple:
+        if node_id == "source":
+            stream = self._seek(0.0)
+            return stream.video, stream.audio if self.has_audio else None
+
+        step = self.steps[node_id]
+        params = step["params"]
+        op = step["op"]
+
+        if op == "cut" and self._is_plain(step["input"]):
+            meta = self.meta(node_id)
+            stream = self._seek(meta["offset"], meta["duration"])
+            return stream.video, stream.audio if self.has_audio else None
+
+        video, audio = self.take(step["input"])
+        parent = self.meta(step["input"])
+
+        if op == "cut":
+            video = video.trim(start=params["start_time"], end=params["end_time"])
+            video = video.setpts("PTS-STARTPTS")
+            if audio is not None:
+                audio = audio.filter("atrim", start=params["start_time"], end=params["end_time"])
+                audio = audio.filter("asetpts", "PTS-STARTPTS")
+        elif op == "crop_vertical":
+            video = crop_vertical(
+                video, parent["width"], parent["height"], params.get("crop_position", "center")
+            )
+        elif op == "burn_subtitles":
+            style = subtitle_force_style(**{
+                key: params[key]
+                for key in (
+                    "font_name", "font_size", "font_color", "outline_color",
+                    "outline_width", "position", "margin_v",
+                )
+                if key in params
+            })
+            video = burn_subtitles(video, self.subtitles[node_id], style, parent["offset"])
+        elif op == "normalize_audio" and audio is not None:
+            audio = normalize_loudness(audio, params.get("target_lufs", -14.0))
+
+        return video, audio
+
+    def _split(self, node_id: str, video, audio) -> tuple[list, list]:
+        video_uses = self._video_uses[node_id]
+        audio_uses = self._audio_uses[node_id] if audio is not None else 0
+
+        videos = [video] if video_uses <= 1 else list(_split(video, "split", video_uses))
+        if audio_uses <= 1:
+            audios = [audio] if audio_uses else []
+        else:
+            audios = list(_split(audio, "asplit", audio_uses))
+        return videos, audios
+
+    def _seek(self, offset: float, duration: Optional[float] = None):
+        options = dict(self.input_options)
+        if offset:
+            options["ss"] = offset
+        if duration:
+            options["t"] = duration
+        return ffmpeg.input(self.source, **options)
+
+    def _is_plain(self, node_id: str) -> bool:
+        """Whether a node is the source or only cuts of it (so it can be seeked)."""
+        while node_id != "source":
+            step = self.steps[node_id]
+            if step["op"] != "cut":
+                return False
+            node_id = step["input"]
+        return True
+
+    def _reads_input(self, step: dict) -> bool:
+        """Whether a step consumes its input's streams (rather than seeking)."""
+        if step["op"] == "probe":
+            return False
+        if step["op"] in ("cut", "thumbnail") and self._is_plain(step["input"]):
+            return False
+        return True
+
+    def _needed(self, outputs: list[str]) -> set[str]:
+        """Steps the outputs depend on."""
+        needed = set()
+        pending = list(outputs)
+        while pending:
+            node_id = pending.pop()
+            if node_id != "source" and node_id not in needed:
+                needed.add(node_id)
+                pending.append(self.steps[node_id]["input"])
+        return needed
+
+    def _count_uses(self, outputs: list[str]) -> tuple[Counter, Counter]:
+        video_uses, audio_uses = Counter(), Counter()
+        for node_id in outputs:
+            if self.steps[node_id]["op"] in VIDEO_OPS:
+                video_uses[node_id] += 1
+                audio_uses[node_id] += 1
+
+        # Steps are in topological order, so walking them backwards sees every
+        # consumer of a node before the node itself
+        for node_id in reversed(list(self.steps)):
+            step = self.steps[node_id]
+            if node_id not in self.needed or not self._reads_input(step):
+                continue
+            video_uses[step["input"]] += 1
+            if audio_uses[node_id]:
+                audio_uses[step["input"]] += 1
+
+        return video_uses, audio_uses
+
+    def _thumbnail_size(self, parent: dict, params: dict) -> dict:
+        width, height = params.get("width"), params.get("height")
+        if width and not height:
+            height = round(parent["height"] * width / parent["width"] / 2) * 2
+        elif height and not width:
+            width = round(parent["width"] * height / parent["height"] / 2) * 2
+        return {
+            "width": width or parent["width"],
+            "height": height or parent["height"],
+            "duration": None,
+            "fps": None,
+            "offset": parent["offset"] + params.get("timestamp", 0.0),
+        }
+
+
+def _split(stream, filter_name: str, count: int):
+    node = stream.filter_multi_output(filter_name, count)
+    return (node.stream(i) for i in range(count))
@@ -1,23 +1,37 @@
-import os
+import asyncio
 from typing import Optional, Literal
 import ffmpeg
-import httpx
+import numpy as np
 
 from config import get_settings
-from utils.storage import StorageClient
+from utils.analysis import analysis_size, read_audio_samples, read_gray_frames
+from utils.callbacks import callback_dispatcher
+from utils.filters import (
+    burn_subtitles,
+    crop_vertical,
+    crossfade_loop,
+    subtitle_force_style,
+    vertical_crop,
+)
+from utils.jobs import track_job
+from utils.loops import AUDIO_RATE, LOOP_FPS, LOOP_WIDTH, find_loop_points
+from utils.media import run_ffmpeg, probe_media
+from utils.queue import queued_job_status
+from utils.reframe import REFRAME_FPS, REFRAME_WIDTH, sendcmd_script, track_window
+from utils.scratch import scratch_path
+from utils.storage import get_storage
+from utils.subtitles import write_srt
+from utils.tracing import tracer
 
 settings = get_settings()
 
-# YouTube Shorts dimensions
-SHORTS_WIDTH = 1080
-SHORTS_HEIGHT = 1920
-
 
 class ShortsCreator:
     def __init__(self):
-        self.storage = StorageClient()
+        self.storage = get_storage()
         self.jobs: dict[str, dict] = {}
 
+    @track_job("short")
     async def create_short(
         self,
         job_id: str,
@@ -31,63 +45,104 @@ class ShortsCreator:
         text_position: Literal["top", "center", "bottom"],
         output_format: str,
         callback_url: Optional[str],
+        subtitles_url: Optional[str] = None,
+        subtitle_segments: Optional[list[dict]] = None,
+        subtitle_style: Optional[dict] = None,
+        loop_point: Optional[float] = None,
+        detect_loop_point: bool = False,
     ):
-        """Create a YouTube Short from a video segment."""
+        """Create a YouTube Short from a video segment.
+
+        Subtitles (a file or segments, timed against the source video) are
+        burned in the same encode as the crop, so a captioned short costs a
+        single x264 pass.
+
+        With ``enable_loop`` the short runs from ``start_time`` to the loop
+        point and its last ``loop_crossfade`` seconds blend into its start.
+        The loop point is ``loop_point``, the best match found in the second
+        half of the segment with ``detect_loop_point``, or
+        ``end_time - loop_crossfade``.
+        """
         self.jobs[job_id] = {"status": "processing", "progress": 0}
 
         try:
-            local_input = await self.storage.download_temp(input_url)
-            output_path = f"{settings.temp_dir}/{job_id}_short.{output_format}"
+            # Only the [start_time, end_time] window is read from the source
+            source, _ = await self.storage.resolve_input(input_url, seekable=True)
+            output_path = scratch_path(f"{job_id}_short.{output_format}")
 
             duration = end_time - start_time
 
             # Get input dimensions
-            probe = ffmpeg.probe(local_input)
+            probe = await probe_media(source)
             video_stream = next(s for s in probe["streams"] if s["codec_type"] == "video")
             in_width = int(video_stream["width"])
             in_height = int(video_stream["height"])
+            fps = video_stream.get("r_frame_rate") or video_stream.get("avg_frame_rate")
 
-            # Calculate crop for 9:16 aspect ratio
-            target_ratio = SHORTS_WIDTH / SHORTS_HEIGHT  # 0.5625
-            current_ratio = in_width / in_height
-
-            if current_ratio > target_ratio:
-                # Video is wider than 9:16 - crop sides
-                crop_height = in_height
-                crop_width = int(in_height * target_ratio)
-
-                if crop_position == "left":
-                    x_offset = 0
-                elif crop_position == "right":
-                    x_offset = in_width - crop_width
-                elif crop_position == "center":
-                    x_offset = (in_width - crop_width) // 2
-                else:  # auto - use center
-                    x_offset = (in_width - crop_width) // 2
-
-                crop_filter = f"crop={crop_width}:{crop_height}:{x_offset}:0"
+            read_duration = duration
+            if enable_loop and loop_crossfade > 0:
+                if loop_point is None and detect_loop_point:
+                    points = await self._score_loop_points(
+                        source,
+                        probe,
+                        start_time,
+                        end_time,
+                        max(loop_crossfade, 0.5),
+                        earliest=duration / 2,
+                    )
+                    loop_point = points[0][0] if points else None
+                if loop_point is None:
+                    loop_point = end_time - loop_crossfade
+
+                loop_length = loop_point - start_time
+                if loop_length < 2 * loop_crossfade:
+                    raise ValueError("Loop is too short for the crossfade")
+
+                # The crossfade blends in the loop_crossfade seconds after the loop point
+                duration = loop_length
+                read_duration = loop_length + loop_crossfade
             else:
-                # Video is taller or equal - crop top/bottom
-                crop_width = in_width
-                crop_height = int(in_width / target_ratio)
-                y_offset = (in_height - crop_height) // 2
-                crop_filter = f"crop={crop_width}:{crop_height}:0:{y_offset}"
+                loop_point = None
 
             # Build filter chain
-            stream = ffmpeg.input(local_input, ss=start_time, t=duration)
-            video = stream.video
-
-            # Apply crop
-            video = video.filter("crop", **self._parse_crop(crop_filter))
+            stream = ffmpeg.input(
+                source, ss=start_time, t=read_duration, **self.storage.input_options(source)
+            )
 
-            # Scale to Shorts dimensions
-            video = video.filter("scale", SHORTS_WIDTH, SHORTS_HEIGHT)
+            if crop_position == "auto":
+                commands_path = scratch_path(f"{job_id}_reframe.txt")
+                with open(commands_path, "w") as f:
+                    f.write(await self._reframe_commands(
+                        source, in_width, in_height, start_time, duration
+                    ))
+            else:
+                commands_path = None
+
+            # Crop to 9:16 and scale to Shorts dimensions
+            video = crop_vertical(stream.video, in_width, in_height, crop_position, commands_path)
+            output_options = {}
+
+            local_subs = None
+            if subtitles_url:
+                local_subs = await self.storage.download_temp(subtitles_url)
+            elif subtitle_segments:
+                local_subs = scratch_path(f"{job_id}_short.srt")
+                write_srt(local_subs, [
+                    seg for seg in subtitle_segments
+                    if seg["end"] > start_time and seg["start"] < end_time
+                ])
+
+            if local_subs:
+                video = burn_subtitles(
+                    video, local_subs, subtitle_force_style(**(subtitle_style or {})), start_time
+                )
+                # The time shift drops the stream's frame rate; keep the source's
+                if fps:
+                    output_options["r"] = fps
 
-            # Apply loop crossfade if enabled
-            if enable_loop and loop_crossfade > 0:
-                # This is simplified - full loop implementation would need complex filtering
-                video = video.filter("fade", t="in", st=0, d=loop_crossfade)
-                video = video.filter("fade", t="out", st=duration - loop_crossfade, d=loop_crossfade)
+            audio = stream.audio
+            if loop_point is not None:
+                video, audio = crossfade_loop(video, audio, duration, loop_crossfade, fps)
 
             # Add text overlay if specified
             if text_overlay:
@@ -110,16 +165,19 @@ class ShortsCreator:
             # Output with proper encoding for Shorts
             output = ffmpeg.output(
                 video,
-                stream.audio,
+                audio,
                 output_path,
                 vcodec="libx264",
                 acodec="aac",
                 preset="medium",
                 crf=23,
+                # xfade may negotiate 4:4:4, which most players reject
+                pix_fmt="yuv420p",
                 movflags="+faststart",
+                **output_options,
             )
 
-            output.overwrite_output().run(capture_stdout=True, capture_stderr=True)
+            await run_ffmpeg(output.overwrite_output(), "short", duration)
 
             # Upload result
             output_url = await self.storage.upload(output_path, f"shorts/{job_id}.{output_format}")
@@ -129,19 +187,53 @@ class ShortsCreator:
                 "progress": 100,
                 "output_url": output_url,
             }
-
-            # Cleanup
-            os.remove(local_input)
-            os.remove(output_path)
+            if loop_point is not None:
+                self.jobs[job_id]["loop_point"] = round(loop_point, 2)
 
             if callback_url:
-                await self._send_callback(callback_url, self.jobs[job_id])
+                await callback_dispatcher.send(callback_url, self.jobs[job_id])
 
         except Exception as e:
             self.jobs[job_id] = {"status": "failed", "error": str(e)}
             if callback_url:
-                await self._send_callback(callback_url, self.jobs[job_id])
+                await callback_dispatcher.send(callback_url, self.jobs[job_id])
+
+    async def _reframe_commands(
+        self,
+        source: str,
+        in_width: int,
+        in_height: int,
+        start_time: float,
+        duration: float,
+    ) -> str:
+        """Track the most salient 9:16 window and return a sendcmd script for it."""
+        width, height = analysis_size(in_width, in_height, REFRAME_WIDTH)
+
+        with tracer.span("reframe.analyze", stage="analysis"):
+            frames = await read_gray_frames(
+                source,
+                width,
+                height,
+                REFRAME_FPS,
+                start_time,
+                duration,
+                self.storage.input_options(source),
+            )
+
+            box = vertical_crop(in_width, in_height)
+            if box["w"] < in_width:
+                axis, attribute, window = 2, "x", box["w"] * width / in_width
+                scale, limit = in_width / width, in_width - box["w"]
+            else:
+                axis, attribute, window = 1, "y", box["h"] * height / in_height
+                scale, limit = in_height / height, in_height - box["h"]
+
+            offsets = await asyncio.to_thread(
+                track_window, frames, int(round(window)), axis, REFRAME_FPS
+            )
+            return sendcmd_script(offsets, REFRAME_FPS, scale, limit, attribute)
 
+    @track_job("loop_analysis")
     async def analyze_loop_points(
         self,
         job_id: str,
@@ -150,54 +242,73 @@ class ShortsCreator:
         end_time: float,
         search_window: float,
     ):
-        """Analyze video to find good loop points."""
+        """Find points where the segment can loop back to ``start_time``.
+
+        Candidates are ranked by how well the ``search_window`` seconds
+        from them match the first ``search_window`` seconds of the segment,
+        visually and in the audio.
+        """
         self.jobs[job_id] = {"status": "processing", "progress": 0}
 
         try:
-            # This is a simplified implementation
-            # A full implementation would use audio analysis and visual similarity
+            source, _ = await self.storage.resolve_input(input_url, seekable=True)
 
-            duration = end_time - start_time
-            loop_points = []
-
-            # Check evenly spaced points
-            num_points = int(duration / search_window)
-            for i in range(num_points):
-                timestamp = start_time + (i * search_window)
-                # In a real implementation, calculate similarity score
-                confidence = 0.5 + (0.5 * (1 - abs(i - num_points / 2) / (num_points / 2)))
-                loop_points.append({
-                    "timestamp": round(timestamp, 2),
-                    "confidence": round(confidence, 2),
-                })
-
-            # Sort by confidence
-            loop_points.sort(key=lambda x: x["confidence"], reverse=True)
+            points = await self._score_loop_points(
+                source, await probe_media(source), start_time, end_time, search_window
+            )
+
+            loop_points = [
+                {"timestamp": round(timestamp, 2), "confidence": round(confidence, 3)}
+                for timestamp, confidence in points
+            ]
 
             self.jobs[job_id] = {
                 "status": "completed",
                 "progress": 100,
-                "loop_points": loop_points[:10],
+                "loop_points": loop_points,
                 "best_loop": loop_points[0] if loop_points else None,
             }
 
         except Exception as e:
             self.jobs[job_id] = {"status": "failed", "error": str(e)}
 
-    def _parse_crop(self, crop_str: str) -> dict:
-        """Parse crop filter string into dict."""
-        # crop=w:h:x:y
-        parts = crop_str.replace("crop=", "").split(":")
-        return {
-            "w": int(parts[0]),
-            "h": int(parts[1]),
-            "x": int(parts[2]),
-            "y": int(parts[3]),
-        }
-
-    async def _send_callback(self, url: str, data: dict):
-        try:
-            async with httpx.AsyncClient() as client:
-                await client.post(url, json=data, timeout=10)
-        except Exception:
-            pass
+    async def _score_loop_points(
+        self,
+        source: str,
+        probe: dict,
+        start_time: float,
+        end_time: float,
+        search_window: float,
+        earliest: float = 0.0,
+    ) -> list[tuple[float, float]]:
+        """Ranked ``(timestamp, confidence)`` loop points in ``[start_time, end_time]``."""
+        # Candidates up to end_time need a window of frames after them
+        duration = end_time - start_time + search_window
+
+        video_stream = next(s for s in probe["streams"] if s["codec_type"] == "video")
+        has_audio = any(s["codec_type"] == "audio" for s in probe["streams"])
+        width, height = analysis_size(
+            int(video_stream["width"]), int(video_stream["height"]), LOOP_WIDTH
+        )
+        input_options = self.storage.input_options(source)
+
+        # Video and audio decode in parallel
+        frames, samples = await asyncio.gather(
+            read_gray_frames(source, width, height, LOOP_FPS, start_time, duration, input_options),
+            read_audio_samples(source, AUDIO_RATE, start_time, duration, input_options)
+            if has_audio else _no_audio(),
+        )
+
+        with tracer.span("loops.score", stage="analysis", frames=len(frames)):
+            points = await asyncio.to_thread(
+                find_loop_points, frames, samples, search_window, earliest=earliest
+            )
+
+        return [(start_time + offset, confidence) for offset, confidence in points]
+
+    async def get_job_status(self, job_id: str) -> Optional[dict]:
+        return self.jobs.get(job_id) or await queued_job_status(job_id)
+
+
+async def _no_audio() -> np.ndarray:
+    return np.zeros(0, np.float32)
@@ -1,28 +1,30 @@
-import os
+import time
+import wave
 from typing import Optional, Literal
 import ffmpeg
-import httpx
 
 from config import get_settings
-from utils.storage import StorageClient
+from utils.callbacks import callback_dispatcher
+from utils.filters import burn_subtitles, subtitle_force_style
+from utils.jobs import track_job
+from utils.media import run_ffmpeg, probe_duration
+from utils.metrics import WHISPER_SECONDS_PER_AUDIO_SECOND
+from utils.queue import queued_job_status
+from utils.scratch import scratch_path
+from utils.storage import get_storage
+from utils.subtitles import write_srt, write_vtt
+from utils.tracing import tracer
+from utils.transcription import transcriber
 
 settings = get_settings()
 
 
 class SubtitleGenerator:
     def __init__(self):
-        self.storage = StorageClient()
+        self.storage = get_storage()
         self.jobs: dict[str, dict] = {}
-        self._whisper_model = None
-
-    def _get_whisper_model(self, model_size: str):
-        """Lazy load Whisper model."""
-        if self._whisper_model is None or self._whisper_model_size != model_size:
-            import whisper
-            self._whisper_model = whisper.load_model(model_size)
-            self._whisper_model_size = model_size
-        return self._whisper_model
 
+    @track_job("subtitle", lane="transcribe")
     async def generate(
         self,
         job_id: str,
@@ -41,20 +43,18 @@ class SubtitleGenerator:
             local_input = await self.storage.download_temp(input_url)
 
             # Extract audio for Whisper
-            audio_path = f"{settings.temp_dir}/{job_id}_audio.wav"
-            (
+            audio_path = scratch_path(f"{job_id}_audio.wav")
+            await run_ffmpeg(
                 ffmpeg
                 .input(local_input)
                 .output(audio_path, acodec="pcm_s16le", ac=1, ar=16000)
-                .overwrite_output()
-                .run(capture_stdout=True, capture_stderr=True)
+                .overwrite_output(),
+                "subtitle_audio",
             )
 
             self.jobs[job_id]["progress"] = 20
 
-            # Load model and transcribe
-            model = self._get_whisper_model(model_size)
-
+            # Transcribe in the Whisper process (loads the model on first use)
             transcribe_options = {
                 "word_timestamps": word_timestamps,
                 "verbose": False,
@@ -66,7 +66,16 @@ class SubtitleGenerator:
             if translate_to:
                 transcribe_options["task"] = "translate"
 
-            result = model.transcribe(audio_path, **transcribe_options)
+            with wave.open(audio_path, "rb") as wav:
+                audio_seconds = wav.getnframes() / wav.getframerate()
+
+            started = time.perf_counter()
+            with tracer.span("whisper.transcribe", stage="transcribe", model=model_size):
+                result = await transcriber.transcribe(model_size, audio_path, transcribe_options)
+            if audio_seconds > 0:
+                WHISPER_SECONDS_PER_AUDIO_SECOND.labels(model_size).observe(
+                    (time.perf_counter() - started) / audio_seconds
+                )
 
             self.jobs[job_id]["progress"] = 80
 
@@ -82,12 +91,12 @@ class SubtitleGenerator:
                 })
 
             # Generate subtitle file
-            output_path = f"{settings.temp_dir}/{job_id}_subtitles.{output_format}"
+            output_path = scratch_path(f"{job_id}_subtitles.{output_format}")
 
             if output_format == "srt":
-                self._write_srt(output_path, segments)
+                write_srt(output_path, segments)
             elif output_format == "vtt":
-                self._write_vtt(output_path, segments)
+                write_vtt(output_path, segments)
             else:  # json
                 import json
                 with open(output_path, "w") as f:
@@ -106,19 +115,15 @@ class SubtitleGenerator:
                 "segments": segments,
             }
 
-            # Cleanup
-            os.remove(local_input)
-            os.remove(audio_path)
-            os.remove(output_path)
-
             if callback_url:
-                await self._send_callback(callback_url, self.jobs[job_id])
+                await callback_dispatcher.send(callback_url, self.jobs[job_id])
 
         except Exception as e:
             self.jobs[job_id] = {"status": "failed", "error": str(e)}
             if callback_url:
-                await self._send_callback(callback_url, self.jobs[job_id])
+                await callback_dispatcher.send(callback_url, self.jobs[job_id])
 
+    @track_job("burn_subtitles")
     async def burn_subtitles(
         self,
         job_id: str,
@@ -139,28 +144,24 @@ class SubtitleGenerator:
         try:
             local_video = await self.storage.download_temp(video_url)
             local_subs = await self.storage.download_temp(subtitles_url)
-            output_path = f"{settings.temp_dir}/{job_id}_burned.mp4"
-
-            # Build subtitle filter
-            alignment = {"top": 6, "center": 10, "bottom": 2}[position]
-
-            subtitle_filter = (
-                f"subtitles={local_subs}:force_style='"
-                f"FontName={font_name},"
-                f"FontSize={font_size},"
-                f"PrimaryColour=&H{self._color_to_ass(font_color)},"
-                f"OutlineColour=&H{self._color_to_ass(outline_color)},"
-                f"Outline={outline_width},"
-                f"Alignment={alignment},"
-                f"MarginV={margin_v}'"
+            output_path = scratch_path(f"{job_id}_burned.mp4")
+
+            style = subtitle_force_style(
+                font_name, font_size, font_color, outline_color, outline_width, position, margin_v
             )
 
-            (
+            stream = ffmpeg.input(local_video)
+            await run_ffmpeg(
                 ffmpeg
-                .input(local_video)
-                .output(output_path, vf=subtitle_filter, c_a="copy")
-                .overwrite_output()
-                .run(capture_stdout=True, capture_stderr=True)
+                .output(
+                    burn_subtitles(stream.video, local_subs, style),
+                    stream["a?"],
+                    output_path,
+                    acodec="copy",
+                )
+                .overwrite_output(),
+                "burn_subtitles",
+                await probe_duration(local_video),
             )
 
             # Upload result
@@ -172,70 +173,13 @@ class SubtitleGenerator:
                 "output_url": output_url,
             }
 
-            # Cleanup
-            os.remove(local_video)
-            os.remove(local_subs)
-            os.remove(output_path)
-
             if callback_url:
-                await self._send_callback(callback_url, self.jobs[job_id])
+                await callback_dispatcher.send(callback_url, self.jobs[job_id])
 
         except Exception as e:
             self.jobs[job_id] = {"status": "failed", "error": str(e)}
             if callback_url:
-                await self._send_callback(callback_url, self.jobs[job_id])
+                await callback_dispatcher.send(callback_url, self.jobs[job_id])
 
     async def get_job_status(self, job_id: str) -> Optional[dict]:
-        return self.jobs.get(job_id)
-
-    def _write_srt(self, path: str, segments: list):
-        """Write SRT subtitle file."""
-        with open(path, "w", encoding="utf-8") as f:
-            for i, seg in enumerate(segments, 1):
-                start = self._format_timestamp_srt(seg["start"])
-                end = self._format_timestamp_srt(seg["end"])
-                f.write(f"{i}\n{start} --> {end}\n{seg['text']}\n\n")
-
-    def _write_vtt(self, path: str, segments: list):
-        """Write WebVTT subtitle file."""
-        with open(path, "w", encoding="utf-8") as f:
-            f.write("WEBVTT\n\n")
-            for seg in segments:
-                start = self._format_timestamp_vtt(seg["start"])
-                end = self._format_timestamp_vtt(seg["end"])
-                f.write(f"{start} --> {end}\n{seg['text']}\n\n")
-
-    def _format_timestamp_srt(self, seconds: float) -> str:
-        """Format timestamp for SRT (HH:MM:SS,mmm)."""
-        hours = int(seconds // 3600)
-        minutes = int((seconds % 3600) // 60)
-        secs = int(seconds % 60)
-        millis = int((seconds % 1) * 1000)
-        return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
-
-    def _format_timestamp_vtt(self, seconds: float) -> str:
-        """Format timestamp for VTT (HH:MM:SS.mmm)."""
-        hours = int(seconds // 3600)
-        minutes = int((seconds % 3600) // 60)
-        secs = int(seconds % 60)
-        millis = int((seconds % 1) * 1000)
-        return f"{hours:02d}:{minutes:02d}:{secs:02d}.{millis:03d}"
-
-    def _color_to_ass(self, color: str) -> str:
-        """Convert color name to ASS format (BGR hex)."""
-        colors = {
-            "white": "FFFFFF",
-            "black": "000000",
-            "red": "0000FF",
-            "green": "00FF00",
-            "blue": "FF0000",
-            "yellow": "00FFFF",
-        }
-        return colors.get(color.lower(), "FFFFFF")
-
-    async def _send_callback(self, url: str, data: dict):
-        try:
-            async with httpx.AsyncClient() as client:
-                await client.post(url, json=data, timeout=10)
-        except Exception:
-            pass
+        return self.jobs.get(job_id) or await queued_job_status(job_id)
@@ -1,18 +1,57 @@
+import asyncio
+import math
 import os
+from collections import OrderedDict
 from typing import Optional, Literal
 import ffmpeg
+import numpy as np
 import uuid
+from PIL import Image
 
 from config import get_settings
-from utils.storage import StorageClient
+from utils.analysis import analysis_size, read_rgb_frames_at
+from utils.artifacts import artifact_cache, artifact_id, artifact_key
+from utils.frame_quality import QUALITY_WIDTH, best_frames, candidate_times
+from utils.images import composite_watermark, load_image, prepare_watermark, save_image
+from utils.jobs import track_job
+from utils.media import run_ffmpeg, probe_media
+from utils.metrics import CACHE_REQUESTS
+from utils.scenes import scene_index, snap_to_cuts
+from utils.scratch import scratch_path
+from utils.storage import get_storage
+from utils.subtitles import write_vtt
+from utils.tracing import tracer
 
 settings = get_settings()
 
+# Frames this close to a cut are taken from just inside the new shot instead,
+# clear of transition frames
+SHOT_SNAP_TOLERANCE = 2.0
+SHOT_SETTLE = 0.5
+
+# Watermarks kept decoded (and prepared) per generator
+WATERMARK_CACHE_SIZE = 32
+
+# Storage prefix of watermarked outputs (keys hashed from the request)
+WATERMARKED_PREFIX = "thumbnails/watermarked"
+
+# Seeking inputs per ffmpeg run when cutting frames at many timestamps; each
+# one holds its own demuxer and decoder, so memory grows with this
+FRAMES_PER_RUN = 8
+
+# Encoders for single frames written to ffmpeg's stdout
+IMAGE_PIPE_CODECS = {"jpg": "mjpeg", "png": "png", "webp": "libwebp"}
+
 
 class ThumbnailGenerator:
     def __init__(self):
-        self.storage = StorageClient()
+        self.storage = get_storage()
+        # Decoded watermarks by (URL, version), and prepared ones by
+        # (URL, version, width, opacity), so a replaced logo is never reused
+        self._watermark_sources: OrderedDict[tuple, Image.Image] = OrderedDict()
+        self._watermarks: OrderedDict[tuple, Image.Image] = OrderedDict()
 
+    @track_job("thumbnail", lane="stills")
     async def extract_frame(
         self,
         video_url: str,
@@ -21,34 +60,47 @@ class ThumbnailGenerator:
         width: Optional[int],
         height: Optional[int],
     ) -> str:
-        """Extract a single frame from video."""
-        local_input = await self.storage.download_temp(video_url)
-        frame_id = str(uuid.uuid4())[:8]
-        output_path = f"{settings.temp_dir}/{frame_id}.{output_format}"
-
-        try:
-            stream = ffmpeg.input(local_input, ss=timestamp)
-
-            if width or height:
-                # Scale maintaining aspect ratio
-                scale_w = width or -1
-                scale_h = height or -1
-                stream = stream.filter("scale", scale_w, scale_h)
-
-            stream = stream.output(output_path, vframes=1)
-            stream.overwrite_output().run(capture_stdout=True, capture_stderr=True)
-
-            # Upload
-            output_url = await self.storage.upload(
-                output_path, f"thumbnails/{frame_id}.{output_format}"
-            )
-
-            return output_url
-
-        finally:
-            os.remove(local_input)
-            if os.path.exists(output_path):
-                os.remove(output_path)
+        """Extract a single frame from video.
+
+        The frame is stored under a key hashed from the request, so repeats
+        return the stored frame without decoding. ffmpeg writes the image to
+        its stdout and the bytes are uploaded from memory, without touching
+        scratch space.
+        """
+        key = artifact_key(
+            "thumbnails",
+            video_url,
+            await self.storage.version(video_url),
+            output_format,
+            timestamp=timestamp,
+            width=width,
+            height=height,
+        )
+        cached = await artifact_cache.get(key)
+        if cached:
+            return cached["output_url"]
+
+        # Seek straight to the timestamp instead of downloading the whole video
+        source, _ = await self.storage.resolve_input(video_url, seekable=True)
+
+        stream = ffmpeg.input(source, ss=timestamp, **self.storage.input_options(source))
+
+        if width or height:
+            # Scale maintaining aspect ratio
+            scale_w = width or -1
+            scale_h = height or -1
+            stream = stream.filter("scale", scale_w, scale_h)
+
+        stream = stream.output(
+            "pipe:", vframes=1, format="image2pipe", vcodec=IMAGE_PIPE_CODECS[output_format]
+        )
+        image, _ = await run_ffmpeg(stream, "thumbnail")
+        if not image:
+            raise ValueError(f"No frame could be decoded at {timestamp}s")
+
+        # Upload
+        result = await artifact_cache.put_bytes(image, key)
+        return result["output_url"]
 
     async def extract_multiple_frames(
         self,
@@ -65,6 +117,7 @@ class ThumbnailGenerator:
             urls.append(url)
         return urls
 
+    @track_job("thumbnail_grid")
     async def generate_grid(
         self,
         video_url: str,
@@ -72,77 +125,173 @@ class ThumbnailGenerator:
         cols: int,
         output_format: str,
     ) -> dict:
-        """Generate a thumbnail grid from video frames."""
+        """Generate a thumbnail grid from video frames.
+
+        Grids are stored under a key hashed from the request, with their
+        timestamps; repeats return the stored grid without downloading.
+        """
+        key = artifact_key(
+            "thumbnails/grids",
+            video_url,
+            await self.storage.version(video_url),
+            output_format,
+            rows=rows,
+            cols=cols,
+        )
+        cached = await artifact_cache.get(key)
+        if cached:
+            return cached
+
         local_input = await self.storage.download_temp(video_url)
         grid_id = str(uuid.uuid4())[:8]
-        output_path = f"{settings.temp_dir}/{grid_id}_grid.{output_format}"
-
-        try:
-            # Get video duration
-            probe = ffmpeg.probe(local_input)
-            duration = float(probe["format"]["duration"])
-
-            # Calculate timestamps
-            total_frames = rows * cols
-            interval = duration / (total_frames + 1)
-            timestamps = [interval * (i + 1) for i in range(total_frames)]
-
-            # Extract frames
-            frame_paths = []
-            for i, ts in enumerate(timestamps):
-                frame_path = f"{settings.temp_dir}/{grid_id}_frame_{i}.jpg"
-                (
-                    ffmpeg
-                    .input(local_input, ss=ts)
-                    .output(frame_path, vframes=1)
-                    .overwrite_output()
-                    .run(capture_stdout=True, capture_stderr=True)
-                )
-                frame_paths.append(frame_path)
-
-            # Create grid using ffmpeg tile filter
-            # First, create a concat file
-            inputs = [ffmpeg.input(fp) for fp in frame_paths]
-
-            # Use xstack or tile filter
-            filter_complex = f"tile={cols}x{rows}"
-
-            (
+        output_path = scratch_path(f"{grid_id}_grid.{output_format}")
+
+        # Get video duration
+        probe = await probe_media(local_input)
+        duration = float(probe["format"]["duration"])
+
+        # Evenly spaced timestamps, moved off shot transitions
+        total_frames = rows * cols
+        interval = duration / (total_frames + 1)
+        timestamps = [interval * (i + 1) for i in range(total_frames)]
+        scenes = await scene_index(local_input, probe)
+        timestamps = snap_to_cuts(
+            timestamps,
+            scenes["cuts"],
+            min(SHOT_SNAP_TOLERANCE, interval / 2),
+            offset=SHOT_SETTLE,
+            limit=max(duration - SHOT_SETTLE, 0),
+        )
+
+        # Extract frames
+        for i, ts in enumerate(timestamps):
+            frame_path = scratch_path(f"{grid_id}_frame_{i}.jpg")
+            await run_ffmpeg(
                 ffmpeg
-                .input(local_input, ss=timestamps[0])
-                .output(
-                    output_path,
-                    vframes=1,
-                    vf=f"select='lt(n\,{total_frames})',{filter_complex}",
-                )
-                .overwrite_output()
-                .run(capture_stdout=True, capture_stderr=True)
-            )
-
-            # If the above doesn't work well, fall back to simpler approach
-            if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
-                # Use first frame as fallback
-                import shutil
-                shutil.copy(frame_paths[0], output_path)
-
-            # Upload
-            output_url = await self.storage.upload(
-                output_path, f"thumbnails/{grid_id}_grid.{output_format}"
+                .input(local_input, ss=ts)
+                .output(frame_path, vframes=1)
+                .overwrite_output(),
+                "thumbnail_grid",
             )
 
+        # Tile the extracted frames in order
+        await run_ffmpeg(
+            ffmpeg
+            .input(scratch_path(f"{grid_id}_frame_%d.jpg"), start_number=0)
+            .filter("tile", f"{cols}x{rows}")
+            .output(output_path, vframes=1)
+            .overwrite_output(),
+            "thumbnail_grid",
+        )
+
+        # Upload
+        return await artifact_cache.put(output_path, key, timestamps=timestamps)
+
+    @track_job("storyboard")
+    async def generate_storyboard(
+        self,
+        video_url: str,
+        interval: float,
+        width: int,
+        cols: int,
+        rows: int,
+        output_format: str = "jpg",
+    ) -> dict:
+        """Generate hover-scrub sprite sheets and a WebVTT thumbnails track.
+
+        One low-res decode (``fps=1/interval,scale,tile``) writes every
+        sheet; the track maps each ``interval``-second range to its tile as
+        ``sprite#xywh=x,y,w,h``. Storyboards live under a prefix hashed from
+        the request, so repeats return the stored one.
+        """
+        storyboard_id = artifact_id(
+            video_url,
+            await self.storage.version(video_url),
+            interval=interval,
+            width=width,
+            cols=cols,
+            rows=rows,
+            output_format=output_format,
+        )
+        vtt_key = f"storyboards/{storyboard_id}/storyboard.vtt"
+
+        cached = await artifact_cache.get(vtt_key)
+        if cached:
             return {
-                "output_url": output_url,
-                "timestamps": timestamps,
+                "vtt_url": cached.pop("output_url"),
+                "sprite_urls": [
+                    self.storage.get_url(
+                        f"storyboards/{storyboard_id}/sprite_{i}.{output_format}"
+                    )
+                    for i in range(cached.pop("sheets"))
+                ],
+                **cached,
             }
 
-        finally:
-            os.remove(local_input)
-            for fp in frame_paths:
-                if os.path.exists(fp):
-                    os.remove(fp)
-            if os.path.exists(output_path):
-                os.remove(output_path)
-
+        source, _ = await self.storage.resolve_input(video_url, seekable=True)
+        prefix = scratch_path(f"{storyboard_id}_sprite")
+        vtt_path = scratch_path(f"{storyboard_id}_storyboard.vtt")
+        sprite_paths = []
+
+        probe = await probe_media(source)
+        duration = float(probe["format"]["duration"])
+        video_stream = next(s for s in probe["streams"] if s["codec_type"] == "video")
+        tile_width, tile_height = analysis_size(
+            int(video_stream["width"]), int(video_stream["height"]), width
+        )
+
+        await run_ffmpeg(
+            ffmpeg
+            .input(source, **self.storage.input_options(source))
+            .video
+            .filter("fps", f"1/{interval}")
+            .filter("scale", tile_width, tile_height)
+            .filter("tile", f"{cols}x{rows}")
+            .output(f"{prefix}_%d.{output_format}", start_number=0, qscale=4)
+            .overwrite_output(),
+            "storyboard",
+            duration,
+        )
+
+        while os.path.exists(f"{prefix}_{len(sprite_paths)}.{output_format}"):
+            sprite_paths.append(f"{prefix}_{len(sprite_paths)}.{output_format}")
+        if not sprite_paths:
+            raise ValueError("No frames could be decoded")
+
+        sprite_urls = list(await asyncio.gather(*(
+            self.storage.upload(
+                path, f"storyboards/{storyboard_id}/sprite_{i}.{output_format}"
+            )
+            for i, path in enumerate(sprite_paths)
+        )))
+
+        per_sheet = cols * rows
+        count = min(math.ceil(duration / interval), len(sprite_paths) * per_sheet)
+        cues = []
+        for i in range(count):
+            sheet, tile = divmod(i, per_sheet)
+            x, y = tile % cols * tile_width, tile // cols * tile_height
+            cues.append({
+                "start": i * interval,
+                "end": min((i + 1) * interval, duration),
+                "text": f"{sprite_urls[sheet]}#xywh={x},{y},{tile_width},{tile_height}",
+            })
+        write_vtt(vtt_path, cues)
+
+        # Uploaded last: once the track is stored, the sheets are too
+        summary = {
+            "interval": interval,
+            "thumbnail_width": tile_width,
+            "thumbnail_height": tile_height,
+            "count": count,
+        }
+        stored = await artifact_cache.put(
+            vtt_path, vtt_key, sheets=len(sprite_urls), **summary
+        )
+
+        return {"vtt_url": stored["output_url"], "sprite_urls": sprite_urls, **summary}
+
+    @track_job("watermark", lane="stills")
     async def apply_watermark(
         self,
         image_url: str,
@@ -151,99 +300,309 @@ class ThumbnailGenerator:
         opacity: float,
         scale: float,
         margin: int,
+        output_format: str = "png",
     ) -> str:
-        """Apply watermark to an image."""
-        local_image = await self.storage.download_temp(image_url)
-        local_watermark = await self.storage.download_temp(watermark_url)
-        output_id = str(uuid.uuid4())[:8]
-        output_path = f"{settings.temp_dir}/{output_id}_watermarked.png"
+        """Apply watermark to an image.
+
+        Runs in-process with Pillow; the scaled, faded watermark is cached,
+        so repeated calls with the same logo only decode, composite and
+        encode the base image. Identical requests return the stored output.
+        """
+        watermark_version = await self.storage.version(watermark_url)
+        key = artifact_key(
+            WATERMARKED_PREFIX,
+            image_url,
+            await self.storage.version(image_url),
+            output_format,
+            watermark_url=watermark_url,
+            watermark_version=watermark_version,
+            position=position,
+            opacity=opacity,
+            scale=scale,
+            margin=margin,
+        )
+        cached = await artifact_cache.get(key)
+        if cached:
+            return cached["output_url"]
+
+        local_image, _ = await self.storage.resolve_input(image_url)
+
+        return await self._watermark_file(
+            local_image,
+            key,
+            watermark_url,
+            watermark_version,
+            position,
+            opacity,
+            scale,
+            margin,
+        )
+
+    @track_job("watermark_batch", lane="stills")
+    async def apply_watermark_batch(
+        self,
+        watermark_url: str,
+        position: Literal["top-left", "top-right", "bottom-left", "bottom-right", "center"],
+        opacity: float,
+        scale: float,
+        margin: int,
+        output_format: str = "png",
+        image_urls: Optional[list[str]] = None,
+        video_url: Optional[str] = None,
+        timestamps: Optional[list[float]] = None,
+    ) -> list[str]:
+        """Apply one watermark to many images, or to frames of a video.
+
+        The watermark is decoded once. Images are fetched, watermarked and
+        uploaded concurrently, at most ``watermark_batch_concurrency`` at a
+        time. Video frames are cut with one seek each, a few per ffmpeg
+        run. Output URLs are returned in input order. Outputs already stored
+        for the same image (or frame) and settings are reused, and only the
+        rest are fetched or extracted.
+        """
+        watermark_version = await self.storage.version(watermark_url)
+        options = dict(
+            watermark_url=watermark_url,
+            watermark_version=watermark_version,
+            position=position,
+            opacity=opacity,
+            scale=scale,
+            margin=margin,
+        )
+        if video_url:
+            version = await self.storage.version(video_url)
+            keys = [
+                artifact_key(
+                    WATERMARKED_PREFIX, video_url, version, output_format, timestamp=ts, **options
+                )
+                for ts in timestamps
+            ]
+        else:
+            versions = await asyncio.gather(*(self.storage.version(url) for url in image_urls))
+            keys = [
+                artifact_key(WATERMARKED_PREFIX, url, version, output_format, **options)
+                for url, version in zip(image_urls, versions)
+            ]
+
+        cached = await asyncio.gather(*(artifact_cache.get(key) for key in keys))
+        output_urls = [hit["output_url"] if hit else None for hit in cached]
+        missing = [i for i, url in enumerate(output_urls) if url is None]
+        if not missing:
+            return output_urls
+
+        batch_id = str(uuid.uuid4())[:8]
+        slots = asyncio.Semaphore(settings.watermark_batch_concurrency)
+
+        # Decode the watermark before fanning out so it is fetched only once
+        await self._get_watermark_source(watermark_url, watermark_version)
+
+        async def watermark_one(index: int, url: Optional[str], path: Optional[str]):
+            async with slots:
+                is_temp = False
+                if path is None:
+                    path, is_temp = await self.storage.resolve_input(url)
+                try:
+                    output_urls[index] = await self._watermark_file(
+                        path,
+                        keys[index],
+                        watermark_url,
+                        watermark_version,
+                        position,
+                        opacity,
+                        scale,
+                        margin,
+                    )
+                finally:
+                    if is_temp:
+                        os.remove(path)
+
+        if video_url:
+            frame_paths = await self._extract_frames_to_temp(
+                video_url, [timestamps[i] for i in missing], batch_id
+            )
+            tasks = [watermark_one(i, None, path) for i, path in zip(missing, frame_paths)]
+        else:
+            tasks = [watermark_one(i, image_urls[i], None) for i in missing]
 
-        try:
-            # Get image dimensions
-            probe = ffmpeg.probe(local_image)
-            img_stream = next(s for s in probe["streams"] if s["codec_type"] == "video")
-            img_width = int(img_stream["width"])
-            img_height = int(img_stream["height"])
-
-            # Calculate watermark size
-            wm_width = int(img_width * scale)
-
-            # Calculate position
-            positions = {
-                "top-left": f"x={margin}:y={margin}",
-                "top-right": f"x=W-w-{margin}:y={margin}",
-                "bottom-left": f"x={margin}:y=H-h-{margin}",
-                "bottom-right": f"x=W-w-{margin}:y=H-h-{margin}",
-                "center": "x=(W-w)/2:y=(H-h)/2",
-            }
+        await asyncio.gather(*tasks)
+        return output_urls
 
-            overlay_pos = positions[position]
+    async def _watermark_file(
+        self,
+        local_image: str,
+        output_key: str,
+        watermark_url: str,
+        watermark_version: Optional[str],
+        position: str,
+        opacity: float,
+        scale: float,
+        margin: int,
+    ) -> str:
+        """Watermark a local image and upload it under ``output_key``."""
+        output_path = scratch_path(f"{uuid.uuid4().hex[:8]}_{os.path.basename(output_key)}")
 
-            # Apply watermark
-            main = ffmpeg.input(local_image)
-            watermark = ffmpeg.input(local_watermark)
-            watermark = watermark.filter("scale", wm_width, -1)
-            watermark = watermark.filter("format", "rgba")
-            watermark = watermark.filter("colorchannelmixer", aa=opacity)
+        try:
+            image = await asyncio.to_thread(load_image, local_image)
+            mark = await self._get_watermark(
+                watermark_url, watermark_version, int(image.width * scale), opacity
+            )
 
-            output = ffmpeg.overlay(main, watermark, **self._parse_overlay_pos(overlay_pos))
-            output = output.output(output_path)
-            output.overwrite_output().run(capture_stdout=True, capture_stderr=True)
+            with tracer.span("image.watermark", stage="image"):
+                await asyncio.to_thread(
+                    _watermark_to_file, image, mark, position, margin, output_path
+                )
 
             # Upload
-            output_url = await self.storage.upload(
-                output_path, f"thumbnails/{output_id}_watermarked.png"
-            )
-
-            return output_url
+            result = await artifact_cache.put(output_path, output_key)
+            return result["output_url"]
 
         finally:
-            os.remove(local_image)
-            os.remove(local_watermark)
             if os.path.exists(output_path):
                 os.remove(output_path)
 
+    async def _extract_frames_to_temp(
+        self,
+        video_url: str,
+        timestamps: list[float],
+        prefix: str,
+    ) -> list[str]:
+        """Extract full-resolution frames at ``timestamps``.
+
+        Frames are written as uncompressed BMP since they are decoded again
+        right away. Returns paths in the job's scratch space.
+        """
+        source, is_temp = await self.storage.resolve_input(video_url, seekable=True)
+        paths = [scratch_path(f"{prefix}_frame_{i}.bmp") for i in range(len(timestamps))]
+
+        try:
+            await self._cut_frames(
+                source, timestamps, paths, "watermark_frames", self.storage.input_options(source)
+            )
+            return paths
+        finally:
+            if is_temp:
+                os.remove(source)
+
+    async def _cut_frames(
+        self,
+        source: str,
+        timestamps: list[float],
+        paths: list[str],
+        operation: str,
+        input_options: Optional[dict] = None,
+        **output_options,
+    ):
+        """Write the frame at each timestamp to the matching path.
+
+        Each ffmpeg run seeks once per frame, with at most ``FRAMES_PER_RUN``
+        inputs open at a time so memory stays bounded however many frames
+        are asked for.
+        """
+        for start in range(0, len(timestamps), FRAMES_PER_RUN):
+            outputs = [
+                ffmpeg.input(source, ss=ts, **(input_options or {})).video
+                .output(path, vframes=1, **output_options)
+                for ts, path in zip(
+                    timestamps[start:start + FRAMES_PER_RUN], paths[start:start + FRAMES_PER_RUN]
+                )
+            ]
+            await run_ffmpeg(ffmpeg.merge_outputs(*outputs).overwrite_output(), operation)
+
+    async def _get_watermark(
+        self, url: str, version: Optional[str], width: int, opacity: float
+    ) -> Image.Image:
+        """Watermark from ``url`` scaled to ``width`` with ``opacity`` applied, cached.
+
+        ``version`` is the watermark's ``StorageClient.version``.
+        """
+        key = (url, version, width, round(opacity, 3))
+        mark = self._watermarks.get(key)
+        if mark is not None:
+            CACHE_REQUESTS.labels("watermark", "hit").inc()
+            self._watermarks.move_to_end(key)
+            return mark
+
+        CACHE_REQUESTS.labels("watermark", "miss").inc()
+        source = await self._get_watermark_source(url, version)
+        mark = await asyncio.to_thread(prepare_watermark, source, width, opacity)
+        _remember(self._watermarks, key, mark)
+        return mark
+
+    async def _get_watermark_source(self, url: str, version: Optional[str]) -> Image.Image:
+        """Decoded watermark from ``url`` at ``version``, cached."""
+        source = self._watermark_sources.get((url, version))
+        if source is None:
+            path, is_temp = await self.storage.resolve_input(url)
+            try:
+                source = await asyncio.to_thread(load_image, path)
+            finally:
+                if is_temp:
+                    os.remove(path)
+            _remember(self._watermark_sources, (url, version), source)
+        return source
+
+    @track_job("best_frames")
     async def detect_best_frames(
         self,
         video_url: str,
         count: int,
     ) -> list[str]:
-        """Detect best frames for thumbnails based on visual interest."""
+        """Detect the best frames for thumbnails and extract them at full resolution.
+
+        Candidates are spread over the shots of the scene index, clear of
+        cuts, and only they are decoded, downscaled (with a seek each on long
+        videos, so the cost stops growing with length). They are scored for
+        sharpness, exposure, colorfulness and faces off the event loop; the
+        top ``count`` distinct frames are then cut from the already-local
+        file, one seek per frame.
+        """
         local_input = await self.storage.download_temp(video_url)
+        output_id = str(uuid.uuid4())[:8]
 
-        try:
-            # Get duration
-            probe = ffmpeg.probe(local_input)
-            duration = float(probe["format"]["duration"])
-
-            # Simple heuristic: sample frames at golden ratio intervals
-            # A more sophisticated implementation would use ML
-            golden_ratio = 1.618
-            timestamps = []
-            current = duration * 0.1  # Start at 10%
-
-            while len(timestamps) < count and current < duration * 0.9:
-                timestamps.append(current)
-                current += duration / (count * golden_ratio)
-
-            # Extract frames at these timestamps
-            urls = await self.extract_multiple_frames(
-                video_url,
-                timestamps[:count],
-                "jpg",
-                1280,
-                720,
+        probe = await probe_media(local_input)
+        duration = float(probe["format"]["duration"])
+        video_stream = next(s for s in probe["streams"] if s["codec_type"] == "video")
+
+        scenes = await scene_index(local_input, probe)
+        # Skip intros and outros
+        candidates = candidate_times(scenes["cuts"], duration * 0.05, duration * 0.95, SHOT_SETTLE)
+        width, height = analysis_size(
+            int(video_stream["width"]), int(video_stream["height"]), QUALITY_WIDTH
+        )
+        frames, times = await read_rgb_frames_at(local_input, width, height, candidates, duration)
+        if len(frames) == 0:
+            raise ValueError("No frames could be decoded")
+        times = np.asarray(times)
+
+        with tracer.span("thumbnails.score", stage="analysis", frames=len(frames)):
+            picked = await asyncio.to_thread(
+                best_frames, frames, times, count, duration / (count * 4)
             )
 
-            return urls
-
-        finally:
-            os.remove(local_input)
-
-    def _parse_overlay_pos(self, pos_str: str) -> dict:
-        """Parse overlay position string into dict."""
-        result = {}
-        for part in pos_str.split(":"):
-            key, value = part.split("=")
-            result[key] = value
-        return result
+        output_paths = [
+            scratch_path(f"{output_id}_best_{i}.jpg") for i in range(len(picked))
+        ]
+        await self._cut_frames(
+            local_input,
+            [round(float(times[index]), 3) for index in picked],
+            output_paths,
+            "best_frames",
+            qscale=2,
+        )
+
+        return list(await asyncio.gather(*(
+            self.storage.upload(path, f"thumbnails/{os.path.basename(path)}")
+            for path in output_paths
+        )))
+
+
+def _watermark_to_file(image: Image.Image, mark: Image.Image, position: str, margin: int, path: str):
+    save_image(composite_watermark(image, mark, position, margin), path)
+
+
+def _remember(cache: OrderedDict, key, value):
+    """Insert into an LRU dict, evicting the oldest entries past ``WATERMARK_CACHE_SIZE``."""
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > WATERMARK_CACHE_SIZE:
+        cache.popitem(last=False)
@@ -1,54 +1,55 @@
 import os
 import json
-import asyncio
-import subprocess
 from typing import Optional
-import httpx
 import ffmpeg
 
 from config import get_settings
-from utils.storage import StorageClient
+from utils.callbacks import callback_dispatcher
+from utils.jobs import track_job
+from utils.media import run_ffmpeg, probe_duration, probe_media
+from utils.queue import queued_job_status
+from utils.scratch import scratch_path
+from utils.storage import get_storage
 
 settings = get_settings()
 
 
 class VideoProcessor:
     def __init__(self):
-        self.storage = StorageClient()
+        self.storage = get_storage()
         self.jobs: dict[str, dict] = {}
 
+    @track_job("info", lane="stills")
     async def get_video_info(self, url: str) -> dict:
         """Get video metadata using ffprobe."""
         local_path = await self.storage.download_temp(url)
 
-        try:
-            probe = ffmpeg.probe(local_path)
-            video_stream = next(
-                (s for s in probe["streams"] if s["codec_type"] == "video"), None
-            )
+        probe = await probe_media(local_path)
+        video_stream = next(
+            (s for s in probe["streams"] if s["codec_type"] == "video"), None
+        )
 
-            if not video_stream:
-                raise ValueError("No video stream found")
+        if not video_stream:
+            raise ValueError("No video stream found")
 
-            # Get file size
-            size_bytes = os.path.getsize(local_path)
+        # Get file size
+        size_bytes = os.path.getsize(local_path)
 
-            # Calculate FPS
-            fps_parts = video_stream.get("r_frame_rate", "30/1").split("/")
-            fps = float(fps_parts[0]) / float(fps_parts[1]) if len(fps_parts) == 2 else 30.0
+        # Calculate FPS
+        fps_parts = video_stream.get("r_frame_rate", "30/1").split("/")
+        fps = float(fps_parts[0]) / float(fps_parts[1]) if len(fps_parts) == 2 else 30.0
 
-            return {
-                "duration": float(probe["format"].get("duration", 0)),
-                "width": int(video_stream.get("width", 0)),
-                "height": int(video_stream.get("height", 0)),
-                "fps": fps,
-                "codec": video_stream.get("codec_name", "unknown"),
-                "bitrate": int(probe["format"].get("bit_rate", 0)) or None,
-                "size_bytes": size_bytes,
-            }
-        finally:
-            os.remove(local_path)
+        return {
+            "duration": float(probe["format"].get("duration", 0)),
+            "width": int(video_stream.get("width", 0)),
+            "height": int(video_stream.get("height", 0)),
+            "fps": fps,
+            "codec": video_stream.get("codec_name", "unknown"),
+            "bitrate": int(probe["format"].get("bit_rate", 0)) or None,
+            "size_bytes": size_bytes,
+        }
 
+    @track_job("transcode")
     async def transcode(
         self,
         job_id: str,
@@ -66,7 +67,7 @@ class VideoProcessor:
 
         try:
             local_input = await self.storage.download_temp(input_url)
-            output_path = f"{settings.temp_dir}/{job_id}.{output_format}"
+            output_path = scratch_path(f"{job_id}.{output_format}")
 
             # Build ffmpeg command
             stream = ffmpeg.input(local_input)
@@ -84,7 +85,9 @@ class VideoProcessor:
 
             # Run transcoding
             stream = stream.output(output_path, **video_opts, **audio_opts)
-            stream.overwrite_output().run(capture_stdout=True, capture_stderr=True)
+            await run_ffmpeg(
+                stream.overwrite_output(), "transcode", await probe_duration(local_input)
+            )
 
             # Upload result
             output_url = await self.storage.upload(output_path, f"processed/{job_id}.{output_format}")
@@ -95,19 +98,16 @@ class VideoProcessor:
                 "output_url": output_url,
             }
 
-            # Cleanup
-            os.remove(local_input)
-            os.remove(output_path)
-
             # Callback
             if callback_url:
-                await self._send_callback(callback_url, self.jobs[job_id])
+                await callback_dispatcher.send(callback_url, self.jobs[job_id])
 
         except Exception as e:
             self.jobs[job_id] = {"status": "failed", "error": str(e)}
             if callback_url:
-                await self._send_callback(callback_url, self.jobs[job_id])
+                await callback_dispatcher.send(callback_url, self.jobs[job_id])
 
+    @track_job("normalize_audio")
     async def normalize_audio(
         self,
         job_id: str,
@@ -120,7 +120,8 @@ class VideoProcessor:
 
         try:
             local_input = await self.storage.download_temp(input_url)
-            output_path = f"{settings.temp_dir}/{job_id}_normalized.mp4"
+            output_path = scratch_path(f"{job_id}_normalized.mp4")
+            media_duration = await probe_duration(local_input)
 
             # First pass: analyze loudness
             analyze_cmd = [
@@ -129,14 +130,12 @@ class VideoProcessor:
                 "-f", "null", "-"
             ]
 
-            result = subprocess.run(
-                analyze_cmd,
-                capture_output=True,
-                text=True,
+            _, stderr = await run_ffmpeg(
+                analyze_cmd, "normalize_audio_analyze", media_duration, check=False
             )
 
             # Parse loudness info from stderr
-            stderr_lines = result.stderr.split("\n")
+            stderr_lines = stderr.decode(errors="replace").split("\n")
             json_start = None
             for i, line in enumerate(stderr_lines):
                 if "{" in line:
@@ -161,21 +160,23 @@ class VideoProcessor:
                     f"linear=true:print_format=summary"
                 )
 
-                (
+                await run_ffmpeg(
                     ffmpeg
                     .input(local_input)
                     .output(output_path, af=filter_str, c_v="copy")
-                    .overwrite_output()
-                    .run(capture_stdout=True, capture_stderr=True)
+                    .overwrite_output(),
+                    "normalize_audio",
+                    media_duration,
                 )
             else:
                 # Fallback: simple normalization
-                (
+                await run_ffmpeg(
                     ffmpeg
                     .input(local_input)
                     .output(output_path, af=f"loudnorm=I={target_lufs}:TP=-1.5:LRA=11", c_v="copy")
-                    .overwrite_output()
-                    .run(capture_stdout=True, capture_stderr=True)
+                    .overwrite_output(),
+                    "normalize_audio",
+                    media_duration,
                 )
 
             # Upload result
@@ -187,26 +188,14 @@ class VideoProcessor:
                 "output_url": output_url,
             }
 
-            # Cleanup
-            os.remove(local_input)
-            os.remove(output_path)
-
             if callback_url:
-                await self._send_callback(callback_url, self.jobs[job_id])
+                await callback_dispatcher.send(callback_url, self.jobs[job_id])
 
         except Exception as e:
             self.jobs[job_id] = {"status": "failed", "error": str(e)}
             if callback_url:
-                await self._send_callback(callback_url, self.jobs[job_id])
+                await callback_dispatcher.send(callback_url, self.jobs[job_id])
 
     async def get_job_status(self, job_id: str) -> Optional[dict]:
         """Get status of a processing job."""
-        return self.jobs.get(job_id)
-
-    async def _send_callback(self, url: str, data: dict):
-        """Send callback to notify job completion."""
-        try:
-            async with httpx.AsyncClient() as client:
-                await client.post(url, json=data, timeout=10)
-        except Exception:
-            pass  # Ignore callback errors
+        return self.jobs.get(job_id) or await queued_job_status(job_id)
@@ -0,0 +1,205 @@
+"""Decode low-resolution frames into NumPy arrays for content analysis."""
+from contextlib import aclosing
+from typing import AsyncIterator, Optional
+import ffmpeg
+import numpy as np
+
+from utils.media import run_ffmpeg, stream_ffmpeg
+
+# Frames binned per bincount by ``histograms``
+HISTOGRAM_CHUNK = 1024
+
+# ``read_rgb_frames_at``: seeking inputs per ffmpeg run (each holds its own
+# decoder), video a seek is assumed to decode (keyframe spacing), and the
+# sampling rate when decoding straight through is cheaper
+SEEKS_PER_RUN = 8
+SEEK_SPAN = 10.0
+SCAN_FPS = 2.0
+
+
+def analysis_size(in_width: int, in_height: int, width: int) -> tuple[int, int]:
+    """Even ``(width, height)`` with the input's aspect ratio."""
+    width = min(width, in_width) // 2 * 2
+    height = max(round(in_height * width / in_width / 2) * 2, 2)
+    return width, height
+
+
+def histograms(frames: np.ndarray, bins: int = 32) -> np.ndarray:
+    """Normalized intensity histograms, one row per frame."""
+    count = len(frames)
+    if count == 0:
+        return np.zeros((0, bins))
+
+    pixels = frames.reshape(count, -1)
+    hist = np.empty((count, bins))
+    # One bincount per chunk of frames, each frame's bins offset into its own
+    # range; int32 offsets keep the index at 4 bytes a pixel, a chunk at a time
+    offsets = np.arange(HISTOGRAM_CHUNK, dtype=np.int32)[:, None] * bins
+    for start in range(0, count, HISTOGRAM_CHUNK):
+        chunk = pixels[start:start + HISTOGRAM_CHUNK]
+        size = len(chunk)
+        indices = chunk // (256 // bins) + offsets[:size]
+        counts = np.bincount(indices.ravel(), minlength=size * bins)
+        hist[start:start + size] = counts.reshape(size, bins)
+    return hist / pixels.shape[1]
+
+
+async def read_gray_frames(
+    source: str,
+    width: int,
+    height: int,
+    fps: float,
+    start: float = 0.0,
+    duration: Optional[float] = None,
+    input_options: Optional[dict] = None,
+) -> np.ndarray:
+    """Decode frames as a ``(frames, height, width)`` uint8 array.
+
+    Frames are resampled to ``fps`` and scaled by ffmpeg before they reach
+    Python, so the pipe carries only what the analysis needs.
+    """
+    stdout = await _read_frames(source, width, height, fps, "gray", start, duration, input_options)
+    return np.frombuffer(stdout, np.uint8).reshape(-1, height, width)
+
+
+async def stream_frames(
+    source: str,
+    width: int,
+    height: int,
+    fps: float,
+    frames_per_chunk: int,
+    pix_fmt: str = "gray",
+) -> AsyncIterator[np.ndarray]:
+    """Decode frames like ``read_gray_frames``, yielding up to ``frames_per_chunk`` at a time.
+
+    ``pix_fmt`` is ``gray`` or ``rgb24`` (chunks shaped as ``read_gray_frames``
+    and ``read_rgb_frames_at`` return them). Only one chunk is held at once,
+    however long the source. Close it with ``contextlib.aclosing`` so ffmpeg
+    is killed if the consumer stops early.
+    """
+    shape = (height, width) if pix_fmt == "gray" else (height, width, 3)
+    chunks = stream_ffmpeg(
+        _frames_cmd(source, width, height, fps, pix_fmt, 0.0, None, None),
+        "analysis_frames",
+        frames_per_chunk * int(np.prod(shape)),
+    )
+    async with aclosing(chunks):
+        async for chunk in chunks:
+            yield np.frombuffer(chunk, np.uint8).reshape(-1, *shape)
+
+
+async def read_rgb_frames_at(
+    source: str,
+    width: int,
+    height: int,
+    timestamps: list[float],
+    duration: float,
+) -> tuple[np.ndarray, list[float]]:
+    """Decode the frames at (or near) ``timestamps`` as a ``(frames, height, width, 3)`` RGB array.
+
+    Returns the frames and their times. When ``duration`` is long next to
+    the number of timestamps, each frame is reached with a seek, decoding
+    only from the previous keyframe; otherwise the source is decoded once
+    at ``SCAN_FPS`` and the nearest frames are kept. Either way only the
+    frames asked for are held.
+    """
+    if duration > len(timestamps) * SEEK_SPAN:
+        parts = []
+        for start in range(0, len(timestamps), SEEKS_PER_RUN):
+            frames = [
+                ffmpeg.input(source, ss=ts).video.filter("scale", width, height).trim(end_frame=1)
+                for ts in timestamps[start:start + SEEKS_PER_RUN]
+            ]
+            stdout, _ = await run_ffmpeg(
+                ffmpeg
+                .concat(*frames, v=1, a=0)
+                # Every frame starts at 0: passthrough keeps ffmpeg from dropping them as duplicates
+                .output("pipe:", format="rawvideo", pix_fmt="rgb24", fps_mode="passthrough"),
+                "analysis_frames",
+            )
+            parts.append(stdout)
+        frames = np.frombuffer(b"".join(parts), np.uint8).reshape(-1, height, width, 3)
+        # Timestamps past the end of the video yield no frame
+        return frames, list(timestamps[:len(frames)])
+
+    wanted = sorted({round(ts * SCAN_FPS) for ts in timestamps})
+    kept, position = [], 0
+    chunks = stream_frames(source, width, height, SCAN_FPS, 256, "rgb24")
+    async with aclosing(chunks):
+        async for chunk in chunks:
+            end = position + len(chunk)
+            kept.extend(chunk[i - position] for i in wanted if position <= i < end)
+            position = end
+
+    frames = np.stack(kept) if kept else np.zeros((0, height, width, 3), np.uint8)
+    return frames, [i / SCAN_FPS for i in wanted[:len(kept)]]
+
+
+async def _read_frames(
+    source: str,
+    width: int,
+    height: int,
+    fps: float,
+    pix_fmt: str,
+    start: float,
+    duration: Optional[float],
+    input_options: Optional[dict],
+) -> bytes:
+    stdout, _ = await run_ffmpeg(
+        _frames_cmd(source, width, height, fps, pix_fmt, start, duration, input_options),
+        "analysis_frames",
+        duration,
+    )
+    return stdout
+
+
+def _frames_cmd(
+    source: str,
+    width: int,
+    height: int,
+    fps: float,
+    pix_fmt: str,
+    start: float,
+    duration: Optional[float],
+    input_options: Optional[dict],
+) -> ffmpeg.nodes.OutputStream:
+    options = dict(input_options or {})
+    if start:
+        options["ss"] = start
+    if duration:
+        options["t"] = duration
+
+    return (
+        ffmpeg
+        .input(source, **options)
+        .video
+        .filter("fps", fps)
+        .filter("scale", width, height)
+        .output("pipe:", format="rawvideo", pix_fmt=pix_fmt)
+    )
+
+
+async def read_audio_samples(
+    source: str,
+    sample_rate: int,
+    start: float = 0.0,
+    duration: Optional[float] = None,
+    input_options: Optional[dict] = None,
+) -> np.ndarray:
+    """Decode the first audio stream as mono float32 samples at ``sample_rate``."""
+    options = dict(input_options or {})
+    if start:
+        options["ss"] = start
+    if duration:
+        options["t"] = duration
+
+    stdout, _ = await run_ffmpeg(
+        ffmpeg
+        .input(source, **options)
+        .audio
+        .output("pipe:", format="f32le", acodec="pcm_f32le", ac=1, ar=sample_rate),
+        "analysis_audio",
+        duration,
+    )
+
+    return np.frombuffer(stdout, np.float32)
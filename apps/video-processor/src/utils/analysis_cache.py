@@ -0,0 +1,143 @@
+"""Analysis results cached per source, keyed by a content fingerprint."""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+from config import get_settings
+from utils.metrics import CACHE_REQUESTS
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Bytes hashed from each end of a file
+FINGERPRINT_BYTES = 1024 * 1024
+
+
+def fingerprint(path: str) -> str:
+    """Content key for a local file: its size and the hash of its first and last MiB.
+
+    Independent of the URL the file came from, so presigned URLs and
+    re-uploads of the same video share cache entries.
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.sha256(str(size).encode())
+
+    with open(path, "rb") as f:
+        digest.update(f.read(FINGERPRINT_BYTES))
+        if size > FINGERPRINT_BYTES:
+            f.seek(max(size - FINGERPRINT_BYTES, FINGERPRINT_BYTES))
+            digest.update(f.read())
+
+    return digest.hexdigest()[:32]
+
+
+class AnalysisCache:
+    """JSON results per ``(fingerprint, name)``, in memory and on disk.
+
+    Files live at ``analysis_cache_dir/<fingerprint>/<name>.json`` so every
+    result for a source sits together. A source's directory is touched on
+    every hit; once the directory holds more than ``max_bytes``, the least
+    recently used sources are removed. Lookups are recorded as
+    ``CACHE_REQUESTS`` under ``analysis_<name>``.
+    """
+
+    def __init__(self, root: str = "", memory_entries: int = 0, max_bytes: int = 0):
+        self.root = root or settings.analysis_cache_dir
+        self.memory_entries = memory_entries or settings.analysis_cache_memory_entries
+        self.max_bytes = max_bytes or settings.analysis_cache_max_bytes
+        self._memory: OrderedDict[tuple[str, str], dict] = OrderedDict()
+        # Bytes on disk as of the last sweep plus what this process wrote since
+        self._disk_bytes: Optional[int] = None
+
+    def get(self, key: str, name: str) -> Optional[dict]:
+        entry = self._memory.get((key, name))
+
+        if entry is None:
+            try:
+                with open(self._path(key, name)) as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                CACHE_REQUESTS.labels(f"analysis_{name}", "miss").inc()
+                return None
+            self._remember(key, name, entry)
+        else:
+            self._memory.move_to_end((key, name))
+
+        self._touch(key)
+        CACHE_REQUESTS.labels(f"analysis_{name}", "hit").inc()
+        return entry
+
+    def put(self, key: str, name: str, value: dict):
+        self._remember(key, name, value)
+
+        path = self._path(key, name)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write under a temporary name so readers never see a partial file
+            tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(value, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Could not write analysis cache %s: %s", path, e)
+            return
+
+        if self._disk_bytes is None:
+            self._sweep()
+        else:
+            self._disk_bytes += os.path.getsize(path)
+            if self._disk_bytes > self.max_bytes:
+                self._sweep()
+
+    def _touch(self, key: str):
+        try:
+            os.utime(os.path.join(self.root, key))
+        except OSError:
+            pass
+
+    def _sweep(self):
+        """Remove least recently used sources until the store fits ``max_bytes``.
+
+        Other processes share the directory, so sizes are read from disk;
+        it is brought down to 90% of the limit so sweeps stay rare.
+        """
+        sources = []
+        total = 0
+        try:
+            for entry in os.scandir(self.root):
+                if not entry.is_dir(follow_symlinks=False):
+                    continue
+                try:
+                    size = sum(f.stat().st_size for f in os.scandir(entry.path))
+                    sources.append((entry.stat().st_mtime, size, entry.path))
+                except OSError:
+                    continue
+                total += size
+        except OSError as e:
+            logger.warning("Could not sweep analysis cache %s: %s", self.root, e)
+            return
+
+        if total > self.max_bytes:
+            for _, size, path in sorted(sources):
+                if total <= self.max_bytes * 0.9:
+                    break
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+        self._disk_bytes = total
+
+    def _remember(self, key: str, name: str, value: dict):
+        self._memory[(key, name)] = value
+        self._memory.move_to_end((key, name))
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _path(self, key: str, name: str) -> str:
+        return os.path.join(self.root, key, f"{name}.json")
+
+
+analysis_cache = AnalysisCache()
@@ -0,0 +1,95 @@
+"""Rendered outputs stored under keys derived from their inputs.
+
+An artifact's key hashes the source's identity (its URL with signatures
+stripped, or its storage key), its version (``StorageClient.version``: ETag,
+Last-Modified or size) and the render parameters, so an identical request
+maps onto the object a previous one uploaded, while a source replaced under
+the same URL or key maps onto a new one. Before rendering, services look
+the key up: first in memory, then with a HEAD on storage, whose metadata
+carries the rest of the result (timestamps, durations, ...).
+"""
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Optional
+
+from config import get_settings
+from utils.dedup import normalize_url
+from utils.metrics import CACHE_REQUESTS
+from utils.storage import get_storage
+
+settings = get_settings()
+
+
+def artifact_id(source: str, version: Optional[str], **params) -> str:
+    """Hash of a source's identity and version and the render parameters."""
+    payload = json.dumps(
+        [normalize_url(source), version, params],
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def artifact_key(prefix: str, source: str, version: Optional[str], ext: str, **params) -> str:
+    """Deterministic storage key, ``<prefix>/<hash>.<ext>``, for a render of ``source``."""
+    return f"{prefix}/{artifact_id(source, version, **params)}.{ext}"
+
+
+class ArtifactCache:
+    """Lookups and uploads of artifacts by key.
+
+    Results are ``{"output_url": ..., **metadata}``. Known keys are kept in
+    a bounded in-memory index so repeated lookups skip the HEAD request.
+    Lookups are recorded as ``CACHE_REQUESTS`` under ``artifacts``.
+    """
+
+    def __init__(self, memory_entries: int = 0):
+        self.storage = get_storage()
+        self.memory_entries = memory_entries or settings.artifact_cache_memory_entries
+        self._memory: OrderedDict[str, dict] = OrderedDict()
+
+    async def get(self, key: str) -> Optional[dict]:
+        if not settings.artifact_cache_enabled:
+            return None
+
+        result = self._memory.get(key)
+        if result is None:
+            metadata = await self.storage.head(key)
+            if metadata is None:
+                CACHE_REQUESTS.labels("artifacts", "miss").inc()
+                return None
+            result = {"output_url": self.storage.get_url(key), **metadata}
+            self._remember(key, result)
+        else:
+            self._memory.move_to_end(key)
+
+        CACHE_REQUESTS.labels("artifacts", "hit").inc()
+        return dict(result)
+
+    async def put(self, local_path: str, key: str, **metadata) -> dict:
+        """Upload a rendered file under ``key``; ``metadata`` is returned with later hits."""
+        output_url = await self.storage.upload(local_path, key, metadata)
+        result = {"output_url": output_url, **metadata}
+        self._remember(key, result)
+        return dict(result)
+
+    async def put_bytes(self, data: bytes, key: str, **metadata) -> dict:
+        """Like ``put``, uploading ``data`` straight from memory."""
+        output_url = await self.storage.upload_bytes(data, key, metadata)
+        result = {"output_url": output_url, **metadata}
+        self._remember(key, result)
+        return dict(result)
+
+    def forget(self, key: str):
+        self._memory.pop(key, None)
+
+    def _remember(self, key: str, result: dict):
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+
+artifact_cache = ArtifactCache()
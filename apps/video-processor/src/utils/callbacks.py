@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import random
+from typing import Optional
+import httpx
+
+from config import get_settings
+from utils.http import get_http_client
+from utils.metrics import CALLBACKS_TOTAL, QUEUE_DEPTH
+from utils.tracing import tracer
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Client errors worth retrying; any other 4xx is treated as permanent
+RETRYABLE_STATUS = {408, 425, 429}
+
+
+class CallbackDispatcher:
+    """Delivers job callbacks from a bounded queue with exponential-backoff retries."""
+
+    def __init__(self):
+        self.queue: Optional[asyncio.Queue] = None
+        self._workers: list[asyncio.Task] = []
+        self.stats = {
+            "enqueued": 0,
+            "delivered": 0,
+            "retried": 0,
+            "failed": 0,
+        }
+
+    @property
+    def pending(self) -> int:
+        return self.queue.qsize() if self.queue else 0
+
+    def start(self):
+        """Start the delivery workers (idempotent)."""
+        if self._workers:
+            return
+
+        self.queue = asyncio.Queue(maxsize=settings.callback_queue_size)
+        self._workers = [
+            asyncio.create_task(self._worker()) for _ in range(settings.callback_workers)
+        ]
+
+    async def stop(self, timeout: float = 10.0):
+        """Drain pending callbacks, then stop the workers."""
+        if not self._workers:
+            return
+
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Dropping %d undelivered callbacks on shutdown", self.pending)
+
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def send(self, url: str, data: dict):
+        """Queue a callback. Waits for room when the queue is full.
+
+        Inside a job trace, the stage timings so far are attached to the payload
+        and delivery is recorded as a span of the same trace.
+        """
+        self.start()
+
+        with tracer.span("callback.enqueue", stage="callback") as span:
+            # Snapshot the payload, the job record keeps changing after this point
+            payload = dict(data)
+            if span.root is not span and "timings" not in payload:
+                payload["timings"] = dict(span.root.stage_timings)
+
+            await self.queue.put((url, payload, (span.trace_id, span.span_id)))
+
+        self.stats["enqueued"] += 1
+        QUEUE_DEPTH.labels("callbacks").set(self.pending)
+
+    async def _worker(self):
+        while True:
+            url, data, trace_parent = await self.queue.get()
+            QUEUE_DEPTH.labels("callbacks").set(self.pending)
+            try:
+                with tracer.span("callback.deliver", parent=trace_parent, url=url) as span:
+                    if not await self._deliver(url, data):
+                        span.set_error("delivery failed")
+            except Exception:
+                logger.exception("Unexpected error delivering callback to %s", url)
+            finally:
+                self.queue.task_done()
+
+    async def _deliver(self, url: str, data: dict) -> bool:
+        client = get_http_client()
+
+        for attempt in range(settings.callback_max_retries + 1):
+            if attempt:
+                self.stats["retried"] += 1
+                CALLBACKS_TOTAL.labels("retried").inc()
+                delay = settings.callback_retry_base_delay * (2 ** (attempt - 1))
+                await asyncio.sleep(delay + random.uniform(0, delay / 2))
+
+            try:
+                response = await client.post(url, json=data, timeout=settings.callback_timeout)
+            except httpx.TransportError as e:
+                logger.debug("Callback to %s failed (attempt %d): %s", url, attempt + 1, e)
+                continue
+
+            if response.is_success:
+                self.stats["delivered"] += 1
+                CALLBACKS_TOTAL.labels("delivered").inc()
+                return True
+
+            if response.status_code < 500 and response.status_code not in RETRYABLE_STATUS:
+                break
+
+        self.stats["failed"] += 1
+        CALLBACKS_TOTAL.labels("failed").inc()
+        logger.warning("Giving up on callback to %s", url)
+        return False
+
+
+callback_dispatcher = CallbackDispatcher()
@@ -0,0 +1,166 @@
+"""Request coalescing: identical job submissions share one job.
+
+A submission is identified by its operation and parameters, with the job
+id and callback URL left out and signed-URL query parameters stripped from
+inputs. While a job runs, identical submissions attach to it; once it has
+completed they get its record until ``job_dedup_ttl`` expires. Failed and
+cancelled jobs are forgotten so a retry runs again.
+"""
+import hashlib
+import json
+import time
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from config import get_settings
+from utils.callbacks import callback_dispatcher
+from utils.metrics import CACHE_REQUESTS
+
+settings = get_settings()
+
+# Query parameters that change per signature, not per object
+SIGNATURE_PARAMS = ("x-amz-", "signature", "expires", "awsaccesskeyid", "x-goog-", "token")
+
+# Parameters that don't change what a job produces
+IGNORED_PARAMS = {"job_id", "callback_url"}
+
+# Outcomes that leave nothing to reuse; identical submissions run again
+UNFINISHED = ("failed", "cancelled")
+
+
+def normalize_url(url: str) -> str:
+    """Source identity of a URL or storage key: signatures and expiry dropped."""
+    if not url.startswith(("http://", "https://")):
+        return url
+
+    parts = urlsplit(url)
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith(SIGNATURE_PARAMS)
+    )
+    return urlunsplit((parts.scheme, parts.netloc.lower(), parts.path, urlencode(query), ""))
+
+
+def request_key(operation: str, kwargs: dict) -> str:
+    """Hash of an operation and its normalized parameters."""
+    params = {
+        name: normalize_url(value) if name.endswith("_url") and isinstance(value, str) else value
+        for name, value in kwargs.items()
+        if name not in IGNORED_PARAMS
+    }
+    payload = json.dumps([operation, params], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+class JobCoalescer:
+    """Maps request keys to job ids, in process or (with the Redis job backend) in Redis.
+
+    Submissions that attach to a running job register their callback URL;
+    those callbacks are sent when the job finishes.
+    """
+
+    def __init__(self):
+        self._jobs: dict[str, tuple[str, float]] = {}  # key -> (job_id, expires_at)
+        self._keys: dict[str, str] = {}  # job_id -> key
+        self._subscribers: dict[str, list[str]] = {}
+
+    @property
+    def _queue(self):
+        from utils.queue import job_queue
+        return job_queue
+
+    async def claim(self, key: str, job_id: str) -> Optional[str]:
+        """Register ``job_id`` for ``key``; returns the existing job id if there is one.
+
+        A running job holds its key for as long as its record is kept;
+        ``finished`` shortens that to ``job_dedup_ttl``.
+        """
+        ttl = settings.job_status_ttl
+
+        if settings.job_backend == "redis":
+            redis = self._queue.redis
+            if await redis.set(self._queue.key("dedup", key), job_id, nx=True, ex=ttl):
+                await redis.set(self._queue.key("dedup_key", job_id), key, ex=ttl)
+                return None
+            return await redis.get(self._queue.key("dedup", key))
+
+        now = time.monotonic()
+        for stale in [k for k, (_, expires) in self._jobs.items() if expires <= now]:
+            self._keys.pop(self._jobs.pop(stale)[0], None)
+
+        existing = self._jobs.get(key)
+        if existing:
+            return existing[0]
+        self._jobs[key] = (job_id, now + ttl)
+        self._keys[job_id] = key
+        return None
+
+    async def forget(self, key: str):
+        if settings.job_backend == "redis":
+            await self._queue.redis.delete(self._queue.key("dedup", key))
+        else:
+            job_id, _ = self._jobs.pop(key, (None, 0))
+            self._keys.pop(job_id, None)
+
+    async def subscribe(self, job_id: str, callback_url: str):
+        """Send ``callback_url`` the job record when ``job_id`` finishes."""
+        if settings.job_backend == "redis":
+            redis = self._queue.redis
+            await redis.rpush(self._queue.key("subscribers", job_id), callback_url)
+            await redis.expire(self._queue.key("subscribers", job_id), settings.job_status_ttl)
+        else:
+            self._subscribers.setdefault(job_id, []).append(callback_url)
+
+    async def finished(self, job_id: str, record: Optional[dict]):
+        """Notify subscribers of a finished job; keep it for ``job_dedup_ttl`` if it succeeded."""
+        if settings.job_backend == "redis":
+            redis = self._queue.redis
+            subscribers = await redis.lrange(self._queue.key("subscribers", job_id), 0, -1)
+            await redis.delete(self._queue.key("subscribers", job_id))
+            key = await redis.get(self._queue.key("dedup_key", job_id))
+            if key and (record or {}).get("status") in UNFINISHED:
+                await redis.delete(self._queue.key("dedup", key))
+            elif key:
+                await redis.expire(self._queue.key("dedup", key), settings.job_dedup_ttl)
+        else:
+            subscribers = self._subscribers.pop(job_id, [])
+            key = self._keys.get(job_id)
+            if key and (record or {}).get("status") in UNFINISHED:
+                await self.forget(key)
+            elif key:
+                self._jobs[key] = (job_id, time.monotonic() + settings.job_dedup_ttl)
+
+        for url in subscribers:
+            await callback_dispatcher.send(url, record or {"status": "completed"})
+
+
+job_coalescer = JobCoalescer()
+
+
+async def coalesce(operation: str, kwargs: dict, status) -> Optional[tuple[str, dict]]:
+    """Existing job for an identical submission, as ``(job_id, record)``, or None.
+
+    ``status`` looks up a job record by id. Returns None (and registers the
+    new job) when the work has to be done.
+    """
+    if settings.job_dedup_ttl <= 0:
+        return None
+
+    key = request_key(operation, kwargs)
+    for _ in range(2):
+        existing = await job_coalescer.claim(key, kwargs["job_id"])
+        if existing is None:
+            CACHE_REQUESTS.labels("job_dedup", "miss").inc()
+            return None
+
+        record = await status(existing)
+        if record and record.get("status") not in UNFINISHED:
+            CACHE_REQUESTS.labels("job_dedup", "hit").inc()
+            if record.get("status") != "completed" and kwargs.get("callback_url"):
+                await job_coalescer.subscribe(existing, kwargs["callback_url"])
+            return existing, record
+
+        # The earlier job failed, was cancelled or expired: take its place
+        await job_coalescer.forget(key)
+
+    return None
@@ -0,0 +1,165 @@
+"""ffmpeg filter builders shared by services and pipelines."""
+from typing import Literal, Optional
+import ffmpeg
+
+# YouTube Shorts dimensions
+SHORTS_WIDTH = 1080
+SHORTS_HEIGHT = 1920
+
+# ASS colours are BGR hex
+ASS_COLORS = {
+    "white": "FFFFFF",
+    "black": "000000",
+    "red": "0000FF",
+    "green": "00FF00",
+    "blue": "FF0000",
+    "yellow": "00FFFF",
+}
+
+
+def vertical_crop(
+    in_width: int,
+    in_height: int,
+    position: Literal["left", "center", "right", "auto"] = "center",
+) -> dict:
+    """Crop box (``w``, ``h``, ``x``, ``y``) for a 9:16 frame inside the input."""
+    target_ratio = SHORTS_WIDTH / SHORTS_HEIGHT  # 0.5625
+
+    if in_width / in_height > target_ratio:
+        # Video is wider than 9:16 - crop sides
+        crop_width = int(in_height * target_ratio)
+
+        if position == "left":
+            x_offset = 0
+        elif position == "right":
+            x_offset = in_width - crop_width
+        else:  # center, auto - use center
+            x_offset = (in_width - crop_width) // 2
+
+        return {"w": crop_width, "h": in_height, "x": x_offset, "y": 0}
+
+    # Video is taller or equal - crop top/bottom
+    crop_height = int(in_width / target_ratio)
+    return {"w": in_width, "h": crop_height, "x": 0, "y": (in_height - crop_height) // 2}
+
+
+def crop_vertical(
+    video,
+    in_width: int,
+    in_height: int,
+    position: str = "center",
+    commands_path: Optional[str] = None,
+):
+    """Crop a video stream to 9:16 and scale it to Shorts dimensions.
+
+    ``commands_path`` is a ``sendcmd`` script that moves the crop over time
+    (see ``utils.reframe``); the crop filter is named ``crop@reframe`` so
+    the script can target it.
+    """
+    box = vertical_crop(in_width, in_height, position)
+
+    if commands_path:
+        video = video.filter("sendcmd", f=commands_path)
+        video = video.filter("crop@reframe", **box)
+    else:
+        video = video.filter("crop", **box)
+
+    return video.filter("scale", SHORTS_WIDTH, SHORTS_HEIGHT)
+
+
+def subtitle_force_style(
+    font_name: str = "Arial",
+    font_size: int = 24,
+    font_color: str = "white",
+    outline_color: str = "black",
+    outline_width: int = 2,
+    position: Literal["top", "center", "bottom"] = "bottom",
+    margin_v: int = 30,
+) -> str:
+    """libass ``force_style`` string for the ``subtitles`` filter."""
+    alignment = {"top": 6, "center": 10, "bottom": 2}[position]
+
+    return (
+        f"FontName={font_name},"
+        f"FontSize={font_size},"
+        f"PrimaryColour=&H{color_to_ass(font_color)},"
+        f"OutlineColour=&H{color_to_ass(outline_color)},"
+        f"Outline={outline_width},"
+        f"Alignment={alignment},"
+        f"MarginV={margin_v}"
+    )
+
+
+def burn_subtitles(video, subtitles_path: str, force_style: str, offset: float = 0.0):
+    """Render a subtitle file onto a video stream.
+
+    ``offset`` is the source time of the stream's first frame, for streams
+    cut out of the video the subtitles were timed against. Timestamps are
+    shifted so libass sees source time, then reset.
+    """
+    if offset:
+        video = video.filter("setpts", f"PTS+{offset}/TB")
+
+    video = video.filter("subtitles", subtitles_path, force_style=force_style)
+
+    if offset:
+        video = video.filter("setpts", "PTS-STARTPTS")
+    return video
+
+
+def normalize_loudness(audio, target_lufs: float = -14.0, true_peak: float = -1.5, lra: float = 11.0):
+    """Single-pass EBU R128 loudness normalization of an audio stream."""
+    # loudnorm only accepts 192 kHz input. Resampling explicitly keeps that rate
+    # from being negotiated upstream onto sibling branches of a split
+    audio = audio.filter("aresample", 192000)
+    audio = audio.filter("loudnorm", I=target_lufs, TP=true_peak, LRA=lra)
+    return audio.filter("aresample", 48000)
+
+
+def crossfade_loop(video, audio, length: float, crossfade: float, fps: str):
+    """Turn ``length + crossfade`` seconds of media into a seamless ``length``-second loop.
+
+    Plays from ``crossfade`` to the end and blends the last ``crossfade``
+    seconds into the first ones, so the output ends on the frame before
+    the one it starts with. ``fps`` is the source frame rate, which xfade
+    needs and trimming drops. ``audio`` may be None.
+    """
+    split = video.filter_multi_output("split")
+    body = split.stream(0).trim(start=crossfade, end=length + crossfade)
+    head = split.stream(1).trim(end=crossfade)
+    video = ffmpeg.filter(
+        [
+            body.setpts("PTS-STARTPTS").filter("fps", fps),
+            head.setpts("PTS-STARTPTS").filter("fps", fps),
+        ],
+        "xfade",
+        transition="fade",
+        duration=crossfade,
+        offset=length - crossfade,
+    )
+
+    if audio is not None:
+        # acrossfade produces no output when both inputs come from one asplit, so
+        # build the same linear crossfade from fades and a delayed mix
+        split = audio.filter_multi_output("asplit")
+        body = (
+            split.stream(0)
+            .filter("atrim", start=crossfade, end=length + crossfade)
+            .filter("asetpts", "PTS-STARTPTS")
+            .filter("afade", t="out", st=length - crossfade, d=crossfade)
+        )
+        head = (
+            split.stream(1)
+            .filter("atrim", end=crossfade)
+            .filter("asetpts", "PTS-STARTPTS")
+            .filter("afade", t="in", d=crossfade)
+            .filter("adelay", delays=int((length - crossfade) * 1000), all=1)
+        )
+        audio = ffmpeg.filter([body, head], "amix", inputs=2, duration="first", normalize=0)
+
+    return video, audio
+
+
+def color_to_ass(color: str) -> str:
+    """Convert color name to ASS format (BGR hex)."""
+    return ASS_COLORS.get(color.lower(), "FFFFFF")
@@ -0,0 +1,184 @@
+"""Thumbnail quality scoring: which frames of a video make good stills."""
+import numpy as np
+
+from utils.analysis import histograms
+
+# Analysis resolution, and frames scored per video whatever its length
+QUALITY_WIDTH = 160
+QUALITY_CANDIDATES = 96
+
+BATCH = 64  # frames per scoring batch
+
+# BT.601 luma weights
+LUMA = np.array([0.299, 0.587, 0.114], np.float32)
+
+# Skin tones in YCbCr (Chai & Ngan); a face in frame shows up as a skin patch
+# near the centre. A heuristic, not a detector: no model dependency needed
+SKIN_CB = (77, 127)
+SKIN_CR = (133, 173)
+FACE_AREA = 0.05  # skin fraction of the centre region that counts as a face
+
+WEIGHTS = {"sharpness": 0.35, "exposure": 0.25, "colorfulness": 0.2, "face": 0.2}
+
+# Frames whose histograms overlap more than this look the same
+DUPLICATE_OVERLAP = 0.85
+
+# Diversity never buys a frame scoring below this share of the best one
+MIN_RELATIVE_SCORE = 0.6
+
+
+def candidate_times(
+    cuts: list[float],
+    start: float,
+    end: float,
+    settle: float,
+    limit: int = QUALITY_CANDIDATES,
+) -> list[float]:
+    """Up to ``limit`` timestamps in ``[start, end]`` worth scoring, spread over the shots.
+
+    Shots between ``cuts`` get candidates in proportion to their length,
+    evenly spaced and at least ``settle`` seconds from a cut, where frames
+    are often mid-transition.
+    """
+    bounds = [start] + [cut for cut in cuts if start < cut < end] + [end]
+    shots = [(a + settle, b - settle) for a, b in zip(bounds, bounds[1:]) if b - a > 2 * settle]
+    if not shots:
+        shots = [(start, end)]
+
+    total = sum(b - a for a, b in shots)
+    times = []
+    for a, b in shots:
+        n = max(1, round(limit * (b - a) / total)) if total > 0 else 1
+        times.extend(a + (b - a) * (np.arange(n) + 0.5) / n)
+
+    # Short shots each got one; thin out evenly if that went over
+    if len(times) > limit:
+        times = [times[i] for i in np.linspace(0, len(times) - 1, limit).round().astype(int)]
+    return [round(float(t), 3) for t in times]
+
+
+def frame_features(frames: np.ndarray) -> dict:
+    """Raw per-frame features for ``(frames, height, width, 3)`` RGB frames.
+
+    Returns ``sharpness`` (Laplacian variance), ``exposure`` in [0, 1],
+    ``colorfulness`` (Hasler-Süsstrunk) and ``face`` in [0, 1], plus the
+    ``luma`` frames for later comparisons.
+    """
+    count = len(frames)
+    features = {name: np.zeros(count) for name in ("sharpness", "exposure", "colorfulness", "face")}
+    luma = np.empty(frames.shape[:3], np.uint8)
+
+    for offset in range(0, count, BATCH):
+        batch = frames[offset:offset + BATCH].astype(np.float32)
+        part = slice(offset, offset + len(batch))
+        y = batch @ LUMA
+        luma[part] = np.clip(y, 0, 255).astype(np.uint8)
+
+        laplacian = (
+            y[:, :-2, 1:-1] + y[:, 2:, 1:-1] + y[:, 1:-1, :-2] + y[:, 1:-1, 2:]
+            - 4 * y[:, 1:-1, 1:-1]
+        )
+        features["sharpness"][part] = laplacian.var(axis=(1, 2))
+
+        # Mid-grey average and few clipped pixels; flat frames (fades, title cards) score low
+        mean = y.mean(axis=(1, 2)) / 255
+        clipped = ((y < 16) | (y > 239)).mean(axis=(1, 2))
+        contrast = np.clip(y.std(axis=(1, 2)) / 50, 0, 1)
+        features["exposure"][part] = (1 - np.abs(mean - 0.45) / 0.55) * (1 - clipped) * contrast
+
+        r, g, b = batch[..., 0], batch[..., 1], batch[..., 2]
+        rg = r - g
+        yb = 0.5 * (r + g) - b
+        features["colorfulness"][part] = (
+            np.sqrt(rg.std(axis=(1, 2)) ** 2 + yb.std(axis=(1, 2)) ** 2)
+            + 0.3 * np.sqrt(rg.mean(axis=(1, 2)) ** 2 + yb.mean(axis=(1, 2)) ** 2)
+        )
+
+        height, width = y.shape[1:]
+        center = (slice(None), slice(height // 6, height * 5 // 6), slice(width // 4, width * 3 // 4))
+        cb = 128 - 0.168736 * r[center] - 0.331264 * g[center] + 0.5 * b[center]
+        cr = 128 + 0.5 * r[center] - 0.418688 * g[center] - 0.081312 * b[center]
+        skin = (
+            (cb >= SKIN_CB[0]) & (cb <= SKIN_CB[1]) & (cr >= SKIN_CR[0]) & (cr <= SKIN_CR[1])
+        ).mean(axis=(1, 2))
+        features["face"][part] = np.clip(skin / FACE_AREA, 0, 1)
+
+    features["luma"] = luma
+    return features
+
+
+def score_frames(features: dict) -> np.ndarray:
+    """Weighted score in [0, 1] per frame.
+
+    Sharpness and colorfulness have no natural scale, so they are ranked
+    against the other frames of the same video.
+    """
+    count = len(features["sharpness"])
+    if count == 0:
+        return np.zeros(0)
+
+    scores = np.zeros(count)
+    for name, weight in WEIGHTS.items():
+        values = features[name]
+        if name in ("sharpness", "colorfulness"):
+            values = _rank(values)
+        scores += weight * values
+    return scores
+
+
+def best_frames(frames: np.ndarray, times: np.ndarray, count: int, min_gap: float) -> list[int]:
+    """Indices of the ``count`` best distinct frames (``score_frames`` and ``pick_diverse``)."""
+    features = frame_features(frames)
+    return pick_diverse(score_frames(features), features["luma"], times, count, min_gap)
+
+
+def pick_diverse(
+    scores: np.ndarray,
+    luma: np.ndarray,
+    times: np.ndarray,
+    count: int,
+    min_gap: float,
+) -> list[int]:
+    """Indices of the ``count`` best frames that differ from each other.
+
+    Frames scoring at least ``MIN_RELATIVE_SCORE`` of the best are taken
+    unless they are within ``min_gap`` seconds of a better pick or their
+    histogram overlaps one by more than ``DUPLICATE_OVERLAP``. Remaining
+    slots go to the best frames that only keep the time gap, then to the
+    best of the rest. Returned in the order they were picked.
+    """
+    order = [int(i) for i in np.argsort(scores)[::-1]]
+    if not order:
+        return []
+
+    hist = histograms(luma)
+    floor = scores[order[0]] * MIN_RELATIVE_SCORE
+    picked: list[int] = []
+
+    def spaced(index: int) -> bool:
+        return all(abs(times[index] - times[p]) >= min_gap for p in picked)
+
+    def distinct(index: int) -> bool:
+        if not picked:
+            return True
+        return np.minimum(hist[picked], hist[index]).sum(axis=1).max() <= DUPLICATE_OVERLAP
+
+    for accept in (
+        lambda i: scores[i] >= floor and spaced(i) and distinct(i),
+        spaced,
+        lambda i: True,
+    ):
+        for index in order:
+            if len(picked) == count:
+                return picked
+            if index not in picked and accept(index):
+                picked.append(index)
+
+    return picked
+
+
+def _rank(values: np.ndarray) -> np.ndarray:
+    """Percentile rank of each value in [0, 1]."""
+    if len(values) < 2:
+        return np.ones(len(values))
+    return np.argsort(np.argsort(values)) / (len(values) - 1)
@@ -0,0 +1,207 @@
+"""Highlight scoring: which windows of a video make good clips."""
+import asyncio
+from contextlib import aclosing
+from typing import Optional
+import ffmpeg
+import numpy as np
+
+from utils.media import stream_ffmpeg
+from utils.scenes import CUT_THRESHOLD, SCENE_FPS
+
+# Feature resolution
+HOP = 0.1  # seconds per feature step
+AUDIO_RATE = 16000
+
+# Candidate windows start on this grid and come in this many lengths
+START_STEP = 0.5
+LENGTH_STEPS = 8
+
+# Frequency band that carries most speech energy
+VOICE_BAND = (300.0, 3400.0)
+
+# Speech rises and falls with syllables; steady tones and music beds don't
+SYLLABLE_STEPS = 7
+MIN_MODULATION = 3.0  # dB, loudness spread over SYLLABLE_STEPS
+
+BATCH = 4096  # audio steps per FFT batch
+STREAM_STEPS = 1024  # audio steps decoded and analyzed at a time (~100 s)
+
+
+async def read_audio_features(
+    source: str, sample_rate: int = AUDIO_RATE, hop: float = HOP
+) -> Optional[dict]:
+    """``audio_features`` of the first audio stream, decoded a chunk at a time.
+
+    Steps are independent, so each chunk is analyzed (off the event loop)
+    as it arrives and only the per-step features are kept: memory stays
+    flat however long the source is. Returns None if no samples decode.
+    """
+    size = int(sample_rate * hop)
+    chunks = stream_ffmpeg(
+        ffmpeg
+        .input(source)
+        .audio
+        .output("pipe:", format="f32le", acodec="pcm_f32le", ac=1, ar=sample_rate),
+        "analysis_audio",
+        STREAM_STEPS * size * 4,
+    )
+    parts = []
+    # Closed here, so ffmpeg is killed right away if this is cancelled
+    async with aclosing(chunks):
+        async for chunk in chunks:
+            samples = np.frombuffer(chunk, np.float32)
+            parts.append(await asyncio.to_thread(audio_features, samples, sample_rate, hop))
+
+    if not parts:
+        return None
+    return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+
+def audio_features(samples: np.ndarray, sample_rate: int = AUDIO_RATE, hop: float = HOP) -> dict:
+    """Per-step loudness (dBFS), voice-band energy ratio and spectral flatness."""
+    size = int(sample_rate * hop)
+    count = len(samples) // size
+    steps = samples[:count * size].reshape(count, size)
+
+    rms = np.sqrt((steps ** 2).mean(axis=1))
+    loudness = 20 * np.log10(rms + 1e-10)
+
+    freqs = np.fft.rfftfreq(size, 1 / sample_rate)
+    band = (freqs >= VOICE_BAND[0]) & (freqs <= VOICE_BAND[1])
+    taper = np.hanning(size).astype(np.float32)
+
+    voice = np.empty(count)
+    flatness = np.empty(count)
+    for offset in range(0, count, BATCH):
+        power = np.abs(np.fft.rfft(steps[offset:offset + BATCH] * taper, axis=1)) ** 2 + 1e-12
+        voice[offset:offset + BATCH] = power[:, band].sum(axis=1) / power.sum(axis=1)
+        flatness[offset:offset + BATCH] = (
+            np.exp(np.log(power).mean(axis=1)) / power.mean(axis=1)
+        )
+
+    return {"loudness": loudness, "voice": voice, "flatness": flatness}
+
+
+def score_windows(
+    duration: float,
+    min_duration: float,
+    max_duration: float,
+    silence_threshold: float,
+    audio: Optional[dict] = None,
+    scenes: Optional[np.ndarray] = None,
+    scene_fps: float = SCENE_FPS,
+    limit: int = 20,
+) -> list[dict]:
+    """Rank non-overlapping clip windows between ``min_duration`` and ``max_duration``.
+
+    Each step gets an interest score from speech activity, loudness above
+    ``silence_threshold`` and visual activity. A window scores its mean
+    interest plus how clean its edges are: silence or a cut at the start
+    and end make a natural clip.
+    """
+    count = int(duration / HOP)
+    min_len = max(int(round(min_duration / HOP)), 1)
+    max_len = min(int(round(max_duration / HOP)), count)
+    if count == 0 or min_len > max_len:
+        return []
+
+    if audio is not None and len(audio["loudness"]):
+        loudness = _fit(audio["loudness"], count, silence_threshold - 20)
+        voice = _fit(audio["voice"], count, 0.0)
+        flatness = _fit(audio["flatness"], count, 1.0)
+
+        silent = loudness < silence_threshold
+        speech = (
+            ~silent
+            & (voice > 0.5)
+            & (flatness < 0.5)
+            & (_modulation(loudness, SYLLABLE_STEPS) > MIN_MODULATION)
+        ).astype(np.float64)
+        ceiling = max(np.percentile(loudness, 95), silence_threshold + 1)
+        level = np.clip((loudness - silence_threshold) / (ceiling - silence_threshold), 0, 1)
+    else:
+        silent = np.zeros(count, bool)
+        speech = level = np.zeros(count)
+
+    if scenes is not None and len(scenes):
+        # Scene scores are sampled at scene_fps; spread them over the step grid
+        index = np.minimum((np.arange(count) * HOP * scene_fps).astype(int), len(scenes) - 1)
+        change = scenes[index]
+        cuts = np.zeros(count, bool)
+        cut_steps = (np.nonzero(scenes > CUT_THRESHOLD)[0] / scene_fps / HOP).astype(int)
+        cuts[cut_steps[cut_steps < count]] = True
+    else:
+        change = np.zeros(count)
+        cuts = np.zeros(count, bool)
+
+    interest = 0.5 * _smooth(speech, 5) + 0.3 * level + 0.2 * np.clip(change * 4, 0, 1)
+    edges = _dilate(silent | cuts, 3).astype(np.float64)
+    cumulative = np.concatenate([[0.0], np.cumsum(interest)])
+
+    starts = np.arange(0, count - min_len + 1, max(int(START_STEP / HOP), 1))
+    lengths = np.unique(np.linspace(min_len, max_len, LENGTH_STEPS).astype(int))
+    ideal = (min_len + max_len) / 2
+
+    # Every (start, length) pair at once; windows past the end score -inf
+    ends = starts[:, None] + lengths[None, :]
+    valid = ends <= count
+    ends = np.minimum(ends, count)
+    mean_interest = (cumulative[ends] - cumulative[starts][:, None]) / lengths[None, :]
+    edge_quality = (edges[starts][:, None] + edges[np.maximum(ends - 1, 0)]) / 2
+    fit = 1 - np.abs(lengths - ideal) / ideal
+
+    scores = 0.65 * mean_interest + 0.25 * edge_quality + 0.1 * fit[None, :]
+    scores = np.where(valid, scores, -np.inf)
+
+    order = np.argsort(scores, axis=None)[::-1]
+    picked = []
+    for flat in order:
+        if not np.isfinite(scores.flat[flat]):
+            break
+        row, col = divmod(int(flat), len(lengths))
+        start, end = starts[row], starts[row] + lengths[col]
+        # Overlapping a better clip by more than a third of either is a duplicate
+        if all(
+            min(end, e) - max(start, s) <= min(end - start, e - s) / 3
+            for s, e, _ in picked
+        ):
+            picked.append((start, end, scores.flat[flat]))
+            if len(picked) == limit:
+                break
+
+    return [
+        {
+            "start_time": round(float(start * HOP), 2),
+            "end_time": round(float(end * HOP), 2),
+            "duration": round(float((end - start) * HOP), 2),
+            "score": round(float(score), 3),
+        }
+        for start, end, score in picked
+    ]
+
+
+def _fit(values: np.ndarray, count: int, fill: float) -> np.ndarray:
+    """Truncate or pad a feature array to ``count`` steps."""
+    if len(values) >= count:
+        return values[:count]
+    return np.concatenate([values, np.full(count - len(values), fill)])
+
+
+def _smooth(values: np.ndarray, size: int) -> np.ndarray:
+    return np.convolve(values, np.ones(size) / size, mode="same")
+
+
+def _modulation(values: np.ndarray, size: int) -> np.ndarray:
+    """Standard deviation over a centered ``size``-step window, edge-padded."""
+    if len(values) < size:
+        return np.full(len(values), values.std() if len(values) else 0.0)
+    windows = np.lib.stride_tricks.sliding_window_view(values, size)
+    spread = windows.std(axis=1)
+    return np.pad(spread, (size // 2, size - 1 - size // 2), mode="edge")
+
+
+def _dilate(mask: np.ndarray, radius: int) -> np.ndarray:
+    """True wherever ``mask`` is True within ``radius`` steps."""
+    padded = np.pad(mask, radius)
+    windows = np.lib.stride_tricks.sliding_window_view(padded, 2 * radius + 1)
+    return windows.any(axis=1)
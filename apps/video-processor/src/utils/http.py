@@ -0,0 +1,40 @@
+from typing import Optional
+import httpx
+
+from config import get_settings
+
+settings = get_settings()
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared HTTP client, creating it on first use.
+
+    One pooled client is reused for downloads and callbacks so connections
+    (and their TLS sessions) are kept alive across jobs.
+    """
+    global _client
+
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            http2=settings.http2,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=settings.http_max_connections,
+                max_keepalive_connections=settings.http_max_keepalive_connections,
+                keepalive_expiry=30,
+            ),
+            timeout=httpx.Timeout(300, connect=10),
+        )
+
+    return _client
+
+
+async def close_http_client():
+    """Close the shared HTTP client (called on shutdown)."""
+    global _client
+
+    if _client is not None:
+        await _client.aclose()
+        _client = None
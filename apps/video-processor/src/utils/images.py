@@ -0,0 +1,87 @@
+"""In-process still-image operations (Pillow): watermark, resize, format conversion.
+
+Still images don't need an ffmpeg process; these run in milliseconds and
+are safe to call from a worker thread.
+"""
+from typing import Literal, Optional
+from PIL import Image
+
+Position = Literal["top-left", "top-right", "bottom-left", "bottom-right", "center"]
+
+# Pillow format names and save options per file extension
+SAVE_OPTIONS = {
+    "jpg": ("JPEG", {"quality": 90, "optimize": True}),
+    "jpeg": ("JPEG", {"quality": 90, "optimize": True}),
+    "png": ("PNG", {"compress_level": 6}),
+    "webp": ("WEBP", {"quality": 90, "method": 4}),
+}
+
+
+def load_image(path: str) -> Image.Image:
+    """Open and fully decode an image, so the file can be removed right away."""
+    with Image.open(path) as image:
+        image.load()
+        return image
+
+
+def resize(image: Image.Image, width: Optional[int] = None, height: Optional[int] = None) -> Image.Image:
+    """Resize, keeping the aspect ratio when only one dimension is given."""
+    if not width and not height:
+        return image
+    if not width:
+        width = max(round(image.width * height / image.height), 1)
+    if not height:
+        height = max(round(image.height * width / image.width), 1)
+    return image.resize((width, height), Image.Resampling.LANCZOS)
+
+
+def prepare_watermark(watermark: Image.Image, width: int, opacity: float) -> Image.Image:
+    """Watermark scaled to ``width`` pixels wide with its alpha multiplied by ``opacity``."""
+    mark = resize(watermark.convert("RGBA"), width=max(width, 1))
+    if opacity < 1.0:
+        alpha = mark.getchannel("A").point(lambda a: round(a * max(opacity, 0.0)))
+        mark.putalpha(alpha)
+    return mark
+
+
+def overlay_position(
+    size: tuple[int, int],
+    mark_size: tuple[int, int],
+    position: Position,
+    margin: int,
+) -> tuple[int, int]:
+    """Top-left corner of a ``mark_size`` overlay on a ``size`` image."""
+    (width, height), (mark_width, mark_height) = size, mark_size
+    return {
+        "top-left": (margin, margin),
+        "top-right": (width - mark_width - margin, margin),
+        "bottom-left": (margin, height - mark_height - margin),
+        "bottom-right": (width - mark_width - margin, height - mark_height - margin),
+        "center": ((width - mark_width) // 2, (height - mark_height) // 2),
+    }[position]
+
+
+def composite_watermark(
+    image: Image.Image,
+    mark: Image.Image,
+    position: Position,
+    margin: int,
+) -> Image.Image:
+    """Composite a prepared (RGBA) watermark onto ``image``.
+
+    Parts of the watermark that fall outside the image are clipped.
+    """
+    # paste() clips at the edges where alpha_composite() rejects them
+    layer = Image.new("RGBA", image.size)
+    layer.paste(mark, overlay_position(image.size, mark.size, position, margin))
+
+    result = Image.alpha_composite(image.convert("RGBA"), layer)
+    return result if "A" in image.getbands() else result.convert("RGB")
+
+
+def save_image(image: Image.Image, path: str):
+    """Save in the format given by the file extension, dropping alpha where unsupported."""
+    fmt, options = SAVE_OPTIONS[path.rsplit(".", 1)[-1].lower()]
+    if fmt == "JPEG" and image.mode != "RGB":
+        image = image.convert("RGB")
+    image.save(path, fmt, **options)
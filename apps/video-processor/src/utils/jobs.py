@@ -0,0 +1,123 @@
+import asyncio
+import functools
+import time
+
+from config import get_settings
+from utils.dedup import job_coalescer
+from utils.metrics import JOBS_TOTAL, JOB_DURATION, JOBS_IN_PROGRESS
+from utils.scheduler import lane_slot
+from utils.scratch import scratch
+from utils.tracing import tracer
+
+settings = get_settings()
+
+# Seconds a cancel request waits for the job to stop
+CANCEL_WAIT = 10.0
+
+# Running jobs by id, and the ones asked to stop
+_running: dict[str, asyncio.Task] = {}
+_cancelling: set[str] = set()
+
+
+def track_job(operation: str, lane: str = "encode"):
+    """Decorate a service method to record metrics and a trace under ``operation``.
+
+    Calls first wait for a slot in ``lane`` (see ``utils.scheduler``), then
+    work in a scratch directory of their own that is removed when they end
+    (see ``utils.scratch``).
+    Calls with a ``job_id`` can be stopped with ``cancel_running_job``. Services catch
+    their own errors and store the outcome in ``self.jobs``; a call with a
+    ``job_id`` that raises instead is recorded as failed, and methods without
+    a job record count as failed only when they raise. Stage timings from
+    the trace are added to the job record as ``timings``. When jobs run in
+    process, submissions coalesced onto the job are notified once it ends
+    (workers do this for the Redis backend).
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            job_id = kwargs.get("job_id")
+            jobs = getattr(self, "jobs", {})
+
+            if job_id is None:
+                async with lane_slot(lane), scratch.workspace(small=lane == "stills"):
+                    return await _run(operation, func, self, args, kwargs, job_id, jobs)
+
+            if isinstance(jobs, dict):
+                jobs.setdefault(job_id, {"status": "queued", "progress": 0})
+
+            # A task of its own, so cancelling the job leaves the caller running
+            task = asyncio.create_task(
+                _run_job(operation, lane, func, self, args, kwargs, job_id, jobs)
+            )
+            _running[job_id] = task
+            try:
+                return await task
+            except asyncio.CancelledError:
+                if job_id not in _cancelling:
+                    raise
+                jobs[job_id] = {"status": "cancelled"}
+            except Exception as e:
+                # Services record their own failures; this covers methods that raise
+                jobs[job_id] = {"status": "failed", "error": str(e)}
+                raise
+            finally:
+                _running.pop(job_id, None)
+                _cancelling.discard(job_id)
+                if settings.job_backend == "background":
+                    await job_coalescer.finished(job_id, jobs.get(job_id))
+
+        wrapper.lane = lane
+        return wrapper
+    return decorator
+
+
+async def cancel_running_job(job_id: str) -> bool:
+    """Stop a job running (or waiting for a slot) in this process.
+
+    Its ffmpeg and Whisper processes are killed, its slot is released and
+    its scratch directory is removed; the job record becomes ``cancelled``.
+    Returns False if no such job is running here.
+    """
+    task = _running.get(job_id)
+    if task is None:
+        return False
+
+    _cancelling.add(job_id)
+    task.cancel()
+    await asyncio.wait({task}, timeout=CANCEL_WAIT)
+    return True
+
+
+async def _run_job(
+    operation: str, lane: str, func, service, args, kwargs, job_id: str, jobs: dict
+):
+    async with lane_slot(lane), scratch.workspace(small=lane == "stills"):
+        return await _run(operation, func, service, args, kwargs, job_id, jobs)
+
+
+async def _run(operation: str, func, service, args, kwargs, job_id, jobs: dict):
+    JOBS_IN_PROGRESS.labels(operation).inc()
+    started = time.perf_counter()
+    status = "failed"
+
+    with tracer.span(f"job.{operation}", operation=operation, job_id=job_id) as span:
+        try:
+            result = await func(service, *args, **kwargs)
+            job = jobs.get(job_id)
+            status = job.get("status", "completed") if job else "completed"
+            return result
+        except asyncio.CancelledError:
+            status = "cancelled"
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            JOBS_IN_PROGRESS.labels(operation).dec()
+            JOB_DURATION.labels(operation).observe(elapsed)
+            JOBS_TOTAL.labels(operation, status).inc()
+
+            span.attributes["status"] = status
+            if status == "failed":
+                span.status = "ERROR"
+            if job_id in jobs:
+                jobs[job_id]["timings"] = {**span.stage_timings, "total": round(elapsed, 4)}
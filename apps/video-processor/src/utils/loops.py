@@ -0,0 +1,134 @@
+"""Loop-point scoring: where a segment can jump back to its start unnoticed."""
+import numpy as np
+
+from utils.analysis import histograms
+
+# Analysis resolution and rates
+LOOP_WIDTH = 96
+LOOP_FPS = 10.0
+AUDIO_RATE = 8000
+
+# SSIM block size and stabilizing constants (for intensities in [0, 1])
+BLOCK = 8
+SSIM_C1 = 0.01 ** 2
+SSIM_C2 = 0.03 ** 2
+
+HISTOGRAM_BINS = 32
+AUDIO_BANDS = 32
+
+VISUAL_WEIGHT = 0.7
+
+
+def frame_similarity(frames: np.ndarray, head: int) -> np.ndarray:
+    """Similarity in [0, 1] of every frame to each of the first ``head`` frames.
+
+    Combines block SSIM (structure) with a histogram intersection (tone).
+    Returns a ``(frames, head)`` matrix.
+    """
+    count, height, width = frames.shape
+    height, width = height // BLOCK * BLOCK, width // BLOCK * BLOCK
+
+    blocks = (
+        frames[:, :height, :width]
+        .reshape(count, height // BLOCK, BLOCK, width // BLOCK, BLOCK)
+        .transpose(0, 1, 3, 2, 4)
+        .reshape(count, -1, BLOCK * BLOCK)
+        .astype(np.float32) / 255.0
+    )
+    mean = blocks.mean(axis=2)
+    centered = blocks - mean[:, :, None]
+    var = (centered ** 2).mean(axis=2)
+    cov = np.einsum("npk,hpk->nhp", centered, centered[:head]) / (BLOCK * BLOCK)
+
+    mean_n, mean_h = mean[:, None, :], mean[None, :head, :]
+    var_n, var_h = var[:, None, :], var[None, :head, :]
+    ssim = (
+        (2 * mean_n * mean_h + SSIM_C1) * (2 * cov + SSIM_C2)
+        / ((mean_n ** 2 + mean_h ** 2 + SSIM_C1) * (var_n + var_h + SSIM_C2))
+    ).mean(axis=2)
+
+    hist = histograms(frames, HISTOGRAM_BINS)
+    overlap = np.minimum(hist[:, None, :], hist[None, :head, :]).sum(axis=2)
+
+    return np.clip(0.7 * ssim + 0.3 * overlap, 0.0, 1.0)
+
+
+def audio_similarity(samples: np.ndarray, starts: np.ndarray, window: int) -> np.ndarray:
+    """Similarity in [0, 1] of the ``window`` samples from each start to the first ones.
+
+    Compares band energies of the magnitude spectra (so the two windows
+    need no alignment search) scaled by their loudness ratio. Two silent
+    windows count as identical.
+    """
+    starts = np.clip(starts, 0, len(samples) - window)
+    # Row 0 is the head, the rest are the windows at each start
+    windows = np.concatenate([
+        samples[None, :window],
+        samples[starts[:, None] + np.arange(window)[None, :]],
+    ])
+
+    taper = np.hanning(window).astype(np.float32)
+    spectra = np.abs(np.fft.rfft(windows * taper, axis=1))
+    edges = np.unique(np.geomspace(1, spectra.shape[1], AUDIO_BANDS + 1).astype(int))
+    bands = np.log1p(np.add.reduceat(spectra, edges[:-1] - 1, axis=1))
+
+    norms = np.linalg.norm(bands, axis=1) + 1e-9
+    cosine = (bands[1:] @ bands[0]) / (norms[1:] * norms[0])
+
+    rms = np.sqrt((windows ** 2).mean(axis=1))
+    loudness = np.minimum(rms[1:], rms[0]) / (np.maximum(rms[1:], rms[0]) + 1e-9)
+
+    silent = np.maximum(rms[1:], rms[0]) < 1e-3
+    return np.where(silent, 1.0, np.clip(cosine, 0.0, 1.0) * loudness)
+
+
+def find_loop_points(
+    frames: np.ndarray,
+    samples: np.ndarray,
+    window: float,
+    fps: float = LOOP_FPS,
+    sample_rate: int = AUDIO_RATE,
+    limit: int = 10,
+    min_gap: float = 0.5,
+    earliest: float = 0.0,
+) -> list[tuple[float, float]]:
+    """Rank points where playback can jump back to the first frame.
+
+    A candidate ``t`` is scored by how closely the ``window`` seconds from
+    ``t`` match the first ``window`` seconds, which is both what follows a
+    cut back to the start and what a crossfade blends together. Frames and
+    samples must therefore extend ``window`` seconds past the last
+    candidate. Candidates before ``earliest`` seconds, or closer than
+    ``min_gap`` to a better one, are dropped.
+
+    Returns ``(seconds from the first frame, confidence)`` pairs, best first.
+    """
+    head = max(int(round(window * fps)), 1)
+    if len(frames) < 2 * head:
+        return []
+
+    similarity = frame_similarity(frames, head)
+
+    # Loops shorter than the compared window are not useful
+    starts = np.arange(max(head, int(np.ceil(earliest * fps))), len(frames) - head + 1)
+    if len(starts) == 0:
+        return []
+
+    rows = starts[:, None] + np.arange(head)[None, :]
+    scores = similarity[rows, np.arange(head)[None, :]].mean(axis=1)
+
+    audio_window = int(min(window, 1.0) * sample_rate)
+    if len(samples) >= 2 * audio_window > 0:
+        sample_starts = (starts / fps * sample_rate).astype(int)
+        audio = audio_similarity(samples, sample_starts, audio_window)
+        scores = VISUAL_WEIGHT * scores + (1 - VISUAL_WEIGHT) * audio
+
+    points = []
+    gap = min_gap * fps
+    for index in np.argsort(scores)[::-1]:
+        if all(abs(starts[index] - starts[chosen]) >= gap for chosen in points):
+            points.append(index)
+            if len(points) == limit:
+                break
+
+    return [(float(starts[i] / fps), float(scores[i])) for i in points]
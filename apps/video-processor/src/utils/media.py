@@ -0,0 +1,136 @@
+import asyncio
+import time
+from typing import AsyncIterator, Optional, Union
+import ffmpeg
+
+from utils.metrics import FFMPEG_SECONDS, FFMPEG_REALTIME_FACTOR
+from utils.scheduler import lower_priority
+from utils.tracing import tracer
+
+
+async def run_ffmpeg(
+    cmd: Union[list, ffmpeg.nodes.OutputStream],
+    operation: str,
+    media_duration: Optional[float] = None,
+    check: bool = True,
+) -> tuple[bytes, bytes]:
+    """Run ffmpeg as a subprocess without blocking the event loop.
+
+    Accepts either an argument list or an ffmpeg-python output stream.
+    Wall time (and realtime factor, when ``media_duration`` is known) is
+    recorded per operation. Raises ``ffmpeg.Error`` on failure when ``check``.
+    ffmpeg started from a background lane runs at lower CPU priority. If
+    the calling task is cancelled, ffmpeg is killed before the cancellation
+    propagates.
+    """
+    args = cmd if isinstance(cmd, list) else cmd.compile()
+
+    with tracer.span(f"ffmpeg.{operation}", stage="ffmpeg", media_duration=media_duration) as span:
+        started = time.perf_counter()
+        process = await asyncio.create_subprocess_exec(
+            *args,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        lower_priority(process.pid)
+        try:
+            stdout, stderr = await process.communicate()
+        except asyncio.CancelledError:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            span.set_error("cancelled")
+            raise
+        elapsed = time.perf_counter() - started
+
+        span.attributes["returncode"] = process.returncode
+        if process.returncode != 0:
+            span.set_error(stderr.decode(errors="replace")[-500:])
+
+    FFMPEG_SECONDS.labels(operation).observe(elapsed)
+    if media_duration and elapsed > 0:
+        FFMPEG_REALTIME_FACTOR.labels(operation).observe(media_duration / elapsed)
+
+    if check and process.returncode != 0:
+        raise ffmpeg.Error(args[0], stdout, stderr)
+
+    return stdout, stderr
+
+
+async def stream_ffmpeg(
+    cmd: Union[list, ffmpeg.nodes.OutputStream],
+    operation: str,
+    chunk_size: int,
+    media_duration: Optional[float] = None,
+) -> AsyncIterator[bytes]:
+    """Run ffmpeg like ``run_ffmpeg``, yielding its stdout in ``chunk_size`` pieces.
+
+    For outputs too large to hold at once; only the last piece may be
+    shorter. Raises ``ffmpeg.Error`` once the output ends if ffmpeg failed.
+    ffmpeg is killed when the generator is closed early; callers should
+    close it with ``contextlib.aclosing`` so that happens on cancellation.
+    """
+    args = cmd if isinstance(cmd, list) else cmd.compile()
+
+    # Not made current: it would leak into the consumer's context between chunks
+    span = tracer.start(f"ffmpeg.{operation}", media_duration=media_duration)
+    try:
+        started = time.perf_counter()
+        process = await asyncio.create_subprocess_exec(
+            *args,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        lower_priority(process.pid)
+        # Drained alongside stdout so a chatty ffmpeg never blocks on a full pipe
+        stderr = asyncio.create_task(process.stderr.read())
+        try:
+            while True:
+                try:
+                    chunk = await process.stdout.readexactly(chunk_size)
+                except asyncio.IncompleteReadError as e:
+                    chunk = e.partial
+                if chunk:
+                    yield chunk
+                if len(chunk) < chunk_size:
+                    break
+            await process.wait()
+        except BaseException:
+            stderr.cancel()
+            if process.returncode is None:
+                process.kill()
+            # Drain what's left in the pipes; the process isn't reaped until they close
+            await process.communicate()
+            span.set_error("stopped")
+            raise
+        elapsed = time.perf_counter() - started
+
+        span.attributes["returncode"] = process.returncode
+        errors = await stderr
+        if process.returncode != 0:
+            span.set_error(errors.decode(errors="replace")[-500:])
+    finally:
+        tracer.end(span, "ffmpeg")
+
+    FFMPEG_SECONDS.labels(operation).observe(elapsed)
+    if media_duration and elapsed > 0:
+        FFMPEG_REALTIME_FACTOR.labels(operation).observe(media_duration / elapsed)
+
+    if process.returncode != 0:
+        raise ffmpeg.Error(args[0], b"", errors)
+
+
+async def probe_media(source: str) -> dict:
+    """Run ffprobe on a path or URL, in a thread so the event loop keeps running."""
+    with tracer.span("ffprobe", stage="probe"):
+        return await asyncio.to_thread(ffmpeg.probe, source)
+
+
+async def probe_duration(source: str) -> Optional[float]:
+    """Best-effort media duration in seconds, or None if it can't be probed."""
+    try:
+        return float((await probe_media(source))["format"]["duration"])
+    except (ffmpeg.Error, OSError, KeyError, ValueError):
+        return None
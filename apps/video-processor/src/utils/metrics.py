@@ -0,0 +1,72 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+# Jobs
+JOBS_TOTAL = Counter(
+    "video_processor_jobs_total",
+    "Finished jobs by operation and final status",
+    ["operation", "status"],
+)
+JOB_DURATION = Histogram(
+    "video_processor_job_duration_seconds",
+    "End-to-end job latency",
+    ["operation"],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600),
+)
+JOBS_IN_PROGRESS = Gauge(
+    "video_processor_jobs_in_progress",
+    "Jobs currently running",
+    ["operation"],
+)
+QUEUE_DEPTH = Gauge(
+    "video_processor_queue_depth",
+    "Items waiting in internal queues",
+    ["queue"],
+)
+
+# ffmpeg
+FFMPEG_SECONDS = Histogram(
+    "video_processor_ffmpeg_seconds",
+    "Wall time of ffmpeg runs",
+    ["operation"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600),
+)
+FFMPEG_REALTIME_FACTOR = Histogram(
+    "video_processor_ffmpeg_realtime_factor",
+    "Media seconds processed per wall-clock second of ffmpeg",
+    ["operation"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+
+# Storage transfers (throughput = rate(bytes) / rate(seconds))
+TRANSFER_BYTES = Counter(
+    "video_processor_transfer_bytes_total",
+    "Bytes moved to or from storage",
+    ["direction"],
+)
+TRANSFER_SECONDS = Counter(
+    "video_processor_transfer_seconds_total",
+    "Time spent moving bytes to or from storage",
+    ["direction"],
+)
+
+# Caches (hit rate = hits / (hits + misses))
+CACHE_REQUESTS = Counter(
+    "video_processor_cache_requests_total",
+    "Cache lookups by cache and result",
+    ["cache", "result"],
+)
+
+# Callbacks
+CALLBACKS_TOTAL = Counter(
+    "video_processor_callbacks_total",
+    "Callback delivery attempts by result",
+    ["result"],
+)
+
+# Whisper
+WHISPER_SECONDS_PER_AUDIO_SECOND = Histogram(
+    "video_processor_whisper_seconds_per_audio_second",
+    "Whisper inference time per second of audio",
+    ["model"],
+    buckets=(0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10),
+)
@@ -0,0 +1,287 @@
+"""Durable job queue on Redis: the API enqueues jobs and ``worker.py`` runs them.
+
+Keys under ``job_queue_prefix``:
+
+- ``pending:<lane>``: list of job ids waiting for a worker, one per job lane
+  (see ``utils.scheduler``; consumed from the right)
+- ``active``: list of job ids claimed by a worker
+- ``leases``: sorted set of active job ids by lease deadline
+- ``job:<id>``: the job payload (operation, kwargs, attempts)
+- ``status:<id>``: the job record served by the ``/job/{job_id}`` routes
+- ``cancel:<id>``: set when a running job is to be stopped; also announced
+  on the ``cancel`` channel so the worker running it stops right away
+
+Claiming moves an id from its lane's ``pending`` list to ``active``
+atomically. Workers claim from each lane only as many jobs as that lane's
+cap, so Whisper jobs never wait behind encodes. Workers extend the lease
+while a job runs and acknowledge it when done; a job whose lease runs out
+(worker crash, OOM kill, lost node) goes back to the front of its
+``pending`` list until it has been delivered ``job_max_attempts`` times.
+"""
+import json
+import time
+from typing import Callable, Optional
+from fastapi import BackgroundTasks
+
+from config import get_settings
+from utils.dedup import coalesce, job_coalescer
+from utils.jobs import cancel_running_job
+from utils.scheduler import DEFAULT_TENANT, LANES, job_tenant, run_as
+
+settings = get_settings()
+
+
+class JobQueue:
+    def __init__(self, redis_url: str = "", prefix: str = ""):
+        self.redis_url = redis_url or settings.redis_url
+        self.prefix = prefix or settings.job_queue_prefix
+        self._redis = None
+
+    @property
+    def redis(self):
+        if self._redis is None:
+            import redis.asyncio as redis
+            self._redis = redis.from_url(self.redis_url, decode_responses=True)
+        return self._redis
+
+    def key(self, *parts: str) -> str:
+        return ":".join((self.prefix, *parts))
+
+    async def enqueue(
+        self,
+        operation: str,
+        job_id: str,
+        kwargs: dict,
+        lane: str = "encode",
+        tenant: str = DEFAULT_TENANT,
+    ):
+        """Queue ``operation`` (``"Service.method"``) to run with ``kwargs`` in ``lane``."""
+        job = {
+            "id": job_id,
+            "operation": operation,
+            "kwargs": kwargs,
+            "lane": lane,
+            "tenant": tenant,
+            "attempts": 0,
+            "enqueued_at": time.time(),
+        }
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.set(self.key("job", job_id), json.dumps(job))
+            pipe.set(
+                self.key("status", job_id),
+                json.dumps({"status": "queued", "progress": 0}),
+                ex=settings.job_status_ttl,
+            )
+            pipe.lpush(self.key("pending", lane), job_id)
+            await pipe.execute()
+
+    async def claim(self, lane: str = "encode", timeout: float = 5.0) -> Optional[dict]:
+        """Wait up to ``timeout`` seconds for a job in ``lane`` and lease it to this worker."""
+        job_id = await self.redis.blmove(
+            self.key("pending", lane), self.key("active"), timeout, "RIGHT", "LEFT"
+        )
+        if job_id is None:
+            return None
+
+        await self.redis.zadd(
+            self.key("leases"), {job_id: time.time() + settings.job_visibility_timeout}
+        )
+
+        raw = await self.redis.get(self.key("job", job_id))
+        if raw is None:
+            # Acknowledged by a worker whose lease had already expired
+            await self._release(job_id)
+            return None
+
+        job = json.loads(raw)
+        job["attempts"] += 1
+        await self.redis.set(self.key("job", job_id), json.dumps(job))
+        return job
+
+    async def extend(self, job_id: str):
+        """Heartbeat: push the lease deadline out by another visibility timeout."""
+        await self.redis.zadd(
+            self.key("leases"),
+            {job_id: time.time() + settings.job_visibility_timeout},
+            xx=True,
+        )
+
+    async def ack(self, job_id: str):
+        """Finish a job; it will not be delivered again."""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.lrem(self.key("active"), 1, job_id)
+            pipe.zrem(self.key("leases"), job_id)
+            pipe.delete(self.key("job", job_id), self.key("cancel", job_id))
+            await pipe.execute()
+
+    async def cancel(self, job_id: str) -> Optional[str]:
+        """Cancel a job: drop it if still pending, otherwise tell its worker to stop it.
+
+        Returns the job's new status (``cancelled``, or ``cancelling`` while
+        the worker stops it), or None if the job isn't queued or running.
+        """
+        for lane in LANES:
+            if await self.redis.lrem(self.key("pending", lane), 0, job_id):
+                await self.redis.delete(self.key("job", job_id))
+                await self.set_status(job_id, {"status": "cancelled"})
+                return "cancelled"
+
+        if not await self.redis.exists(self.key("job", job_id)):
+            return None
+
+        await self.redis.set(self.key("cancel", job_id), 1, ex=settings.job_status_ttl)
+        await self.redis.publish(self.key("cancel"), job_id)
+        return "cancelling"
+
+    async def is_cancelled(self, job_id: str) -> bool:
+        return bool(await self.redis.exists(self.key("cancel", job_id)))
+
+    async def cancellations(self):
+        """Ids of jobs as their cancellation is requested (for workers)."""
+        pubsub = self.redis.pubsub()
+        await pubsub.subscribe(self.key("cancel"))
+        try:
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    yield message["data"]
+        finally:
+            await pubsub.close()
+
+    async def retry(self, job_id: str, lane: str = "encode"):
+        """Give a job back after an error; it goes to the back of its ``pending`` list."""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.lrem(self.key("active"), 1, job_id)
+            pipe.zrem(self.key("leases"), job_id)
+            pipe.lpush(self.key("pending", lane), job_id)
+            await pipe.execute()
+
+    async def requeue_expired(self) -> int:
+        """Return jobs with expired leases to ``pending``, or fail them after too many attempts.
+
+        Safe to run from every worker: removing the lease decides which one
+        requeues a job. Returns the number of jobs requeued or failed.
+        """
+        now = time.time()
+
+        # Claimed but never leased (worker died between the two steps): lease them now
+        active = await self.redis.lrange(self.key("active"), 0, -1)
+        if active:
+            await self.redis.zadd(
+                self.key("leases"),
+                {job_id: now + settings.job_visibility_timeout for job_id in active},
+                nx=True,
+            )
+
+        expired = await self.redis.zrangebyscore(self.key("leases"), "-inf", now)
+        handled = 0
+        for job_id in expired:
+            if not await self.redis.zrem(self.key("leases"), job_id):
+                continue  # another worker got here first
+            handled += 1
+
+            raw = await self.redis.get(self.key("job", job_id))
+            job = json.loads(raw) if raw else None
+
+            if job is None or job["attempts"] >= settings.job_max_attempts:
+                await self.redis.lrem(self.key("active"), 1, job_id)
+                if job is not None:
+                    await self.redis.delete(self.key("job", job_id))
+                    await self.set_status(job_id, {
+                        "status": "failed",
+                        "error": f"Worker lost the job {job['attempts']} times",
+                    })
+                continue
+
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.lrem(self.key("active"), 1, job_id)
+                # Next in line
+                pipe.rpush(self.key("pending", job.get("lane", "encode")), job_id)
+                await pipe.execute()
+            await self.set_status(job_id, {"status": "queued", "progress": 0, "retry": job["attempts"]})
+
+        return handled
+
+    async def set_status(self, job_id: str, record: dict):
+        await self.redis.set(
+            self.key("status", job_id), json.dumps(record, default=str), ex=settings.job_status_ttl
+        )
+
+    async def get_status(self, job_id: str) -> Optional[dict]:
+        raw = await self.redis.get(self.key("status", job_id))
+        return json.loads(raw) if raw else None
+
+    async def pending(self) -> dict[str, int]:
+        """Queued jobs per lane."""
+        return {lane: await self.redis.llen(self.key("pending", lane)) for lane in LANES}
+
+    async def close(self):
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+    async def _release(self, job_id: str):
+        await self.redis.lrem(self.key("active"), 1, job_id)
+        await self.redis.zrem(self.key("leases"), job_id)
+
+
+job_queue = JobQueue()
+
+
+def operation_name(method: Callable) -> str:
+    """Queue name of a bound service method, e.g. ``VideoProcessor.transcode``."""
+    return f"{type(method.__self__).__name__}.{method.__name__}"
+
+
+async def submit_job(
+    background_tasks: BackgroundTasks, method: Callable, **kwargs
+) -> tuple[str, dict]:
+    """Run a service job method in the background, as configured by ``job_backend``.
+
+    ``kwargs`` must include ``job_id``. With the Redis backend they must also
+    be JSON-serializable; the job runs in whichever worker claims it.
+
+    A submission identical to a running or recently completed job is not
+    run again: the existing job's id and record are returned instead (see
+    ``utils.dedup``). Otherwise returns the new job id and a
+    ``processing`` record.
+
+    The job runs in the method's lane and is accounted to the caller's
+    tenant (see ``utils.scheduler``).
+    """
+    operation = operation_name(method)
+    existing = await coalesce(operation, kwargs, method.__self__.get_job_status)
+    if existing is not None:
+        return existing
+
+    tenant = job_tenant(kwargs.get("callback_url"))
+    if settings.job_backend == "redis":
+        await job_queue.enqueue(
+            operation, kwargs["job_id"], kwargs, lane=method.lane, tenant=tenant
+        )
+    else:
+        # Recorded now, not when the task starts, so identical submissions
+        # made in between find the job instead of running it again
+        method.__self__.jobs.setdefault(kwargs["job_id"], {"status": "queued", "progress": 0})
+        background_tasks.add_task(run_as, tenant, method, **kwargs)
+    return kwargs["job_id"], {"status": "processing"}
+
+
+async def cancel_job(job_id: str) -> Optional[str]:
+    """Cancel a submitted job wherever it runs, as configured by ``job_backend``.
+
+    Returns the job's new status, or None if it isn't queued or running.
+    """
+    if settings.job_backend == "redis":
+        status = await job_queue.cancel(job_id)
+        if status == "cancelled":
+            # Never reached a worker, so nothing else will report it
+            await job_coalescer.finished(job_id, {"status": "cancelled"})
+        return status
+    return "cancelled" if await cancel_running_job(job_id) else None
+
+
+async def queued_job_status(job_id: str) -> Optional[dict]:
+    """Job record published by a worker, when jobs run on the Redis queue."""
+    if settings.job_backend != "redis":
+        return None
+    return await job_queue.get_status(job_id)
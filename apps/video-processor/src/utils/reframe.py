@@ -0,0 +1,105 @@
+"""Content-aware reframing: where to put a 9:16 window over time."""
+import numpy as np
+
+# Analysis resolution and rate; reframing only needs coarse motion
+REFRAME_WIDTH = 192
+REFRAME_FPS = 5.0
+
+# Instance name targeted by the sendcmd script
+CROP_TARGET = "crop@reframe"
+
+
+def saliency(frames: np.ndarray) -> np.ndarray:
+    """Per-pixel interest for ``(frames, height, width)`` grayscale frames.
+
+    Motion energy (absolute frame difference) dominates; gradient energy
+    keeps static detail such as a talking head from scoring zero.
+    """
+    frames = frames.astype(np.float32)
+
+    motion = np.abs(np.diff(frames, axis=0, prepend=frames[:1]))
+    edges = np.abs(np.diff(frames, axis=2, append=frames[:, :, -1:]))
+    edges += np.abs(np.diff(frames, axis=1, append=frames[:, -1:, :]))
+
+    # Normalize each frame so lighting changes don't swamp the scores
+    motion /= motion.mean(axis=(1, 2), keepdims=True) + 1.0
+    edges /= edges.mean(axis=(1, 2), keepdims=True) + 1.0
+    return 2.0 * motion + edges
+
+
+def track_window(
+    frames: np.ndarray,
+    window: int,
+    axis: int = 2,
+    fps: float = REFRAME_FPS,
+    smoothing: float = 1.0,
+) -> np.ndarray:
+    """Offset of the most salient ``window``-pixel band in each frame.
+
+    ``axis`` is 2 to move the window horizontally, 1 vertically. Scores are
+    smoothed over ``smoothing`` seconds before picking a position, and the
+    resulting path is smoothed again so the camera pans instead of jumping.
+    Returns float offsets in analysis pixels, one per frame.
+    """
+    size = frames.shape[axis]
+    if window >= size or len(frames) == 0:
+        return np.zeros(len(frames))
+
+    # Energy per column (or row), then every window's total via a cumsum
+    profile = saliency(frames).sum(axis=3 - axis)
+    cumulative = np.pad(np.cumsum(profile, axis=1), ((0, 0), (1, 0)))
+    scores = cumulative[:, window:] - cumulative[:, :-window]
+
+    # Prefer the centre when nothing stands out
+    positions = np.arange(scores.shape[1])
+    center = (size - window) / 2
+    scores *= 1.0 - 0.15 * np.abs(positions - center) / max(center, 1.0)
+
+    kernel = max(int(round(smoothing * fps)), 1)
+    scores = _moving_average(scores, kernel)
+    offsets = scores.argmax(axis=1).astype(np.float64)
+
+    return np.clip(_moving_average(offsets, kernel * 2 + 1), 0, size - window)
+
+
+def sendcmd_script(
+    offsets: np.ndarray,
+    fps: float,
+    scale: float,
+    limit: int,
+    attribute: str = "x",
+    target: str = CROP_TARGET,
+) -> str:
+    """``sendcmd`` script that pans a crop along ``offsets``.
+
+    Offsets sampled at ``fps`` are scaled to output pixels and linearly
+    interpolated between samples with a per-frame ``t`` expression.
+    """
+    points = np.clip(np.round(offsets * scale), 0, limit).astype(int)
+    lines = []
+
+    for i, value in enumerate(points):
+        start = i / fps
+        if i + 1 < len(points) and points[i + 1] != value:
+            delta = points[i + 1] - value
+            expr = f"{value}+({delta})*(t-{start:.3f})*{fps:g}"
+        else:
+            expr = str(value)
+
+        if lines and lines[-1][1] == expr == str(value):
+            continue
+        lines.append((start, expr))
+
+    return "".join(f"{start:.3f} {target} {attribute} {expr};\n" for start, expr in lines)
+
+
+def _moving_average(values: np.ndarray, size: int) -> np.ndarray:
+    """Centered moving average along the first axis, edge-padded."""
+    if size <= 1 or len(values) < 2:
+        return values
+
+    pad = size // 2
+    padded = np.pad(values, [(pad, size - 1 - pad)] + [(0, 0)] * (values.ndim - 1), mode="edge")
+    cumulative = np.cumsum(padded, axis=0, dtype=np.float64)
+    cumulative = np.concatenate([np.zeros_like(cumulative[:1]), cumulative])
+    return (cumulative[size:] - cumulative[:-size]) / size
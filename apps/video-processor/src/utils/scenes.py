@@ -0,0 +1,107 @@
+"""Scene-change index: one low-resolution decode per source, shared by services."""
+import asyncio
+from contextlib import aclosing
+from typing import Optional
+import numpy as np
+
+from utils.analysis import analysis_size, histograms, stream_frames
+from utils.analysis_cache import analysis_cache, fingerprint
+from utils.tracing import tracer
+
+# Analysis resolution and rate; cuts are located to within 1 / SCENE_FPS
+SCENE_WIDTH = 64
+SCENE_FPS = 4.0
+
+# A histogram difference above this between samples is a cut
+CUT_THRESHOLD = 0.35
+
+# Frames decoded and binned at a time (about 8 minutes at SCENE_FPS)
+SCENE_CHUNK_FRAMES = 2048
+
+# Bumped whenever the index format or scoring changes
+INDEX_VERSION = 1
+
+
+def scene_scores(hist: np.ndarray) -> np.ndarray:
+    """Change from the previous frame in [0, 1], from per-frame ``histograms``.
+
+    Peaks above ``CUT_THRESHOLD`` are cuts.
+    """
+    if len(hist) < 2:
+        return np.zeros(len(hist))
+
+    changes = 0.5 * np.abs(np.diff(hist, axis=0)).sum(axis=1)
+    return np.concatenate([[0.0], changes])
+
+
+def find_cuts(scores: np.ndarray, fps: float = SCENE_FPS) -> list[float]:
+    """Start time of every shot after the first."""
+    return [round(float(i / fps), 3) for i in np.nonzero(scores > CUT_THRESHOLD)[0]]
+
+
+async def scene_index(source: str, probe: dict) -> dict:
+    """Scene scores and cuts for a local file, computed once per source.
+
+    Returns ``{"fps", "scores", "cuts"}`` where ``scores[i]`` is the change
+    at ``i / fps`` seconds. Results are cached by content fingerprint, so
+    any later request for the same video skips the decode.
+    """
+    key = await asyncio.to_thread(fingerprint, source)
+    name = f"scenes_v{INDEX_VERSION}"
+
+    index = analysis_cache.get(key, name)
+    if index is not None:
+        return index
+
+    video = next((s for s in probe["streams"] if s["codec_type"] == "video"), None)
+    if video is None:
+        index = {"fps": SCENE_FPS, "scores": [], "cuts": []}
+    else:
+        width, height = analysis_size(int(video["width"]), int(video["height"]), SCENE_WIDTH)
+        # Binned a chunk at a time as frames decode, off the event loop;
+        # only the histograms (a few hundred bytes a frame) are kept
+        parts = []
+        frames = stream_frames(source, width, height, SCENE_FPS, SCENE_CHUNK_FRAMES)
+        async with aclosing(frames):
+            async for chunk in frames:
+                parts.append(await asyncio.to_thread(histograms, chunk))
+        hist = np.concatenate(parts) if parts else np.zeros((0, 32))
+
+        with tracer.span("scenes.index", stage="analysis"):
+            scores = await asyncio.to_thread(scene_scores, hist)
+
+        index = {
+            "fps": SCENE_FPS,
+            "scores": np.round(scores, 4).tolist(),
+            "cuts": find_cuts(scores),
+        }
+
+    analysis_cache.put(key, name, index)
+    return index
+
+
+def snap_to_cuts(
+    timestamps: list[float],
+    cuts: list[float],
+    tolerance: float,
+    offset: float = 0.0,
+    limit: Optional[float] = None,
+) -> list[float]:
+    """Move each timestamp within ``tolerance`` of a cut to ``cut + offset``.
+
+    A positive ``offset`` lands just inside the new shot, past any
+    transition frames. Results are clamped to ``[0, limit]``.
+    """
+    if not cuts:
+        return list(timestamps)
+
+    cut_times = np.asarray(cuts)
+    snapped = []
+    for t in timestamps:
+        nearest = cut_times[np.abs(cut_times - t).argmin()]
+        if abs(nearest - t) <= tolerance:
+            t = float(nearest) + offset
+        if limit is not None:
+            t = min(t, limit)
+        snapped.append(round(max(t, 0.0), 3))
+    return snapped
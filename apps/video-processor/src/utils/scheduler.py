@@ -0,0 +1,155 @@
+"""Job lanes: per-type concurrency caps with fair admission across tenants.
+
+Every tracked operation runs in a lane:
+
+- ``stills``: interactive requests that touch a frame or image at most
+  (frame grabs, watermarks, probes)
+- ``encode``: ffmpeg renders and anything that decodes a whole video
+  (analysis, grids, storyboards, best frames)
+- ``transcribe``: Whisper jobs
+
+Each lane has its own cap, so stills never wait behind a saturated encode
+lane. Processes started from the ``encode`` and ``transcribe`` lanes run
+at ``background_nice``, leaving the CPU to interactive work when both
+compete. When a lane is full, waiting calls are admitted round-robin by
+tenant (API key, else callback host) rather than first come, first
+served, so one client's batch can't starve everyone else.
+"""
+import asyncio
+import hashlib
+import os
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Optional
+from urllib.parse import urlsplit
+
+from config import get_settings
+from utils.metrics import QUEUE_DEPTH
+
+settings = get_settings()
+
+LANES = ("stills", "encode", "transcribe")
+BACKGROUND_LANES = ("encode", "transcribe")
+DEFAULT_TENANT = "anonymous"
+
+# Tenant of the request (set from the API key) or job being handled
+current_tenant: ContextVar[Optional[str]] = ContextVar("tenant", default=None)
+_current_lane: ContextVar[Optional[str]] = ContextVar("lane", default=None)
+
+
+def lane_limit(lane: str) -> int:
+    return {
+        "stills": settings.stills_concurrency,
+        "encode": settings.max_concurrent_jobs,
+        "transcribe": settings.transcribe_concurrency,
+    }[lane]
+
+
+def api_key_tenant(api_key: str) -> str:
+    """Tenant id for an API key; the key itself is never stored."""
+    return f"key:{hashlib.sha256(api_key.encode()).hexdigest()[:16]}"
+
+
+def job_tenant(callback_url: Optional[str] = None) -> str:
+    """Tenant a submitted job is accounted to: the caller's API key, else its callback host."""
+    tenant = current_tenant.get()
+    if tenant:
+        return tenant
+    if callback_url:
+        host = urlsplit(callback_url).hostname
+        if host:
+            return f"callback:{host.lower()}"
+    return DEFAULT_TENANT
+
+
+async def run_as(tenant: str, func, **kwargs):
+    """Await ``func(**kwargs)`` with ``tenant`` as the current tenant."""
+    current_tenant.set(tenant)
+    return await func(**kwargs)
+
+
+def process_niceness() -> int:
+    """Niceness for a process started by the current operation."""
+    return settings.background_nice if _current_lane.get() in BACKGROUND_LANES else 0
+
+
+def lower_priority(pid: int):
+    """Renice a child process started from a background lane."""
+    niceness = process_niceness()
+    if niceness:
+        try:
+            os.setpriority(os.PRIO_PROCESS, pid, niceness)
+        except OSError:
+            pass
+
+
+class Lane:
+    """A concurrency cap whose waiters are admitted round-robin by tenant."""
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = limit
+        self.active = 0
+        # Waiters per tenant, in turn order: a tenant moves to the back once served
+        self._waiters: OrderedDict[str, deque[asyncio.Future]] = OrderedDict()
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(waiters) for waiters in self._waiters.values())
+
+    async def acquire(self, tenant: str):
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(tenant, deque()).append(future)
+        QUEUE_DEPTH.labels(f"jobs_{self.name}").inc()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()  # admitted just as it was cancelled
+            else:
+                self._discard(tenant, future)
+            raise
+        finally:
+            QUEUE_DEPTH.labels(f"jobs_{self.name}").dec()
+
+    def release(self):
+        self.active -= 1
+        while self.active < self.limit and self._waiters:
+            tenant, waiters = self._waiters.popitem(last=False)
+            future = waiters.popleft()
+            if waiters:
+                self._waiters[tenant] = waiters
+            if not future.done():
+                self.active += 1
+                future.set_result(None)
+
+    def _discard(self, tenant: str, future: asyncio.Future):
+        waiters = self._waiters.get(tenant)
+        if waiters is None:
+            return
+        try:
+            waiters.remove(future)
+        except ValueError:
+            pass
+        if not waiters:
+            del self._waiters[tenant]
+
+
+lanes = {lane: Lane(lane, lane_limit(lane)) for lane in LANES}
+
+
+@asynccontextmanager
+async def lane_slot(lane: str):
+    """Hold a slot in ``lane`` for the current tenant."""
+    await lanes[lane].acquire(current_tenant.get() or DEFAULT_TENANT)
+    token = _current_lane.set(lane)
+    try:
+        yield
+    finally:
+        _current_lane.reset(token)
+        lanes[lane].release()
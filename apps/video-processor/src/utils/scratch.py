@@ -0,0 +1,232 @@
+"""Scratch space: per-job working directories with a disk quota.
+
+Every tracked operation works in a directory of its own, created on first
+use and removed when the operation ends, whether it completed, failed or
+was cancelled. Downloads reserve their size (times ``scratch_reserve_factor``,
+room for outputs derived from them) before writing; when the quota or the
+free-disk floor would be exceeded, the download waits for other jobs to
+release their space, and fails only if nothing else holds any.
+
+Directories live under an instance directory per process, locked for the
+life of the process, so ``sweep`` can remove what crashed processes left
+behind without touching live ones. With ``scratch_tmpfs_dir`` set, small
+(stills) jobs work on tmpfs; downloads that don't fit its quota spill to
+disk.
+"""
+import asyncio
+import fcntl
+import logging
+import os
+import shutil
+import uuid
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+LOCK_FILE = ".lock"
+
+
+class ScratchSpaceError(RuntimeError):
+    """A job needs more scratch space than can ever be available."""
+
+
+class Pool:
+    """Reserved bytes against a quota on one filesystem."""
+
+    def __init__(self, root: str, quota: int, min_free: int = 0):
+        self.root = root
+        self.quota = quota
+        self.min_free = min_free
+        self.reserved = 0
+        self._instance: Optional[str] = None
+        self._lock_fd: Optional[int] = None
+
+    @property
+    def instance(self) -> str:
+        """This process's directory under ``root``, locked while the process lives."""
+        if self._instance is None:
+            name = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+            # Locked under a hidden name first, so a sweep never sees it unlocked
+            pending = os.path.join(self.root, f".{name}")
+            os.makedirs(pending)
+            self._lock_fd = os.open(os.path.join(pending, LOCK_FILE), os.O_CREAT | os.O_RDWR)
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            self._instance = os.path.join(self.root, name)
+            os.rename(pending, self._instance)
+        return self._instance
+
+    def fits(self, nbytes: int) -> bool:
+        if self.reserved + nbytes > self.quota:
+            return False
+        os.makedirs(self.root, exist_ok=True)
+        # Reserved space may not be written yet; count it as already used
+        free = shutil.disk_usage(self.root).free - self.reserved
+        return free - nbytes >= self.min_free
+
+
+class Workspace:
+    """One job's scratch directory (and its spill directory on disk)."""
+
+    def __init__(self, manager: "ScratchSpace", small: bool):
+        self.manager = manager
+        self.name = uuid.uuid4().hex[:12]
+        self.primary = manager.tmpfs if small and manager.tmpfs else manager.disk
+        self.reserved: dict[Pool, int] = {}
+        self.dirs: list[str] = []
+
+    def path(self, filename: str) -> str:
+        """Path for ``filename`` in the workspace."""
+        return os.path.join(self._dir(self.primary), filename)
+
+    async def allocate(self, filename: str, size: Optional[int]) -> str:
+        """Reserve room for a ``size``-byte download and return its path.
+
+        Unknown sizes reserve nothing up front; call ``account`` once known.
+        """
+        pool = self.primary
+        if size:
+            needed = int(size * settings.scratch_reserve_factor)
+            if pool is self.manager.tmpfs and not pool.fits(needed):
+                pool = self.manager.disk
+            await self.manager.reserve(pool, needed, held=self.reserved.get(pool, 0))
+            self.reserved[pool] = self.reserved.get(pool, 0) + needed
+        return os.path.join(self._dir(pool), filename)
+
+    def account(self, path: str):
+        """Count a file written without a reservation against the quota."""
+        tmpfs = self.manager.tmpfs
+        on_tmpfs = tmpfs is not None and path.startswith(os.path.join(tmpfs.root, ""))
+        pool = tmpfs if on_tmpfs else self.manager.disk
+        size = os.path.getsize(path)
+        pool.reserved += size
+        self.reserved[pool] = self.reserved.get(pool, 0) + size
+
+    def _dir(self, pool: Pool) -> str:
+        path = os.path.join(pool.instance, self.name)
+        if path not in self.dirs:
+            os.makedirs(path, exist_ok=True)
+            self.dirs.append(path)
+        return path
+
+    def remove(self):
+        for path in self.dirs:
+            shutil.rmtree(path, ignore_errors=True)
+        for pool, nbytes in self.reserved.items():
+            self.manager.release(pool, nbytes)
+        self.dirs.clear()
+        self.reserved.clear()
+
+
+class ScratchSpace:
+    """Hands out workspaces and admits reservations against the quotas."""
+
+    def __init__(self):
+        self.disk = Pool(
+            settings.temp_dir, settings.scratch_quota_bytes, settings.scratch_min_free_bytes
+        )
+        self.tmpfs = (
+            Pool(settings.scratch_tmpfs_dir, settings.scratch_tmpfs_quota_bytes)
+            if settings.scratch_tmpfs_dir
+            else None
+        )
+        self._released = asyncio.Event()
+
+    @asynccontextmanager
+    async def workspace(self, small: bool = False):
+        """A fresh workspace, removed with everything in it on exit.
+
+        ``small`` jobs are placed on tmpfs when it is configured.
+        """
+        workspace = Workspace(self, small)
+        token = _current.set(workspace)
+        try:
+            yield workspace
+        finally:
+            _current.reset(token)
+            workspace.remove()
+
+    async def reserve(self, pool: Pool, nbytes: int, held: int = 0):
+        """Wait until ``nbytes`` fit in ``pool``, then reserve them.
+
+        ``held`` is what the caller already reserves there: waiting only
+        helps while someone else holds space.
+        """
+        while not pool.fits(nbytes):
+            if pool.reserved <= held:
+                raise ScratchSpaceError(
+                    f"Not enough scratch space in {pool.root} for {nbytes} bytes"
+                )
+            self._released.clear()
+            await self._released.wait()
+        pool.reserved += nbytes
+
+    def release(self, pool: Pool, nbytes: int):
+        pool.reserved -= nbytes
+        self._released.set()
+
+    def sweep(self):
+        """Remove scratch left behind by processes that are gone."""
+        for pool in filter(None, (self.disk, self.tmpfs)):
+            os.makedirs(pool.root, exist_ok=True)
+            for entry in os.scandir(pool.root):
+                if entry.name.startswith(".") or _is_live_instance(entry):
+                    continue
+                logger.info("Removing orphaned scratch %s", entry.path)
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                else:
+                    try:
+                        os.remove(entry.path)
+                    except OSError:
+                        pass
+
+
+def _is_live_instance(entry: os.DirEntry) -> bool:
+    """Whether a process still holds the instance directory's lock."""
+    if not entry.is_dir(follow_symlinks=False):
+        return False
+    try:
+        fd = os.open(os.path.join(entry.path, LOCK_FILE), os.O_RDWR)
+    except OSError:
+        return False
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return True
+    finally:
+        os.close(fd)
+    return False
+
+
+_current: ContextVar[Optional[Workspace]] = ContextVar("scratch_workspace", default=None)
+
+scratch = ScratchSpace()
+
+
+def scratch_path(filename: str) -> str:
+    """Path for ``filename`` in the current job's workspace (``temp_dir`` outside jobs)."""
+    workspace = _current.get()
+    if workspace is None:
+        os.makedirs(settings.temp_dir, exist_ok=True)
+        return os.path.join(settings.temp_dir, filename)
+    return workspace.path(filename)
+
+
+async def scratch_file(filename: str, size: Optional[int]) -> str:
+    """Like ``scratch_path``, reserving room for ``size`` bytes first."""
+    workspace = _current.get()
+    if workspace is None:
+        return scratch_path(filename)
+    return await workspace.allocate(filename, size)
+
+
+def account_scratch_file(path: str):
+    """Count a file of unknown size, once written, against the current job's quota."""
+    workspace = _current.get()
+    if workspace is not None:
+        workspace.account(path)
@@ -1,15 +1,210 @@
+import asyncio
+import fcntl
+import json
 import os
+import shutil
+import time
 import uuid
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Optional
 import boto3
 from botocore.config import Config
-import httpx
+from botocore.exceptions import ClientError
 
 from config import get_settings
+from utils.http import get_http_client
+from utils.metrics import TRANSFER_BYTES, TRANSFER_SECONDS
+from utils.scratch import account_scratch_file, scratch_file
+from utils.tracing import tracer
 
 settings = get_settings()
 
+CONTENT_TYPES = {
+    "mp4": "video/mp4",
+    "webm": "video/webm",
+    "mov": "video/quicktime",
+    "jpg": "image/jpeg",
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+    "webp": "image/webp",
+    "srt": "text/plain",
+    "vtt": "text/vtt",
+    "json": "application/json",
+}
+
+# ioctl request for copy-on-write clones (btrfs, XFS with reflink, ...)
+FICLONE = 0x40049409
+
+# Where object metadata lives: an S3 user-metadata field, or a directory
+# under the local storage root
+METADATA_FIELD = "creatorops"
+METADATA_DIR = ".metadata"
+
+
+class StorageClient(ABC):
+    """Storage backend interface.
+
+    Inputs may always be HTTP(S) URLs; anything else is a key in the backend.
+    Backend transfers block (boto3, file copies), so they run in a thread,
+    leaving the event loop free for other jobs and worker heartbeats.
+    """
+
+    async def download_temp(self, url: str) -> str:
+        """Download file from URL or key into the current job's scratch space.
+
+        Room for the file is reserved before it is written (see ``utils.scratch``).
+        """
+        # Generate temp filename
+        ext = url.split(".")[-1].split("?")[0]
+        filename = f"{uuid.uuid4()}.{ext}"
+
+        with tracer.span("storage.download", stage="download", source=url.split("?")[0]):
+            started = time.perf_counter()
+
+            if url.startswith(("http://", "https://")):
+                # Download from HTTP(S), streaming to disk over the shared pool
+                client = get_http_client()
+                async with client.stream("GET", url) as response:
+                    response.raise_for_status()
+                    size = response.headers.get("content-length")
+                    temp_path = await scratch_file(filename, int(size) if size else None)
+
+                    with open(temp_path, "wb") as f:
+                        async for chunk in response.aiter_bytes(1024 * 1024):
+                            f.write(chunk)
+
+                if not size:
+                    account_scratch_file(temp_path)
+            else:
+                size = await asyncio.to_thread(self._key_size, url)
+                temp_path = await scratch_file(filename, size)
+                await asyncio.to_thread(self._download_key, url, temp_path)
+
+            self._record_transfer("download", os.path.getsize(temp_path), started)
+
+        return temp_path
+
+    async def resolve_input(self, url: str, seekable: bool = False) -> tuple[str, bool]:
+        """Resolve a source for ffmpeg.
+
+        When ``seekable`` is set and streaming is enabled, HTTP(S) URLs are passed
+        through so ffmpeg only fetches the byte ranges it needs. Otherwise the
+        file is downloaded to temp.
+
+        Returns ``(path_or_url, is_temp)``; temp files live in the job's scratch
+        space and may be removed early by the caller.
+        """
+        if seekable and settings.stream_inputs and url.startswith(("http://", "https://")):
+            return url, False
+
+        return await self.download_temp(url), True
+
+    async def version(self, url: str) -> Optional[str]:
+        """Validator of a source's current content, or None if it has none.
+
+        The ETag, else Last-Modified, else size: whatever changes when the
+        object behind the URL or key is replaced.
+        """
+        if url.startswith(("http://", "https://")):
+            # A one-byte GET rather than HEAD: presigned URLs are only signed for GET
+            client = get_http_client()
+            async with client.stream("GET", url, headers={"Range": "bytes=0-0"}) as response:
+                response.raise_for_status()
+                headers = response.headers
+                return (
+                    headers.get("etag")
+                    or headers.get("last-modified")
+                    or headers.get("content-range", "").rpartition("/")[2]
+                    or headers.get("content-length")
+                )
+        return await asyncio.to_thread(self._key_version, url)
+
+    def input_options(self, source: str) -> dict:
+        """Extra ffmpeg input options for a resolved source."""
+        if source.startswith(("http://", "https://")):
+            # Survive dropped connections while seeking through large remote files
+            return {"reconnect": 1, "reconnect_on_network_error": 1, "reconnect_delay_max": 5}
+        return {}
+
+    async def upload(
+        self, local_path: str, remote_key: str, metadata: Optional[dict] = None
+    ) -> str:
+        """Store a local file under ``remote_key`` and return its URL.
+
+        ``metadata`` (JSON-serializable, a few KB at most) is kept with the
+        object and returned by ``head``.
+        """
+        with tracer.span("storage.upload", stage="upload", key=remote_key):
+            started = time.perf_counter()
+            await asyncio.to_thread(
+                self._upload_file, local_path, remote_key, content_type(local_path), metadata
+            )
+            self._record_transfer("upload", os.path.getsize(local_path), started)
+
+        return self.get_url(remote_key)
+
+    async def upload_bytes(
+        self, data: bytes, remote_key: str, metadata: Optional[dict] = None
+    ) -> str:
+        """Store ``data`` under ``remote_key`` straight from memory; like ``upload``."""
+        with tracer.span("storage.upload", stage="upload", key=remote_key):
+            started = time.perf_counter()
+            await asyncio.to_thread(
+                self._upload_bytes, data, remote_key, content_type(remote_key), metadata
+            )
+            self._record_transfer("upload", len(data), started)
+
+        return self.get_url(remote_key)
+
+    @abstractmethod
+    def _download_key(self, remote_key: str, local_path: str):
+        ...
+
+    @abstractmethod
+    def _key_size(self, remote_key: str) -> Optional[int]:
+        ...
+
+    @abstractmethod
+    def _key_version(self, remote_key: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def _upload_file(
+        self, local_path: str, remote_key: str, content_type: str, metadata: Optional[dict]
+    ):
+        ...
+
+    @abstractmethod
+    def _upload_bytes(
+        self, data: bytes, remote_key: str, content_type: str, metadata: Optional[dict]
+    ):
+        ...
+
+    @abstractmethod
+    async def head(self, remote_key: str) -> Optional[dict]:
+        """Metadata stored with an object (``{}`` if none), or None if it doesn't exist."""
+
+    @abstractmethod
+    async def delete(self, remote_key: str):
+        """Delete a stored object."""
+
+    @abstractmethod
+    def get_url(self, remote_key: str) -> str:
+        """Public URL of a stored object."""
+
+    @abstractmethod
+    def get_presigned_url(self, remote_key: str, expires_in: int = 3600) -> str:
+        """Get presigned URL for downloading."""
+
+    def _record_transfer(self, direction: str, nbytes: int, started: float):
+        TRANSFER_BYTES.labels(direction).inc(nbytes)
+        TRANSFER_SECONDS.labels(direction).inc(time.perf_counter() - started)
+
+
+class S3StorageClient(StorageClient):
+    """MinIO / S3 backend."""
 
-class StorageClient:
     def __init__(self):
         self.s3 = boto3.client(
             "s3",
@@ -21,65 +216,209 @@ class StorageClient:
         )
         self.bucket = settings.minio_bucket
 
-    async def download_temp(self, url: str) -> str:
-        """Download file from URL to temp directory."""
-        os.makedirs(settings.temp_dir, exist_ok=True)
+    async def resolve_input(self, url: str, seekable: bool = False) -> tuple[str, bool]:
+        # Presigned URLs let ffmpeg range-read S3 keys as well
+        if seekable and settings.stream_inputs and not url.startswith(("http://", "https://")):
+            return self.get_presigned_url(url), False
+        return await super().resolve_input(url, seekable)
 
-        # Generate temp filename
-        ext = url.split(".")[-1].split("?")[0]
-        temp_path = f"{settings.temp_dir}/{uuid.uuid4()}.{ext}"
-
-        if url.startswith(("http://", "https://")):
-            # Download from HTTP(S)
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, follow_redirects=True, timeout=300)
-                response.raise_for_status()
-
-                with open(temp_path, "wb") as f:
-                    f.write(response.content)
-        else:
-            # Assume it's an S3 key
-            self.s3.download_file(self.bucket, url, temp_path)
+    def _download_key(self, remote_key: str, local_path: str):
+        self.s3.download_file(self.bucket, remote_key, local_path)
 
-        return temp_path
+    def _key_size(self, remote_key: str) -> Optional[int]:
+        try:
+            return self.s3.head_object(Bucket=self.bucket, Key=remote_key)["ContentLength"]
+        except ClientError:
+            return None
 
-    async def upload(self, local_path: str, remote_key: str) -> str:
-        """Upload file to S3/MinIO."""
-        # Determine content type
-        ext = local_path.split(".")[-1].lower()
-        content_types = {
-            "mp4": "video/mp4",
-            "webm": "video/webm",
-            "mov": "video/quicktime",
-            "jpg": "image/jpeg",
-            "jpeg": "image/jpeg",
-            "png": "image/png",
-            "webp": "image/webp",
-            "srt": "text/plain",
-            "vtt": "text/vtt",
-            "json": "application/json",
-        }
-        content_type = content_types.get(ext, "application/octet-stream")
+    def _key_version(self, remote_key: str) -> Optional[str]:
+        try:
+            return self.s3.head_object(Bucket=self.bucket, Key=remote_key)["ETag"]
+        except ClientError:
+            return None
 
+    def _upload_file(
+        self, local_path: str, remote_key: str, content_type: str, metadata: Optional[dict]
+    ):
         self.s3.upload_file(
             local_path,
             self.bucket,
             remote_key,
-            ExtraArgs={"ContentType": content_type},
+            ExtraArgs=self._object_args(content_type, metadata),
         )
 
-        # Return URL
-        protocol = "https" if settings.minio_use_ssl else "http"
-        return f"{protocol}://{settings.minio_endpoint}:{settings.minio_port}/{self.bucket}/{remote_key}"
+    def _upload_bytes(
+        self, data: bytes, remote_key: str, content_type: str, metadata: Optional[dict]
+    ):
+        self.s3.put_object(
+            Bucket=self.bucket,
+            Key=remote_key,
+            Body=data,
+            **self._object_args(content_type, metadata),
+        )
+
+    def _object_args(self, content_type: str, metadata: Optional[dict]) -> dict:
+        args = {"ContentType": content_type}
+        if metadata:
+            args["Metadata"] = {METADATA_FIELD: json.dumps(metadata)}
+        return args
+
+    async def head(self, remote_key: str) -> Optional[dict]:
+        try:
+            response = await asyncio.to_thread(
+                self.s3.head_object, Bucket=self.bucket, Key=remote_key
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return json.loads(response.get("Metadata", {}).get(METADATA_FIELD, "{}"))
 
     async def delete(self, remote_key: str):
-        """Delete file from S3/MinIO."""
-        self.s3.delete_object(Bucket=self.bucket, Key=remote_key)
+        await asyncio.to_thread(self.s3.delete_object, Bucket=self.bucket, Key=remote_key)
+
+    def get_url(self, remote_key: str) -> str:
+        protocol = "https" if settings.minio_use_ssl else "http"
+        return f"{protocol}://{settings.minio_endpoint}:{settings.minio_port}/{self.bucket}/{remote_key}"
 
     def get_presigned_url(self, remote_key: str, expires_in: int = 3600) -> str:
-        """Get presigned URL for downloading."""
         return self.s3.generate_presigned_url(
             "get_object",
             Params={"Bucket": self.bucket, "Key": remote_key},
             ExpiresIn=expires_in,
         )
+
+
+class LocalStorageClient(StorageClient):
+    """Filesystem backend for single-node deployments, benchmarks and tests.
+
+    Objects are files under ``local_storage_root``. Files are hardlinked (or
+    reflinked) in and out of temp instead of copied whenever the filesystem
+    allows it. Object metadata is kept as JSON under ``.metadata/`` in the
+    root.
+    """
+
+    def __init__(self, root: str = ""):
+        self.root = os.path.abspath(root or settings.local_storage_root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, remote_key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, remote_key))
+        if os.path.commonpath([path, self.root]) != self.root:
+            raise ValueError(f"Key escapes storage root: {remote_key}")
+        return path
+
+    async def resolve_input(self, url: str, seekable: bool = False) -> tuple[str, bool]:
+        # Stored files are read in place; callers never modify their inputs
+        if not url.startswith(("http://", "https://")):
+            return self.path(url), False
+        return await super().resolve_input(url, seekable)
+
+    def _download_key(self, remote_key: str, local_path: str):
+        link_or_copy(self.path(remote_key), local_path)
+
+    def _key_size(self, remote_key: str) -> Optional[int]:
+        try:
+            return os.path.getsize(self.path(remote_key))
+        except OSError:
+            return None
+
+    def _key_version(self, remote_key: str) -> Optional[str]:
+        try:
+            stat = os.stat(self.path(remote_key))
+        except OSError:
+            return None
+        return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+    def _upload_file(
+        self, local_path: str, remote_key: str, content_type: str, metadata: Optional[dict]
+    ):
+        dest = self._prepare(remote_key, metadata)
+
+        # Link under a temporary name so readers never see a partial object
+        tmp_dest = f"{dest}.{uuid.uuid4().hex[:8]}.tmp"
+        link_or_copy(local_path, tmp_dest)
+        os.replace(tmp_dest, dest)
+
+    def _upload_bytes(
+        self, data: bytes, remote_key: str, content_type: str, metadata: Optional[dict]
+    ):
+        dest = self._prepare(remote_key, metadata)
+
+        tmp_dest = f"{dest}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp_dest, "wb") as f:
+            f.write(data)
+        os.replace(tmp_dest, dest)
+
+    def _prepare(self, remote_key: str, metadata: Optional[dict]) -> str:
+        """Create the object's directory and write its metadata; returns its path."""
+        dest = self.path(remote_key)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+
+        # Metadata goes first, so an object is never seen without it
+        meta_path = self._metadata_path(remote_key)
+        if metadata:
+            os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+            tmp_meta = f"{meta_path}.{uuid.uuid4().hex[:8]}.tmp"
+            with open(tmp_meta, "w") as f:
+                json.dump(metadata, f)
+            os.replace(tmp_meta, meta_path)
+        elif os.path.exists(meta_path):
+            os.remove(meta_path)
+
+        return dest
+
+    async def head(self, remote_key: str) -> Optional[dict]:
+        if not os.path.exists(self.path(remote_key)):
+            return None
+        try:
+            with open(self._metadata_path(remote_key)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    async def delete(self, remote_key: str):
+        for path in (self.path(remote_key), self._metadata_path(remote_key)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _metadata_path(self, remote_key: str) -> str:
+        relative = os.path.relpath(self.path(remote_key), self.root)
+        return os.path.join(self.root, METADATA_DIR, f"{relative}.json")
+
+    def get_url(self, remote_key: str) -> str:
+        if settings.local_storage_url:
+            return f"{settings.local_storage_url.rstrip('/')}/{remote_key}"
+        return self.path(remote_key)
+
+    def get_presigned_url(self, remote_key: str, expires_in: int = 3600) -> str:
+        return self.get_url(remote_key)
+
+
+def content_type(path: str) -> str:
+    """Content type for a file name or key, from its extension."""
+    return CONTENT_TYPES.get(path.split(".")[-1].lower(), "application/octet-stream")
+
+
+def link_or_copy(src: str, dst: str):
+    """Hardlink ``src`` to ``dst``, falling back to a reflink, then a copy."""
+    try:
+        os.link(src, dst)
+        return
+    except OSError:
+        pass
+
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            return
+        except OSError:
+            shutil.copyfileobj(fsrc, fdst, 1024 * 1024)
+
+
+@lru_cache
+def get_storage() -> StorageClient:
+    """Storage backend selected by ``Settings.storage_backend``."""
+    if settings.storage_backend == "local":
+        return LocalStorageClient()
+    return S3StorageClient()
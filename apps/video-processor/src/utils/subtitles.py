@@ -0,0 +1,29 @@
+"""Subtitle file writers."""
+
+
+def write_srt(path: str, segments: list):
+    """Write SRT subtitle file."""
+    with open(path, "w", encoding="utf-8") as f:
+        for i, seg in enumerate(segments, 1):
+            start = format_timestamp(seg["start"], ",")
+            end = format_timestamp(seg["end"], ",")
+            f.write(f"{i}\n{start} --> {end}\n{seg['text']}\n\n")
+
+
+def write_vtt(path: str, segments: list):
+    """Write WebVTT subtitle file."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("WEBVTT\n\n")
+        for seg in segments:
+            start = format_timestamp(seg["start"], ".")
+            end = format_timestamp(seg["end"], ".")
+            f.write(f"{start} --> {end}\n{seg['text']}\n\n")
+
+
+def format_timestamp(seconds: float, decimal_marker: str) -> str:
+    """Format timestamp as HH:MM:SS,mmm (SRT) or HH:MM:SS.mmm (VTT)."""
+    hours = int(seconds // 3600)
+    minutes = int((seconds % 3600) // 60)
+    secs = int(seconds % 60)
+    millis = int((seconds % 1) * 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{decimal_marker}{millis:03d}"
@@ -0,0 +1,140 @@
+import json
+import logging
+import os
+import secrets
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """A timed unit of work, shaped after OpenTelemetry spans."""
+
+    def __init__(
+        self,
+        name: str,
+        parent: Optional["Span"] = None,
+        trace_id: Optional[str] = None,
+        parent_id: Optional[str] = None,
+        attributes: Optional[dict] = None,
+    ):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else (trace_id or secrets.token_hex(16))
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else parent_id
+        self.root = parent.root if parent else self
+        self.attributes = attributes or {}
+        self.status = "OK"
+        self.error: Optional[str] = None
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+
+        # Only used on the root span: summed seconds per stage, and finished
+        # spans waiting to be exported together with the root
+        self.stage_timings: dict[str, float] = {}
+        self.finished: list["Span"] = []
+
+    @property
+    def duration(self) -> float:
+        end = self.end_ns or time.time_ns()
+        return (end - self.start_ns) / 1e9
+
+    def set_error(self, error: str):
+        self.status = "ERROR"
+        self.error = error
+
+    def to_dict(self) -> dict:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "durationMs": round(self.duration * 1000, 3),
+            "attributes": self.attributes,
+            "status": {"code": self.status, "message": self.error},
+        }
+
+
+class Tracer:
+    """Creates spans and exports finished traces as JSON lines."""
+
+    @contextmanager
+    def span(
+        self,
+        name: str,
+        stage: Optional[str] = None,
+        parent: Optional[tuple[str, str]] = None,
+        **attributes,
+    ):
+        """Open a span under the current one.
+
+        ``stage`` adds the span's duration to the root's stage timings.
+        ``parent`` is a ``(trace_id, span_id)`` pair for continuing a trace
+        after the original span has finished (e.g. queued callbacks).
+        """
+        span = self.start(name, parent, **attributes)
+        token = _current_span.set(span)
+
+        try:
+            yield span
+        except BaseException as e:
+            span.set_error(str(e) or type(e).__name__)
+            raise
+        finally:
+            _current_span.reset(token)
+            self.end(span, stage)
+
+    def start(self, name: str, parent: Optional[tuple[str, str]] = None, **attributes) -> Span:
+        """Open a span under the current one without making it current.
+
+        For work that hands control back to its caller while the span is
+        open, such as async generators; close it with ``end``.
+        """
+        current = _current_span.get()
+        return Span(
+            name,
+            parent=current if parent is None else None,
+            trace_id=parent[0] if parent else None,
+            parent_id=parent[1] if parent else None,
+            attributes=attributes,
+        )
+
+    def end(self, span: Span, stage: Optional[str] = None):
+        """Close a span; ``stage`` is as for ``span``."""
+        span.end_ns = time.time_ns()
+        if stage and span.root is not span:
+            timings = span.root.stage_timings
+            timings[stage] = round(timings.get(stage, 0.0) + span.duration, 4)
+        self._finish(span)
+
+    def current(self) -> Optional[Span]:
+        return _current_span.get()
+
+    def _finish(self, span: Span):
+        if not settings.tracing_enabled:
+            return
+
+        span.root.finished.append(span)
+        if span.root is span:
+            self._export(span.finished)
+
+    def _export(self, spans: list[Span]):
+        try:
+            os.makedirs(settings.trace_dir, exist_ok=True)
+            with open(os.path.join(settings.trace_dir, "spans.jsonl"), "a") as f:
+                f.write("".join(json.dumps(s.to_dict(), default=str) + "\n" for s in spans))
+        except OSError as e:
+            logger.warning("Could not export spans: %s", e)
+
+
+tracer = Tracer()
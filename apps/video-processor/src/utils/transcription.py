@@ -0,0 +1,109 @@
+"""Whisper in a child process, so a transcription can be stopped.
+
+Transcription is CPU/GPU-bound Python that can't be interrupted in a
+thread. The model lives in one long-lived child process instead; cancelling
+a transcription kills that process, and the next one starts a fresh process
+(and reloads the model).
+"""
+import asyncio
+import multiprocessing
+from typing import Optional
+
+from utils.metrics import CACHE_REQUESTS
+from utils.scheduler import lower_priority
+
+# Seconds a killed or closed transcriber gets to exit
+STOP_TIMEOUT = 5.0
+
+
+def _serve(conn, model_size: str):
+    """Child process: load the model once, then transcribe requests until the pipe closes."""
+    import whisper
+
+    model = whisper.load_model(model_size)
+    while True:
+        try:
+            audio_path, options = conn.recv()
+        except EOFError:
+            return
+
+        try:
+            conn.send(("ok", model.transcribe(audio_path, **options)))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+class Transcriber:
+    """One Whisper child process, running one transcription at a time."""
+
+    def __init__(self):
+        self._context = multiprocessing.get_context("spawn")
+        self._process: Optional[multiprocessing.Process] = None
+        self._conn = None
+        self._model_size: Optional[str] = None
+        self._lock = asyncio.Lock()
+
+    async def transcribe(self, model_size: str, audio_path: str, options: dict) -> dict:
+        """Transcribe ``audio_path`` with ``model.transcribe(audio_path, **options)``.
+
+        Raises ``RuntimeError`` if Whisper fails. If the calling task is
+        cancelled, the child process is killed.
+        """
+        async with self._lock:
+            self._ensure_process(model_size)
+            self._conn.send((audio_path, options))
+
+            try:
+                status, result = await asyncio.to_thread(self._conn.recv)
+            except asyncio.CancelledError:
+                await asyncio.to_thread(self.kill)
+                raise
+            except (EOFError, OSError):
+                self.kill()
+                raise RuntimeError("Whisper process exited during transcription")
+
+        if status == "error":
+            raise RuntimeError(result)
+        return result
+
+    def kill(self):
+        if self._process is not None:
+            self._process.kill()
+            self._process.join(STOP_TIMEOUT)
+            self._conn.close()
+        self._process = None
+        self._conn = None
+
+    def close(self):
+        """Stop the child process once it finishes its current work."""
+        if self._process is not None:
+            self._conn.close()
+            self._process.join(STOP_TIMEOUT)
+            if self._process.is_alive():
+                self._process.kill()
+        self._process = None
+        self._conn = None
+
+    def _ensure_process(self, model_size: str):
+        if (
+            self._process is not None
+            and self._process.is_alive()
+            and self._model_size == model_size
+        ):
+            CACHE_REQUESTS.labels("whisper_model", "hit").inc()
+            return
+
+        CACHE_REQUESTS.labels("whisper_model", "miss").inc()
+        self.kill()
+        parent_conn, child_conn = self._context.Pipe()
+        self._process = self._context.Process(
+            target=_serve, args=(child_conn, model_size), daemon=True
+        )
+        self._process.start()
+        lower_priority(self._process.pid)
+        child_conn.close()
+        self._conn = parent_conn
+        self._model_size = model_size
+
+
+transcriber = Transcriber()
@@ -0,0 +1,189 @@
+"""Job worker: runs queued jobs from Redis so encoding scales apart from the API.
+
+Run one or more of these next to the API with ``JOB_BACKEND=redis`` set on
+both (from apps/video-processor/src):
+
+    python worker.py
+
+Each worker runs as many jobs per lane as the lane's cap
+(``max_concurrent_jobs`` encodes, ``transcribe_concurrency`` Whisper jobs,
+...) and only claims a job when that lane has a free slot, so idle workers
+pick up the rest. Job records are published to Redis while a job runs and
+when it ends; the API's ``/job/{job_id}`` routes read them from there.
+"""
+import asyncio
+import logging
+import signal
+
+from config import get_settings
+from services.clip_extractor import ClipExtractor
+from services.pipeline_runner import PipelineRunner
+from services.shorts_creator import ShortsCreator
+from services.subtitle_generator import SubtitleGenerator
+from services.video_processor import VideoProcessor
+from utils.callbacks import callback_dispatcher
+from utils.dedup import job_coalescer
+from utils.http import close_http_client
+from utils.jobs import cancel_running_job
+from utils.scheduler import DEFAULT_TENANT, LANES, lane_limit, run_as
+from utils.queue import job_queue
+from utils.scratch import scratch
+from utils.transcription import transcriber
+
+settings = get_settings()
+logger = logging.getLogger("worker")
+
+SERVICES = {
+    type(service).__name__: service
+    for service in (
+        VideoProcessor(),
+        ClipExtractor(),
+        ShortsCreator(),
+        SubtitleGenerator(),
+        PipelineRunner(),
+    )
+}
+
+
+class Worker:
+    def __init__(self):
+        self.stopping = asyncio.Event()
+
+    async def run(self):
+        scratch.sweep()
+        callback_dispatcher.start()
+        consumers = [
+            asyncio.create_task(self._consume(lane))
+            for lane in LANES
+            for _ in range(lane_limit(lane))
+        ]
+        helpers = [
+            asyncio.create_task(self._reap()),
+            asyncio.create_task(self._listen_for_cancellations()),
+        ]
+        logger.info("Worker started with %d slots", len(consumers))
+
+        await self.stopping.wait()
+        logger.info("Worker stopping, returning running jobs to the queue")
+
+        for task in helpers + consumers:
+            task.cancel()
+        await asyncio.gather(*helpers, *consumers, return_exceptions=True)
+
+        await callback_dispatcher.stop()
+        await job_queue.close()
+        transcriber.close()
+        await close_http_client()
+
+    def stop(self):
+        self.stopping.set()
+
+    async def _consume(self, lane: str):
+        while not self.stopping.is_set():
+            try:
+                job = await job_queue.claim(lane, timeout=5)
+            except Exception as e:
+                logger.warning("Could not claim a job: %s", e)
+                await asyncio.sleep(5)
+                continue
+
+            if job is not None:
+                await self._process(job)
+
+    async def _process(self, job: dict):
+        job_id = job["id"]
+        service_name, method_name = job["operation"].split(".", 1)
+        service = SERVICES.get(service_name)
+        method = getattr(service, method_name, None)
+
+        if method is None:
+            logger.error("Unknown operation %s for job %s", job["operation"], job_id)
+            await job_queue.set_status(job_id, {"status": "failed", "error": "Unknown operation"})
+            await job_queue.ack(job_id)
+            return
+
+        if await job_queue.is_cancelled(job_id):
+            # Cancelled between being claimed and starting
+            await job_queue.set_status(job_id, {"status": "cancelled"})
+            await job_queue.ack(job_id)
+            await job_coalescer.finished(job_id, {"status": "cancelled"})
+            return
+
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, service))
+        try:
+            await run_as(job.get("tenant", DEFAULT_TENANT), method, **job["kwargs"])
+        except asyncio.CancelledError:
+            # Shutting down: hand the job straight to another worker
+            service.jobs.pop(job_id, None)
+            await job_queue.retry(job_id, job.get("lane", "encode"))
+            raise
+        except Exception as e:
+            logger.exception("Job %s (%s) raised", job_id, job["operation"])
+            if job["attempts"] < settings.job_max_attempts:
+                service.jobs.pop(job_id, None)
+                await job_queue.retry(job_id, job.get("lane", "encode"))
+                return
+            service.jobs[job_id] = {"status": "failed", "error": str(e)}
+        finally:
+            heartbeat.cancel()
+
+        # Services record their own failures; those are final, not retried
+        record = service.jobs.pop(job_id, {"status": "completed"})
+        await job_queue.set_status(job_id, record)
+        await job_queue.ack(job_id)
+        await job_coalescer.finished(job_id, record)
+
+    async def _heartbeat(self, job_id: str, service):
+        """Keep the lease alive and publish progress while a job runs.
+
+        Also stops the job if a cancellation was missed by the listener.
+        """
+        interval = settings.job_visibility_timeout / 3
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if await job_queue.is_cancelled(job_id):
+                    await cancel_running_job(job_id)
+                    return
+                await job_queue.extend(job_id)
+                record = service.jobs.get(job_id)
+                if record is not None:
+                    await job_queue.set_status(job_id, dict(record))
+            except Exception as e:
+                logger.warning("Heartbeat for job %s failed: %s", job_id, e)
+
+    async def _listen_for_cancellations(self):
+        """Stop jobs running here as soon as their cancellation is requested."""
+        while True:
+            try:
+                async for job_id in job_queue.cancellations():
+                    await cancel_running_job(job_id)
+            except Exception as e:
+                logger.warning("Cancellation listener failed: %s", e)
+                await asyncio.sleep(5)
+
+    async def _reap(self):
+        """Requeue jobs whose worker stopped heartbeating."""
+        while True:
+            try:
+                requeued = await job_queue.requeue_expired()
+                if requeued:
+                    logger.info("Requeued %d expired jobs", requeued)
+            except Exception as e:
+                logger.warning("Could not requeue expired jobs: %s", e)
+            await asyncio.sleep(settings.job_visibility_timeout / 4)
+
+
+async def main():
+    logging.basicConfig(level=logging.INFO)
+    worker = Worker()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+
+    await worker.run()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())